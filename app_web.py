@@ -1,16 +1,13 @@
 import streamlit as st
 import os
-import tempfile
 import datetime
-import shutil
+import time
+import uuid
 
 # --- IMPORTAMOS TUS MÓDULOS ---
-import bcs_core
-import bcs_injector
-import bcs_5d
-import bcs_6d
-import bcs_4d
-import bcs_7d 
+import bcs
+import bcs_calendario
+import bcs_cola
 
 # --- 1. CONFIGURACIÓN DE LA PÁGINA ---
 st.set_page_config(
@@ -29,12 +26,20 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# --- COLA DE TRABAJOS ---
+# El cálculo va a procesos trabajadores (bcs_cola): la sesión solo encola y consulta el estado,
+# así un modelo grande no bloquea la página y recargarla no pierde el trabajo.
+bcs_cola.arrancar()
+
 # --- INICIALIZAR MEMORIA (SESSION STATE) ---
-# Esto evita que se borre todo al descargar un PDF
-if 'procesado' not in st.session_state:
-    st.session_state.procesado = False
-if 'rutas_salida' not in st.session_state:
-    st.session_state.rutas_salida = {}
+if 'sesion' not in st.session_state:
+    # Cuando Streamlit descarta la sesión, el vigía borra sus trabajos (entregables e IFC en memoria)
+    st.session_state.vigia = bcs_cola.VigiaSesion(uuid.uuid4().hex)
+    st.session_state.sesion = st.session_state.vigia.sesion
+# El trabajo activo también va en la URL: al recargar la página se recupera (y pasa a la sesión nueva)
+if 'trabajo' not in st.session_state:
+    st.session_state.trabajo = st.query_params.get("trabajo")
+    if st.session_state.trabajo: bcs_cola.adoptar(st.session_state.trabajo, st.session_state.sesion)
 
 # --- CABECERA ---
 col_logo, col_titulo = st.columns([1, 4])
@@ -59,6 +64,10 @@ with st.sidebar:
     fecha_input = st.date_input("Fecha Inicio", datetime.date.today())
     rendimiento = st.number_input("Rendimiento (Tn/día)", value=1.5, min_value=0.1, step=0.1)
     rendimiento_kg = rendimiento * 1000.0
+    lista_regiones = bcs_calendario.regiones()
+    region = st.selectbox("Calendario (festivos)", lista_regiones,
+                          index=lista_regiones.index(bcs_calendario.REGION_DEFECTO.upper()),
+                          help="Los festivos y cierres de obra de la región no cuentan como días de montaje.")
 
     st.subheader("2. Normativa ISO 19650")
     iso_status = st.selectbox("Estado (Status)", 
@@ -70,6 +79,10 @@ with st.sidebar:
         index=0
     )
     iso_status_code = iso_status.split(" ")[0]
+
+    st.subheader("3. Descarga")
+    ifczip = st.checkbox("IFC comprimido (.ifczip)", value=False,
+                         help="El modelo enriquecido ocupa 5-10 veces menos; los visores BIM lo abren directamente.")
     
     st.info("ℹ️ **Modo Prueba:** Generación gratuita de entregables.")
 
@@ -80,146 +93,136 @@ st.write("### 📂 Carga de Modelo BIM (IFC)")
 # Clave única para detectar cambios de archivo
 uploaded_file = st.file_uploader("Arrastra tu archivo .ifc aquí", type=["ifc"], key="uploader")
 
-st.markdown("""
+st.markdown(f"""
     <div style="background-color: #f0f2f6; padding: 10px; border-radius: 5px; font-size: 0.85em; color: #555;">
         🔒 <strong>Privacidad y Seguridad:</strong> 
         Sus archivos se procesan en un entorno seguro y volátil. 
-        <br>Por política de confidencialidad, <strong>el modelo IFC original y los resultados se eliminan permanentemente</strong> de nuestros servidores en cuanto cierra esta sesión o recarga la página. 
+        <br>Por política de confidencialidad, <strong>el modelo IFC original nunca se guarda en disco</strong>: solo está en memoria mientras dura su sesión. Los resultados se borran permanentemente al reiniciar, al cerrar la sesión o, como máximo, {bcs_cola.HORAS_RETENCION} horas después. 
         BIM Consulting Solutions no conserva copias de su propiedad intelectual.
     </div>
     <br>
 """, unsafe_allow_html=True)
 
+def opciones_actuales():
+    return bcs_cola.normalizar_opciones({"fecha_inicio": fecha_input, "rendimiento_kg": rendimiento_kg, "region": region,
+                                         "iso_status": iso_status_code, "iso_suitability": iso_suitability,
+                                         "ifczip": ifczip})
+
+def lanzar_trabajo(archivo=None, reemplaza=None):
+    """
+    Encola el IFC con la configuración actual de la barra lateral ('reemplaza': trabajo que deja obsoleto).
+    Sin 'archivo' se reutiliza el IFC que la cola ya tiene del trabajo reemplazado (no se vuelve a enviar).
+    """
+    tid = bcs_cola.encolar(archivo.getvalue() if archivo else None, archivo.name if archivo else None,
+                           sesion=st.session_state.sesion, reemplaza=reemplaza, **opciones_actuales())
+    st.session_state.trabajo = tid
+    st.query_params["trabajo"] = tid
+
+def reiniciar_sesion():
+    """Olvida los resultados anteriores y borra sus archivos."""
+    if st.session_state.trabajo: bcs_cola.borrar(st.session_state.trabajo)
+    bcs_cola.borrar_sesion(st.session_state.sesion)
+    st.session_state.trabajo = None
+    st.query_params.clear()
+
+trabajo = bcs_cola.estado(st.session_state.trabajo) if st.session_state.trabajo else None
+if st.session_state.trabajo and trabajo is None:
+    st.warning("⚠️ Los resultados de esta sesión han expirado. Por favor, procesa de nuevo.")
+    reiniciar_sesion()
+
 # Si el usuario cambia el archivo, reseteamos la memoria
-if uploaded_file and 'ultimo_archivo' not in st.session_state:
-    st.session_state.ultimo_archivo = uploaded_file.name
-elif uploaded_file and uploaded_file.name != st.session_state.ultimo_archivo:
-    st.session_state.procesado = False
-    st.session_state.ultimo_archivo = uploaded_file.name
+if uploaded_file is not None and trabajo is not None and trabajo["archivo"] != uploaded_file.name:
+    reiniciar_sesion(); trabajo = None
 
 if uploaded_file is not None:
     st.success(f"Archivo cargado: **{uploaded_file.name}** ({uploaded_file.size / 1024:.1f} KB)")
     st.write("") 
     
     # BOTÓN DE PROCESAR
-    # Solo mostramos el botón si NO hemos procesado ya este archivo
-    if not st.session_state.procesado:
+    # Solo mostramos el botón si NO hay ya un trabajo para este archivo
+    if trabajo is None:
         if st.button("🚀 PROCESAR Y GENERAR ENTREGABLES", type="primary"):
-            
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            try:
-                # --- PROCESO DE CÁLCULO ---
-                status_text.text("⏳ Leyendo geometría del archivo...")
-                progress_bar.progress(10)
-                
-                tfile = tempfile.NamedTemporaryFile(delete=False, suffix=".ifc")
-                tfile.write(uploaded_file.getvalue())
-                tfile.close()
-                ruta_temporal = tfile.name
-                
-                nombre_base = os.path.splitext(uploaded_file.name)[0]
-                
-                # Definir rutas de salida
-                rutas = {
-                    "pdf_5d": f"{nombre_base}_5D_Presupuesto.pdf",
-                    "pdf_6d": f"{nombre_base}_6D_Huella.pdf",
-                    "pdf_4d": f"{nombre_base}_4D_Planificacion.pdf",
-                    "pdf_7d": f"{nombre_base}_7D_Libro.pdf",
-                    "ifc_final": f"{nombre_base}_BCS_Enriquecido.ifc"
-                }
-
-                # Guardamos rutas en memoria
-                st.session_state.rutas_salida = rutas
-
-                status_text.text("🧠 Analizando estructura...")
-                progress_bar.progress(30)
-                datos, ifc_obj = bcs_core.extraer_datos_modelo(ruta_temporal)
-                
-                if not datos:
-                    st.error("❌ No se encontraron elementos estructurales.")
-                else:
-                    status_text.text("💰 Calculando Presupuesto y Huella...")
-                    progress_bar.progress(50)
-                    bcs_5d.generar_presupuesto(datos, rutas["pdf_5d"])
-                    bcs_6d.generar_informe_sostenibilidad(datos, rutas["pdf_6d"])
-                    
-                    status_text.text("📅 Generando Planificación...")
-                    progress_bar.progress(70)
-                    bcs_4d.generar_informe_4d(datos, fecha_input, rendimiento_kg, rutas["pdf_4d"])
-                    bcs_7d.generar_informe_7d(datos, rutas["pdf_7d"])
-                    
-                    status_text.text("💉 Inyectando ISO 19650...")
-                    progress_bar.progress(90)
-                    bcs_injector.generar_ifc_enriquecido(
-                        ifc_file=ifc_obj,
-                        ruta_salida=rutas["ifc_final"],
-                        datos=datos,
-                        iso_status=iso_status_code,
-                        iso_suitability=iso_suitability
-                    )
-                    
-                    progress_bar.progress(100)
-                    status_text.text("✅ ¡Proceso finalizado!")
-                    
-                    # MARCAMOS COMO PROCESADO PARA QUE NO DESAPAREZCA
-                    st.session_state.procesado = True
-                    st.rerun() # Recargamos para mostrar los resultados fijos
-
-            except Exception as e:
-                st.error(f"Error: {e}")
-                print(e)
-            finally:
-                if os.path.exists(ruta_temporal): os.unlink(ruta_temporal)
-
-    # --- ZONA DE RESULTADOS (PERSISTENTE) ---
-    if st.session_state.procesado:
-        st.divider()
-        st.subheader("📥 Descarga de Entregables")
-        
-        # Recuperamos las rutas de la memoria
-        rutas = st.session_state.rutas_salida
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.write("**Documentación PDF**")
-            # Leemos los archivos al momento de crear el botón
-            # Usamos try/except por si el usuario borró los archivos temp manualmente
-            try:
-                with open(rutas["pdf_5d"], "rb") as f:
-                    st.download_button("💰 5D: Presupuesto", f, file_name=rutas["pdf_5d"])
-                with open(rutas["pdf_6d"], "rb") as f:
-                    st.download_button("🌍 6D: Huella de Carbono", f, file_name=rutas["pdf_6d"])
-                with open(rutas["pdf_4d"], "rb") as f:
-                    st.download_button("📅 4D: Planificación", f, file_name=rutas["pdf_4d"])
-                with open(rutas["pdf_7d"], "rb") as f:
-                    st.download_button("🛠️ 7D: Mantenimiento", f, file_name=rutas["pdf_7d"])
-            except FileNotFoundError:
-                st.warning("⚠️ Los archivos temporales han expirado. Por favor, procesa de nuevo.")
-                st.session_state.procesado = False
-                st.rerun()
-
-        with col2:
-            st.write("**Modelo BIM Enriquecido**")
-            st.write(f"Estado: **{iso_status_code}** | Uso: **{iso_suitability}**")
-            try:
-                with open(rutas["ifc_final"], "rb") as f:
-                    st.download_button(
-                        "📦 DESCARGAR IFC FINAL", 
-                        f, 
-                        file_name=rutas["ifc_final"],
-                        mime="application/x-step",
-                        type="primary"
-                    )
-            except FileNotFoundError:
-                pass
-        
-        st.divider()
-        if st.button("🔄 Reiniciar / Procesar Nuevo Archivo"):
-            st.session_state.procesado = False
+            lanzar_trabajo(uploaded_file)
+            st.rerun()
+elif trabajo is None:
+    st.info("👈 Utiliza el panel lateral para configurar la obra y sube tu archivo aquí.")
+
+if trabajo is not None and trabajo["estado"] == "hecho" and trabajo["opciones"] != opciones_actuales():
+    # Cambió la barra lateral: nuevo trabajo con el IFC que ya está en la cola (el trabajador solo rehace
+    # las etapas afectadas y la cola borra el anterior al terminar)
+    lanzar_trabajo(reemplaza=trabajo["id"])
+    st.rerun()
+
+# --- ESTADO DEL TRABAJO ---
+if trabajo is not None and trabajo["estado"] in ("pendiente", "en_curso"):
+    st.progress(min(1.0, trabajo["progreso"] or 0.0))
+    if trabajo["estado"] == "pendiente":
+        st.text(f"⏳ En cola (posición {trabajo['posicion']})...")
+    elif trabajo["etapa"] == "extraccion":
+        st.text(f"🧠 Analizando estructura: {trabajo['hechas']}/{trabajo['total']} elementos...")
+    else:
+        st.text(f"✔️ {trabajo['etapa']} ({trabajo['hechas']}/{trabajo['total']})")
+    if st.button("🛑 Cancelar"):
+        reiniciar_sesion()
+        st.rerun()
+    time.sleep(1.0) # Sondeo: la página se refresca sola hasta que el trabajo termina
+    st.rerun()
+
+elif trabajo is not None and trabajo["estado"] != "hecho":
+    if trabajo["estado"] == "error": st.error(f"Error: {trabajo['mensaje']}")
+    else: st.warning("🛑 Trabajo cancelado.")
+    if st.button("🔄 Reiniciar / Procesar Nuevo Archivo"):
+        reiniciar_sesion()
+        st.rerun()
+
+# --- ZONA DE RESULTADOS (PERSISTENTE) ---
+elif trabajo is not None:
+    st.divider()
+    st.subheader("📥 Descarga de Entregables")
+    
+    # Los entregables están en la carpeta del trabajo
+    rutas = bcs.rutas_salida(trabajo["archivo"], trabajo["carpeta"], trabajo["opciones"].get("ifczip", False))
+    
+    if os.path.exists(rutas["zip"]):
+        with open(rutas["zip"], "rb") as f:
+            st.download_button("🗜️ DESCARGAR TODO (ZIP)", f, file_name=os.path.basename(rutas["zip"]),
+                               mime="application/zip", type="primary")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.write("**Documentación PDF**")
+        # Leemos los archivos al momento de crear el botón
+        # Usamos try/except por si los archivos ya se purgaron
+        try:
+            with open(rutas["pdf_5d"], "rb") as f:
+                st.download_button("💰 5D: Presupuesto", f, file_name=os.path.basename(rutas["pdf_5d"]))
+            with open(rutas["pdf_6d"], "rb") as f:
+                st.download_button("🌍 6D: Huella de Carbono", f, file_name=os.path.basename(rutas["pdf_6d"]))
+            with open(rutas["pdf_4d"], "rb") as f:
+                st.download_button("📅 4D: Planificación", f, file_name=os.path.basename(rutas["pdf_4d"]))
+            with open(rutas["pdf_7d"], "rb") as f:
+                st.download_button("🛠️ 7D: Mantenimiento", f, file_name=os.path.basename(rutas["pdf_7d"]))
+        except FileNotFoundError:
+            st.warning("⚠️ Los archivos temporales han expirado. Por favor, procesa de nuevo.")
+            reiniciar_sesion()
             st.rerun()
 
-else:
-    st.info("👈 Utiliza el panel lateral para configurar la obra y sube tu archivo aquí.")
\ No newline at end of file
+    with col2:
+        st.write("**Modelo BIM Enriquecido**")
+        st.write(f"Estado: **{trabajo['opciones']['iso_status']}** | Uso: **{trabajo['opciones']['iso_suitability']}**")
+        try:
+            with open(rutas["ifc_final"], "rb") as f:
+                st.download_button(
+                    "📦 DESCARGAR IFC FINAL", 
+                    f, 
+                    file_name=os.path.basename(rutas["ifc_final"]),
+                    mime="application/zip" if rutas["ifc_final"].endswith(".ifczip") else "application/x-step"
+                )
+        except FileNotFoundError:
+            pass
+    
+    st.divider()
+    if st.button("🔄 Reiniciar / Procesar Nuevo Archivo"):
+        reiniciar_sesion()
+        st.rerun()
@@ -0,0 +1,370 @@
+# bcs.py
+"""
+Entrada de línea de comandos (sin Streamlit):
+    python -m bcs procesar modelo.ifc --salida resultados/ [--tabla] [--lite | --anterior P01_BCS_Tabla.npz]
+    python -m bcs lote carpeta_o_glob --salida resultados/ --procesos 4 --timeout 900
+    python -m bcs catalogo precios.csv [modelo.ifc ...] [--calidad S275]
+    python -m bcs validar-lite modelo1.ifc modelo2.ifc
+    python -m bcs escenarios modelo.ifc --rendimientos 1 1.5 2 --cuadrillas 1 2 --inicios 2025-03-03 2025-04-07
+    python -m bcs arranque [--guardar antes.json] [--comparar antes.json]
+Con "--reglas reglas.csv" (o BCS_REGLAS) la extracción clasifica las piezas con esa tabla de reglas.
+Los módulos bcs_* se importan dentro de cada comando: "--help" no carga ifcopenshell ni fpdf.
+"""
+import argparse
+import datetime
+import glob
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+CARPETA_ACTUAL = os.path.dirname(os.path.abspath(__file__))
+MODULOS_ARRANQUE = ("bcs_tabla", "bcs_agregacion", "bcs_cache", "bcs_ia", "bcs_core", "bcs_lite", "bcs_catalogo",
+                    "bcs_5d", "bcs_6d", "bcs_7d", "bcs_calendario", "bcs_4d", "bcs_injector", "bcs_incremental")
+
+def rutas_salida(ruta_ifc, carpeta=".", ifczip=False):
+    """Mismos nombres de entregables que app_web, dentro de 'carpeta' (+ el ZIP con todos)."""
+    nombre_base = os.path.splitext(os.path.basename(ruta_ifc))[0]
+    return {
+        "pdf_5d": os.path.join(carpeta, f"{nombre_base}_5D_Presupuesto.pdf"),
+        "pdf_6d": os.path.join(carpeta, f"{nombre_base}_6D_Huella.pdf"),
+        "pdf_4d": os.path.join(carpeta, f"{nombre_base}_4D_Planificacion.pdf"),
+        "pdf_7d": os.path.join(carpeta, f"{nombre_base}_7D_Libro.pdf"),
+        "ifc_final": os.path.join(carpeta, f"{nombre_base}_BCS_Enriquecido.{'ifczip' if ifczip else 'ifc'}"),
+        "zip": os.path.join(carpeta, f"{nombre_base}_BCS_Entregables.zip"),
+        "tabla": os.path.join(carpeta, f"{nombre_base}_BCS_Tabla.npz")
+    }
+
+def procesar(ruta_ifc, carpeta=".", fecha_inicio=None, rendimiento_tn=1.5, procesos=1, usar_cache=None,
+             iso_status="S2", iso_suitability="Para Información", procesos_render=None, ifczip=False, paquete=False,
+             region=None, catalogo=None, calidad=None, acabado=None, proveedor=None, lite=False, anterior=None,
+             tabla=False):
+    """
+    Flujo completo de app_web sin interfaz: extracción -> DAG de 4D/5D/6D/7D + IFC enriquecido.
+    ifczip: IFC enriquecido comprimido; paquete: además un ZIP con todos los entregables.
+    region: calendario de festivos del 4D (ver festivos.csv).
+    catalogo: CSV de precios 5D (bcs_catalogo) con la calidad, acabado y proveedor de la obra.
+    lite: extracción rápida sin ifcopenshell (bcs_lite): solo los PDF, sin IFC enriquecido.
+    anterior: tabla .npz de la revisión anterior (ver 'tabla'): solo se re-extrae lo que ha cambiado.
+    tabla: guarda además la tabla de partes en .npz, para usarla como 'anterior' en la siguiente revisión.
+    Devuelve (rutas, segundos por etapa; "total" es el tiempo de reloj).
+    """
+    inicio = time.perf_counter()
+    import bcs_catalogo, bcs_core, bcs_pipeline
+    if lite and anterior: raise ValueError("'lite' y 'anterior' no se pueden combinar.")
+    if lite:
+        import bcs_lite
+        datos, _ = bcs_lite.extraer_datos_lite(ruta_ifc); ifc_obj = None
+    elif anterior:
+        import bcs_incremental, bcs_tabla
+        ifc_obj = bcs_core.cargar_modelo(ruta_ifc)
+        datos, _ = bcs_incremental.extraer_incremental(bcs_tabla.cargar_tabla(anterior), ifc_obj)
+    else:
+        datos, ifc_obj = bcs_core.extraer_datos_modelo(ruta_ifc, procesos=procesos, usar_cache=usar_cache)
+    tiempos = {"extraccion": time.perf_counter() - inicio}
+    if not datos: raise ValueError(f"{ruta_ifc}: no se encontraron elementos estructurales.")
+
+    os.makedirs(carpeta, exist_ok=True)
+    rutas = rutas_salida(ruta_ifc, carpeta, ifczip)
+    if not paquete: del rutas["zip"]
+    if lite: del rutas["ifc_final"] # El modelo lite no se puede enriquecer
+    if tabla:
+        import bcs_tabla
+        bcs_tabla.guardar_tabla(datos, rutas["tabla"])
+    else: del rutas["tabla"]
+    por_etapa = bcs_pipeline.generar_entregables(datos, ifc_obj, rutas, fecha_inicio or datetime.date.today(),
+                                                 rendimiento_tn * 1000.0, iso_status, iso_suitability, procesos_render,
+                                                 ruta_zip=rutas.get("zip"), region=region, ruta_ifc=ruta_ifc,
+                                                 tarifa=bcs_catalogo.tarifa(catalogo, calidad, acabado, proveedor))
+    for nombre, segundos in por_etapa.items(): # 5d_calculo + 5d_pdf -> 5d; abrir el modelo (caché) -> extraccion
+        clave = "extraccion" if nombre == "modelo" else nombre.split("_")[0]; tiempos[clave] = tiempos.get(clave, 0.0) + segundos
+    tiempos["total"] = time.perf_counter() - inicio
+    return rutas, tiempos
+
+# --- LOTES (una carpeta de salida y un proceso por archivo) ---
+ETAPAS = ("extraccion", "5d", "6d", "4d", "7d", "ifc")
+ARCHIVO_ESTADO = "estado.json" # Marca de trabajo terminado (permite reanudar el lote)
+
+def expandir_entradas(entradas):
+    """Carpetas (se buscan .ifc recursivamente) y patrones glob -> lista ordenada de rutas sin duplicados."""
+    rutas = []
+    for e in entradas:
+        if os.path.isdir(e): rutas += glob.glob(os.path.join(e, "**", "*.ifc"), recursive=True)
+        else: rutas += glob.glob(e, recursive=True)
+    return sorted(dict.fromkeys(os.path.abspath(r) for r in rutas if os.path.isfile(r)))
+
+def carpetas_trabajo(rutas, salida):
+    """Carpeta de cada trabajo: la ruta relativa del IFC (sin extensión) bajo 'salida'."""
+    if not rutas: return {}
+    base = os.path.commonpath([os.path.dirname(r) for r in rutas])
+    return {r: os.path.join(salida, os.path.relpath(os.path.splitext(r)[0], base)) for r in rutas}
+
+def _origen(ruta_ifc):
+    st = os.stat(ruta_ifc)
+    return {"ruta": ruta_ifc, "tam": st.st_size, "mtime": st.st_mtime}
+
+def leer_estado(carpeta):
+    try:
+        with open(os.path.join(carpeta, ARCHIVO_ESTADO), encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError): return None
+
+def _escribir_estado(carpeta, estado):
+    temporal = os.path.join(carpeta, ARCHIVO_ESTADO + ".tmp")
+    with open(temporal, "w", encoding="utf-8") as f: json.dump(estado, f, indent=1)
+    os.replace(temporal, os.path.join(carpeta, ARCHIVO_ESTADO))
+
+def _trabajo_lote(ruta_ifc, carpeta, opciones):
+    """Cuerpo del proceso de un archivo: la salida de consola va a bcs.log de su carpeta."""
+    carpeta = os.path.abspath(carpeta); os.makedirs(carpeta, exist_ok=True)
+    if CARPETA_ACTUAL not in sys.path: sys.path.insert(0, CARPETA_ACTUAL)
+    os.chdir(carpeta) # Temporales relativos aislados por trabajo
+    estado = {"origen": _origen(ruta_ifc)}
+    with open(os.path.join(carpeta, "bcs.log"), "w", encoding="utf-8") as log:
+        sys.stdout = sys.stderr = log
+        try:
+            _, estado["tiempos"] = procesar(ruta_ifc, carpeta, **opciones)
+            estado["estado"] = "ok"
+        except Exception as e:
+            estado["estado"] = "error"; estado["error"] = f"{type(e).__name__}: {e}"
+            print(f"❌ {estado['error']}")
+    _escribir_estado(carpeta, estado)
+
+def procesar_lote(rutas, salida, procesos=None, timeout_s=None, rehacer=False, **opciones):
+    """
+    Procesa cada IFC en su propio proceso (como máximo 'procesos' a la vez) con su carpeta de salida.
+    Un archivo que pasa de 'timeout_s' se cancela. Los ya terminados (mismo tamaño y fecha) se saltan.
+    Devuelve una fila por archivo: {archivo, estado, tiempos}.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    carpetas = carpetas_trabajo(rutas, salida)
+    resultados = {}; pendientes = []
+    for r in rutas:
+        estado = leer_estado(carpetas[r])
+        if not rehacer and estado and estado.get("estado") == "ok" and estado.get("origen") == _origen(r):
+            resultados[r] = {"archivo": r, "estado": "hecho", "tiempos": estado.get("tiempos", {})}
+        else: pendientes.append(r)
+    print(f"📦 LOTE: {len(rutas)} archivos ({len(rutas) - len(pendientes)} ya hechos, {len(pendientes)} pendientes).")
+
+    ctx = multiprocessing.get_context("spawn") # Procesos limpios: cada archivo carga sus propios módulos
+    activos = {}; pendientes.reverse()
+    while pendientes or activos:
+        while pendientes and len(activos) < procesos:
+            r = pendientes.pop()
+            p = ctx.Process(target=_trabajo_lote, args=(r, carpetas[r], opciones), daemon=True); p.start()
+            activos[p] = (r, time.monotonic())
+        time.sleep(0.2)
+        for p, (r, inicio) in list(activos.items()):
+            if p.is_alive():
+                if timeout_s and time.monotonic() - inicio > timeout_s:
+                    p.terminate(); p.join(); del activos[p]
+                    resultados[r] = {"archivo": r, "estado": "timeout", "tiempos": {}}
+                    print(f"⏰ LOTE: {r} cancelado tras {timeout_s:g} s.")
+                continue
+            p.join(); del activos[p]
+            estado = leer_estado(carpetas[r]) or {}
+            if estado.get("origen", {}).get("ruta") != r: estado = {"estado": "error", "error": f"código de salida {p.exitcode}"}
+            resultados[r] = {"archivo": r, "estado": estado["estado"], "tiempos": estado.get("tiempos", {}),
+                             "error": estado.get("error", "")}
+            print(f"{'✅' if estado['estado'] == 'ok' else '❌'} LOTE: {r} ({len(resultados)}/{len(rutas)}) {estado.get('error', '')}")
+    return [resultados[r] for r in rutas]
+
+def tabla_resumen(filas):
+    """Tabla de texto con los segundos por etapa de cada archivo y los totales (TOTAL = tiempo de reloj)."""
+    cab = f"{'ARCHIVO':<40}{'ESTADO':>9}" + "".join(f"{e:>11}" for e in ETAPAS) + f"{'TOTAL':>10}"
+    lineas = [cab, "-" * len(cab)]; totales = dict.fromkeys(ETAPAS + ("total",), 0.0)
+    for f in filas:
+        t = f["tiempos"]
+        for e in ETAPAS: totales[e] += t.get(e, 0.0)
+        nombre = os.path.basename(f["archivo"])
+        total = t.get("total", sum(t.get(e, 0.0) for e in ETAPAS)); totales["total"] += total
+        lineas.append(f"{nombre[-40:]:<40}{f['estado']:>9}" + "".join(f"{t[e]:>11.2f}" if e in t else f"{'-':>11}" for e in ETAPAS)
+                      + f"{total:>10.2f}")
+    lineas.append("-" * len(cab))
+    lineas.append(f"{'TOTAL':<40}{'':>9}" + "".join(f"{totales[e]:>11.2f}" for e in ETAPAS) + f"{totales['total']:>10.2f}")
+    return "\n".join(lineas)
+
+def medir_arranque(modulos=MODULOS_ARRANQUE, repeticiones=3):
+    """Milisegundos de 'import <módulo>' en un intérprete nuevo (mínimo de N arranques)."""
+    codigo = "import time; t = time.perf_counter(); import {m}; print((time.perf_counter() - t) * 1000)"
+    res = {}
+    for m in modulos:
+        tiempos = []
+        for _ in range(repeticiones):
+            r = subprocess.run([sys.executable, "-c", codigo.format(m=m)], capture_output=True, text=True, cwd=CARPETA_ACTUAL)
+            if r.returncode != 0: break
+            tiempos.append(float(r.stdout.strip().splitlines()[-1]))
+        res[m] = min(tiempos) if tiempos else None
+    return res
+
+def usar_reglas(ruta):
+    """Tabla de reglas de clasificación para este proceso y los que lance (heredan BCS_REGLAS)."""
+    import bcs_core
+    os.environ["BCS_REGLAS"] = ruta
+    bcs_core.configurar_clasificador(*bcs_core.cargar_reglas_csv(ruta))
+
+def _cmd_procesar(args):
+    fecha = datetime.date.fromisoformat(args.inicio) if args.inicio else None
+    rutas, tiempos = procesar(args.ifc, args.salida, fecha, args.rendimiento, args.procesos,
+                              False if args.sin_cache else None, args.status, args.uso,
+                              ifczip=args.ifczip, paquete=args.zip, region=args.region, catalogo=args.catalogo,
+                              calidad=args.calidad, acabado=args.acabado, proveedor=args.proveedor,
+                              lite=args.lite, anterior=args.anterior, tabla=args.tabla)
+    print("\n".join(f"📄 {r}" for r in rutas.values()))
+    print("⏱️ " + " | ".join(f"{k}: {v:.2f} s" for k, v in tiempos.items()))
+    return 0
+
+def _cmd_lote(args):
+    rutas = expandir_entradas(args.entradas)
+    if not rutas: print("⚠️ LOTE: No se encontraron archivos .ifc."); return 1
+    opciones = {"fecha_inicio": datetime.date.fromisoformat(args.inicio) if args.inicio else None,
+                "rendimiento_tn": args.rendimiento, "usar_cache": False if args.sin_cache else None,
+                "iso_status": args.status, "iso_suitability": args.uso, "ifczip": args.ifczip, "paquete": args.zip,
+                "region": args.region, "catalogo": args.catalogo, "calidad": args.calidad, "acabado": args.acabado,
+                "proveedor": args.proveedor, "procesos_render": 1} # El paralelismo ya está entre archivos
+    filas = procesar_lote(rutas, args.salida, args.procesos or None, args.timeout, args.rehacer, **opciones)
+    resumen = tabla_resumen(filas)
+    print(resumen)
+    os.makedirs(args.salida, exist_ok=True)
+    with open(os.path.join(args.salida, "resumen_lote.txt"), "w", encoding="utf-8") as f: f.write(resumen + "\n")
+    return 0 if all(f["estado"] in ("ok", "hecho") for f in filas) else 2
+
+def _cmd_escenarios(args):
+    import bcs_core, bcs_4d
+    datos, _ = bcs_core.extraer_datos_modelo(args.ifc, procesos=args.procesos, usar_cache=False if args.sin_cache else None)
+    if not datos: print(f"⚠️ 4D: {args.ifc}: no se encontraron elementos estructurales."); return 1
+    secuencia = bcs_4d.secuencia_montaje(datos) # Una sola vez para todos los escenarios
+    inicios = [datetime.date.fromisoformat(f) for f in args.inicios] if args.inicios else [datetime.date.today()]
+    resultados = bcs_4d.barrer_escenarios(secuencia, [r * 1000.0 for r in args.rendimientos], inicios, args.cuadrillas,
+                                          args.region)
+    print(bcs_4d.tabla_escenarios(resultados))
+    if args.pdf:
+        os.makedirs(args.salida, exist_ok=True)
+        nombre_base = os.path.splitext(os.path.basename(args.ifc))[0]
+        bcs_4d.generar_informe_escenarios(resultados, os.path.join(args.salida, f"{nombre_base}_4D_Escenarios.pdf"))
+    return 0
+
+def _cmd_validar_lite(args):
+    import bcs_lite
+    informe = bcs_lite.comparar_con_completo(args.ifc, args.tolerancia_z)
+    columnas = [c for c in (informe[0] if informe else {}) if c.startswith("dif_")]
+    print(f"{'ARCHIVO':<40}{'PARTES':>12}" + "".join(f"{c[4:]:>20}" for c in columnas))
+    for f in informe:
+        partes = f"{f['partes_lite']}/{f['partes_completo']}"
+        print(f"{os.path.basename(f['archivo'])[-40:]:<40}{partes:>12}" + "".join(f"{f[c]:>20.2f}" for c in columnas))
+    return 0
+
+def _cmd_catalogo(args):
+    import bcs_catalogo, bcs_core, bcs_5d
+    tarifa = bcs_catalogo.compilar(args.csv).tarifa(args.calidad, args.acabado, args.proveedor)
+    print(f"💶 CATÁLOGO: {len(tarifa.entradas)} precios válidos para la obra.")
+    for ruta in args.ifc:
+        datos, _ = bcs_core.extraer_datos_modelo(ruta, usar_cache=False if args.sin_cache else None)
+        sin_catalogo = bcs_5d.resumen_costes(datos, tarifa)["sin_catalogo"]
+        print(f"{ruta}: {len(sin_catalogo)} perfiles sin precio")
+        for item in sin_catalogo: print(f"   {item['perfil']:<30}{item['cat']:<16}{item['uds']:>6}{item['peso']:>12.1f} kg")
+    return 0
+
+def _cmd_arranque(args):
+    antes = {}
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f: antes = json.load(f)
+    ahora = medir_arranque(repeticiones=args.repeticiones)
+    print(f"{'MÓDULO':<18}{'ANTES (ms)':>12}{'AHORA (ms)':>12}")
+    for m, ms in ahora.items():
+        a = antes.get(m)
+        print(f"{m:<18}{(f'{a:.0f}' if a is not None else '-'):>12}{(f'{ms:.0f}' if ms is not None else 'error'):>12}")
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f: json.dump(ahora, f, indent=1)
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bcs", description="BCS Suite sin interfaz.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("procesar", help="Genera los entregables 4D/5D/6D/7D y el IFC enriquecido de un modelo.")
+    p.add_argument("ifc")
+    p.add_argument("--salida", default=".", help="Carpeta de salida (por defecto, la actual).")
+    p.add_argument("--inicio", help="Fecha de inicio de obra (AAAA-MM-DD, por defecto hoy).")
+    p.add_argument("--rendimiento", type=float, default=1.5, help="Rendimiento de montaje en Tn/día.")
+    p.add_argument("--region", help="Calendario de festivos del 4D (p.ej. ES-MD; por defecto BCS_REGION o ES).")
+    p.add_argument("--procesos", type=int, default=1, help="Procesos de extracción (0 = todos los núcleos).")
+    p.add_argument("--sin-cache", action="store_true", help="No usar la caché de extracciones.")
+    p.add_argument("--status", default="S2", help="Estado ISO 19650.")
+    p.add_argument("--uso", default="Para Información", help="Uso (Suitability) ISO 19650.")
+    p.add_argument("--catalogo", help="Catálogo CSV de precios 5D (por defecto BCS_CATALOGO; sin él, precio por capítulo).")
+    p.add_argument("--calidad", help="Calidad del acero de la obra en el catálogo (p.ej. S275).")
+    p.add_argument("--acabado", help="Acabado de la obra en el catálogo (p.ej. GALVANIZADO).")
+    p.add_argument("--proveedor", help="Proveedor de la obra en el catálogo.")
+    p.add_argument("--ifczip", action="store_true", help="Guarda el IFC enriquecido comprimido (.ifczip).")
+    p.add_argument("--zip", action="store_true", help="Empaqueta además todos los entregables en un ZIP.")
+    p.add_argument("--tabla", action="store_true", help="Guarda además la tabla de partes (.npz) para la próxima revisión.")
+    p.add_argument("--reglas", help="Reglas de clasificación CSV (categoria;campo;patron; por defecto BCS_REGLAS).")
+    modo = p.add_mutually_exclusive_group()
+    modo.add_argument("--lite", action="store_true", help="Extracción rápida sin ifcopenshell: solo los PDF (sin IFC enriquecido).")
+    modo.add_argument("--anterior", help="Tabla .npz de la revisión anterior (--tabla): solo re-extrae las partes cambiadas.")
+    p.set_defaults(funcion=_cmd_procesar)
+
+    p = sub.add_parser("lote", help="Procesa una carpeta o patrón de IFC en paralelo (un proceso por archivo).")
+    p.add_argument("entradas", nargs="+", help="Carpetas y/o patrones glob (p.ej. 'obras/**/*.ifc').")
+    p.add_argument("--salida", default="resultados_lote", help="Carpeta raíz; cada IFC tiene su subcarpeta.")
+    p.add_argument("--procesos", type=int, default=0, help="Archivos a la vez (0 = todos los núcleos).")
+    p.add_argument("--timeout", type=float, default=None, help="Segundos máximos por archivo.")
+    p.add_argument("--rehacer", action="store_true", help="Reprocesa también los archivos ya terminados.")
+    p.add_argument("--inicio", help="Fecha de inicio de obra (AAAA-MM-DD, por defecto hoy).")
+    p.add_argument("--rendimiento", type=float, default=1.5, help="Rendimiento de montaje en Tn/día.")
+    p.add_argument("--region", help="Calendario de festivos del 4D (p.ej. ES-MD; por defecto BCS_REGION o ES).")
+    p.add_argument("--sin-cache", action="store_true", help="No usar la caché de extracciones.")
+    p.add_argument("--status", default="S2", help="Estado ISO 19650.")
+    p.add_argument("--uso", default="Para Información", help="Uso (Suitability) ISO 19650.")
+    p.add_argument("--catalogo", help="Catálogo CSV de precios 5D (por defecto BCS_CATALOGO; sin él, precio por capítulo).")
+    p.add_argument("--calidad", help="Calidad del acero de la obra en el catálogo (p.ej. S275).")
+    p.add_argument("--acabado", help="Acabado de la obra en el catálogo (p.ej. GALVANIZADO).")
+    p.add_argument("--proveedor", help="Proveedor de la obra en el catálogo.")
+    p.add_argument("--ifczip", action="store_true", help="Guarda el IFC enriquecido comprimido (.ifczip).")
+    p.add_argument("--zip", action="store_true", help="Empaqueta además los entregables de cada archivo en un ZIP.")
+    p.add_argument("--reglas", help="Reglas de clasificación CSV (categoria;campo;patron; por defecto BCS_REGLAS).")
+    p.set_defaults(funcion=_cmd_lote)
+
+    p = sub.add_parser("catalogo", help="Compila un catálogo de precios 5D y lista los perfiles sin precio.")
+    p.add_argument("csv", help="Catálogo CSV (perfil;precio_kg[;categoria;calidad;acabado;proveedor]).")
+    p.add_argument("ifc", nargs="*", help="Modelos a comprobar contra el catálogo.")
+    p.add_argument("--calidad", help="Calidad del acero de la obra (p.ej. S275).")
+    p.add_argument("--acabado", help="Acabado de la obra (p.ej. GALVANIZADO).")
+    p.add_argument("--proveedor", help="Proveedor de la obra.")
+    p.add_argument("--sin-cache", action="store_true", help="No usar la caché de extracciones.")
+    p.add_argument("--reglas", help="Reglas de clasificación CSV (categoria;campo;patron; por defecto BCS_REGLAS).")
+    p.set_defaults(funcion=_cmd_catalogo)
+
+    p = sub.add_parser("validar-lite", help="Compara la extracción lite con la completa (partes, peso y columnas).")
+    p.add_argument("ifc", nargs="+", help="Modelos de validación.")
+    p.add_argument("--tolerancia-z", type=float, default=1.0, help="Diferencia de cota (mm) que se admite como igual.")
+    p.add_argument("--reglas", help="Reglas de clasificación CSV (categoria;campo;patron; por defecto BCS_REGLAS).")
+    p.set_defaults(funcion=_cmd_validar_lite)
+
+    p = sub.add_parser("escenarios", help="Compara plazos 4D para varios rendimientos, cuadrillas y fechas de inicio.")
+    p.add_argument("ifc")
+    p.add_argument("--rendimientos", type=float, nargs="+", default=[1.5], help="Rendimientos por cuadrilla en Tn/día.")
+    p.add_argument("--region", help="Calendario de festivos del 4D (p.ej. ES-MD; por defecto BCS_REGION o ES).")
+    p.add_argument("--cuadrillas", type=int, nargs="+", default=[1], help="Número de cuadrillas.")
+    p.add_argument("--inicios", nargs="+", help="Fechas de inicio de obra (AAAA-MM-DD, por defecto hoy).")
+    p.add_argument("--procesos", type=int, default=1, help="Procesos de extracción (0 = todos los núcleos).")
+    p.add_argument("--sin-cache", action="store_true", help="No usar la caché de extracciones.")
+    p.add_argument("--pdf", action="store_true", help="Genera además el PDF comparativo.")
+    p.add_argument("--salida", default=".", help="Carpeta del PDF (por defecto, la actual).")
+    p.add_argument("--reglas", help="Reglas de clasificación CSV (categoria;campo;patron; por defecto BCS_REGLAS).")
+    p.set_defaults(funcion=_cmd_escenarios)
+
+    p = sub.add_parser("arranque", help="Mide el tiempo de importación de cada módulo.")
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.add_argument("--guardar", help="Guarda la medida en JSON (para comparar después).")
+    p.add_argument("--comparar", help="JSON de una medida anterior.")
+    p.set_defaults(funcion=_cmd_arranque)
+
+    args = parser.parse_args(argv)
+    if getattr(args, "reglas", None): usar_reglas(args.reglas)
+    return args.funcion(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
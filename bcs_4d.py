@@ -1,11 +1,10 @@
 # bcs_4d.py
 from fpdf import FPDF
 import datetime
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 import os
-import statistics
-import ifcopenshell.util.element 
+import numpy as np
+import bcs_agregacion
+import bcs_calendario
 
 # --- CONFIGURACIÓN ---
 import os
@@ -14,189 +13,207 @@ CARPETA_ACTUAL = os.path.dirname(os.path.abspath(__file__))
 # Esto combina esa ruta con el nombre del logo
 ARCHIVO_LOGO = os.path.join(CARPETA_ACTUAL, "logo.jpg")
 
-# Debug: Imprimir dónde está buscando para que lo veas en la consola
-print(f"🔍 Buscando logo en: {ARCHIVO_LOGO}")
-
-ARCHIVO_GANTT = "gantt_temp.png"
+COLORES_GANTT = {"PILARES": (139, 69, 19), "VIGAS": (70, 130, 180)}
+ALTO_FILA_GANTT = 6.0 # mm por fase en el cronograma
 UMBRAL_VIGAS_POR_NIVEL = 8
 TOLERANCIA_AGRUPACION_MM = 400.0
 UMBRAL_PESO_PILAR_KG = 160.0 
+DESNIVEL_PILAR_MM = 1800.0
+PERFILES_PESADOS = ("HEA", "HEB", "HEM", "HD", "SHS", "RHS", "TUB", "IPE", "UPN", "W")
 
-def consolidar_por_conjuntos(datos_brutos):
+def consolidar_por_conjuntos(tabla):
     """
-    Agrupa piezas usando 'assembly_mark' para el cálculo.
+    Agrupa piezas usando 'assembly_mark' para el cálculo (sobre las columnas de la tabla).
     """
     print("🧩 4D: Reagrupando por ASSEMBLY MARK...")
-    grupos = {}
+    cols = tabla.columnas
+    g = bcs_agregacion.resumen_conjuntos(tabla)
+    grupo = bcs_agregacion.agregacion(tabla).grupo_por_fila(g)
+    filas = np.flatnonzero(grupo >= 0); grupo = grupo[filas]
     
-    for item in datos_brutos:
-        if item.get("es_tornillo", False) or item["categoria"] == "TORNILLERIA": continue
-        
-        ref_conjunto = item.get("assembly_mark", "S/R")
-        
-        if ref_conjunto not in grupos:
-            grupos[ref_conjunto] = {
-                "peso_total": 0.0, 
-                "partes": [],  # Aquí guardamos las piezas originales
-                "z_min": 99999.0
-            }
-        
-        grupos[ref_conjunto]["peso_total"] += item["peso_kg"]
-        grupos[ref_conjunto]["partes"].append(item)
-        z = item.get("altura_z", 0.0)
-        if z < grupos[ref_conjunto]["z_min"]: grupos[ref_conjunto]["z_min"] = z
+    # Orden por (conjunto, peso desc.): la primera pieza de cada conjunto es la maestra
+    orden = np.lexsort((-cols["peso_kg"][filas], grupo))
+    inicios = np.flatnonzero(np.r_[True, grupo[orden][1:] != grupo[orden][:-1]]) if len(orden) else orden
+    partes = np.split(filas[orden], inicios[1:])
+    z_min = np.minimum(g["z_min"], 99999.0)
     
     datos_consolidados = []
-    for ref, g in grupos.items():
-        g["partes"].sort(key=lambda x: x["peso_kg"], reverse=True)
-        maestro = g["partes"][0]
-        
+    for k, (ref,) in enumerate(g["claves"]):
+        maestro = partes[k][0]
         datos_consolidados.append({
             "referencia": ref,
-            "perfil_maestro": maestro["perfil_maestro"],
-            "categoria": maestro["categoria"],
-            "peso_kg": g["peso_total"],
-            "altura_z": g["z_min"],
-            "objeto_ifc": maestro["objeto_ifc"],
-            "items_originales": g["partes"], # <--- CLAVE: Guardamos referencia a los originales
+            "perfil_maestro": tabla.valor("perfil_maestro", maestro),
+            "categoria": tabla.valor("categoria", maestro),
+            "peso_kg": float(g["peso_kg"][k]),
+            "altura_z": float(z_min[k]),
+            "id_ifc": int(cols["id"][maestro]),
+            "desnivel_maestro": float(cols["desnivel_mm"][maestro]), # Psets top/bottom elevation (extracción)
+            "filas_originales": partes[k], # <--- CLAVE: Filas de las piezas originales en la tabla
             "es_tornillo": False,
             "bcs_fase": "" 
         })
         
-    print(f"   -> {len(datos_brutos)} partes reducidas a -> {len(datos_consolidados)} conjuntos.")
+    print(f"   -> {len(tabla)} partes reducidas a -> {len(datos_consolidados)} conjuntos.")
     return datos_consolidados
 
 def obtener_desnivel_geometrico(item):
-    if "objeto_ifc" not in item: return 0.0
-    elemento = item["objeto_ifc"]
-    psets = ifcopenshell.util.element.get_psets(elemento)
-    bottom = None; top = None
-    for ps in psets.values():
-        for k, v in ps.items():
-            k_low = k.lower()
-            if "bottom elevation" in k_low: 
-                try: bottom = float(str(v).replace('+', ''))
-                except: pass
-            if "top elevation" in k_low: 
-                try: top = float(str(v).replace('+', ''))
-                except: pass
-    if bottom is not None and top is not None:
-        if abs(top) < 200: top *= 1000.0
-        if abs(bottom) < 200: bottom *= 1000.0
-        return abs(top - bottom)
-    return 0.0
+    return item.get("desnivel_maestro", 0.0) # Ya viene en la tabla (también de la caché)
+
+def marcar_verticales(datos):
+    """
+    Verticalidad de cada conjunto, calculada UNA vez y guardada en el item ("es_vertical",
+    "desnivel_mm"). El desnivel (Psets top/bottom elevation) solo se lee de los candidatos
+    a pilar: pesados y con perfil de pilar (comprobado una vez por perfil distinto).
+    """
+    pesados = {}
+    for item in datos:
+        if "es_vertical" in item: continue
+        nombre = str(item.get("perfil_maestro", "")).upper()
+        if nombre not in pesados: pesados[nombre] = any(x in nombre for x in PERFILES_PESADOS)
+        candidato = item.get("peso_kg", 0.0) >= UMBRAL_PESO_PILAR_KG and pesados[nombre]
+        item["desnivel_mm"] = obtener_desnivel_geometrico(item) if candidato else 0.0
+        item["es_vertical"] = item["desnivel_mm"] > DESNIVEL_PILAR_MM
+    return np.fromiter((item["es_vertical"] for item in datos), dtype=bool, count=len(datos))
 
 def es_vertical_geometrico(item):
-    peso = item.get("peso_kg", 0.0)
-    if peso < UMBRAL_PESO_PILAR_KG: return False
-    nombre = str(item.get("perfil_maestro", "")).upper()
-    es_perfil_pesado = any(x in nombre for x in ["HEA", "HEB", "HEM", "HD", "SHS", "RHS", "TUB", "IPE", "UPN", "W"])
-    if not es_perfil_pesado: return False 
-    desnivel = obtener_desnivel_geometrico(item)
-    if desnivel > 1800.0: return True
-    return False
+    if "es_vertical" not in item: marcar_verticales([item])
+    return item["es_vertical"]
+
+def agrupar_niveles(alturas):
+    """
+    Niveles maestros por huecos: se ordenan las cotas y se corta donde el salto entre dos
+    consecutivas llega a la tolerancia. Los grupos con suficientes vigas dan un nivel (su media).
+    """
+    z = np.sort(np.asarray(alturas, dtype=np.float64))
+    if not len(z): return np.array([0.0])
+    inicios = np.r_[0, np.flatnonzero(np.diff(z) >= TOLERANCIA_AGRUPACION_MM) + 1]
+    tam = np.diff(np.r_[inicios, len(z)])
+    medias = np.add.reduceat(z, inicios) / tam
+    niveles = medias[tam >= UMBRAL_VIGAS_POR_NIVEL]
+    return niveles if len(niveles) else np.array([z.mean()])
 
 def detectar_niveles_maestros(datos):
-    alturas = []
-    for item in datos:
-        if not es_vertical_geometrico(item): alturas.append(item["altura_z"])
-    if not alturas: return [0.0]
-    alturas.sort()
-    niveles = []; actual = [alturas[0]]
-    for z in alturas[1:]:
-        if z - actual[-1] < TOLERANCIA_AGRUPACION_MM: actual.append(z)
-        else:
-            if len(actual) >= UMBRAL_VIGAS_POR_NIVEL: niveles.append(statistics.mean(actual))
-            actual = [z]
-    if len(actual) >= UMBRAL_VIGAS_POR_NIVEL: niveles.append(statistics.mean(actual))
-    if not niveles: return [statistics.mean(alturas)]
-    return niveles
+    verticales = marcar_verticales(datos)
+    alturas = np.fromiter((item["altura_z"] for item in datos), dtype=np.float64, count=len(datos))
+    return agrupar_niveles(alturas[~verticales])
 
-def calcular_fechas_para_ifc(datos_brutos, fecha_inicio_obra, rendimiento_kg_dia):
-    # 1. Agrupar
+def nivel_cercano(niveles, z):
+    """Nivel más próximo a cada cota (búsqueda binaria; a igual distancia, el de abajo)."""
+    z = np.asarray(z, dtype=np.float64)
+    if len(niveles) == 1: return np.full(z.shape, niveles[0])
+    i = np.clip(np.searchsorted(niveles, z), 1, len(niveles) - 1)
+    abajo = niveles[i - 1]; arriba = niveles[i]
+    return np.where(z - abajo <= arriba - z, abajo, arriba)
+
+def secuencia_montaje(datos_brutos):
+    """
+    Conjuntos con su fase (nivel + pilares/vigas) en orden de montaje: nivel, pilares antes que
+    vigas y de más a menos peso. No depende del rendimiento ni de la fecha: se prepara una vez.
+    """
+    # 1. Agrupar (todo sale de las columnas: no hace falta el modelo IFC)
     datos_proc = consolidar_por_conjuntos(datos_brutos)
-    # 2. Niveles
+    # 2. Niveles (sobre arrays: verticalidad cacheada por conjunto)
     niveles = detectar_niveles_maestros(datos_proc)
+    es_col = marcar_verticales(datos_proc)
+    z = np.fromiter((item["altura_z"] for item in datos_proc), dtype=np.float64, count=len(datos_proc))
+    peso = np.fromiter((item["peso_kg"] for item in datos_proc), dtype=np.float64, count=len(datos_proc))
+    # Pilares: al metro más cercano; vigas: al nivel maestro más cercano
+    z_nivel = np.where(es_col, np.round(z / 1000.0) * 1000.0, nivel_cercano(niveles, z))
     
-    def nivel_cercano(z): return min(niveles, key=lambda x: abs(x - z))
-    
-    validos = []
-    for item in datos_proc:
-        es_col = es_vertical_geometrico(item)
-        z = item["altura_z"]
-        
-        if es_col: z_nivel = round(z/1000.0)*1000.0 
-        else: z_nivel = nivel_cercano(z)            
-        
-        tipo = "PILARES" if es_col else "VIGAS"
-        item["bcs_fase"] = f"NIVEL +{z_nivel/1000.0:.2f}m | {tipo}"
-        item["_sort_z"] = z_nivel
-        item["_sort_tipo"] = "01" if es_col else "02" 
-        validos.append(item)
+    for k, item in enumerate(datos_proc):
+        tipo = "PILARES" if es_col[k] else "VIGAS"
+        item["bcs_fase"] = f"NIVEL +{z_nivel[k]/1000.0:.2f}m | {tipo}"
+        item["_sort_z"] = float(z_nivel[k])
+        item["_sort_tipo"] = "01" if es_col[k] else "02" 
         
-    ordenados = sorted(validos, key=lambda x: (x["_sort_z"], x["_sort_tipo"], -x["peso_kg"]))
+    # Orden (nivel, pilares antes que vigas, peso desc.)
+    orden = np.lexsort((-peso, ~es_col, z_nivel))
+    return [datos_proc[k] for k in orden]
+
+def calcular_fechas_para_ifc(datos_brutos, fecha_inicio_obra, rendimiento_kg_dia, region=None):
+    ordenados = secuencia_montaje(datos_brutos)
+    if not ordenados: return ordenados
     
-    # 3. Asignar Fechas
-    cursor = fecha_inicio_obra
-    acum = 0.0
-    for item in ordenados:
-        p = item["peso_kg"]
-        if acum + p <= rendimiento_kg_dia: acum += p
-        else:
-            cursor += datetime.timedelta(days=1)
-            if cursor.weekday() >= 5: cursor += datetime.timedelta(days=(7-cursor.weekday()))
-            acum = p
-        item["bcs_fecha_plan"] = cursor
-        
-        # --- PROPAGACIÓN INVERSA (NUEVO) ---
-        # Pasamos la fecha calculada para el CONJUNTO a todas las PIEZAS ORIGINALES
-        # para que el Injector las encuentre después.
-        if "items_originales" in item:
-            for pieza in item["items_originales"]:
-                pieza["bcs_fecha_plan"] = cursor
-                pieza["bcs_fase"] = item["bcs_fase"]
+    # 3. Asignar Fechas en bloque: día de obra de cada conjunto -> calendario laborable de la región
+    peso = np.fromiter((item["peso_kg"] for item in ordenados), dtype=np.float64, count=len(ordenados))
+    fin = dias_de_montaje(peso, [rendimiento_kg_dia])[:, 0]
+    dia = np.searchsorted(fin, np.arange(len(peso)), side="right")
+    calendario = bcs_calendario.calendario_para(fecha_inicio_obra, int(dia[-1]), region)
+    fechas = calendario.fechas(fecha_inicio_obra, dia)
+    
+    # --- PROPAGACIÓN INVERSA (NUEVO) ---
+    # Pasamos la fecha calculada para el CONJUNTO a todas las PIEZAS ORIGINALES
+    # (columnas de la tabla) para que el Injector las encuentre después.
+    filas = [item["filas_originales"] for item in ordenados]
+    datos_brutos.columnas["bcs_fecha_plan"][np.concatenate(filas)] = np.repeat(fechas, [len(f) for f in filas])
+    for item, fecha in zip(ordenados, fechas.tolist()):
+        item["bcs_fecha_plan"] = fecha
+        datos_brutos.asignar_categoria("bcs_fase", item["filas_originales"], item["bcs_fase"])
 
     return ordenados
 
-def generar_imagen_gantt(datos, rendimiento_tn):
-    print("📊 4D: Dibujando Gantt...")
-    fechas_fases = {}
-    fases_ordenadas = [] 
-    datos_dibujo = sorted([d for d in datos if "bcs_fase" in d], key=lambda x: (x["_sort_z"], x["_sort_tipo"]))
-    for item in datos_dibujo:
-        fase = item["bcs_fase"]
-        if fase not in fechas_fases: 
-            fechas_fases[fase] = []
-            if fase not in fases_ordenadas: fases_ordenadas.append(fase)
-        fechas_fases[fase].append(item["bcs_fecha_plan"])
-    if not fases_ordenadas: return 1.0
-    
-    num_barras = len(fases_ordenadas)
-    ancho_fig = 10.0; altura_fig = max(4.0, num_barras * 0.5 + 2.0)
-    if altura_fig > 15.0: altura_fig = 15.0 
-    
-    fig, ax = plt.subplots(figsize=(ancho_fig, altura_fig))
-    y_pos = 0; etiquetas = []; colores = {"PILARES": "#8B4513", "VIGAS": "#4682B4"} 
-    
-    for fase in fases_ordenadas:
-        fechas = sorted(fechas_fases[fase])
-        inicio = fechas[0]; fin = fechas[-1]
-        duracion = (fin - inicio).days + 1
-        tipo = "PILARES" if "PILARES" in fase else "VIGAS"
-        color = colores.get(tipo, "#555555")
-        ax.barh(y_pos, duracion, left=inicio, height=0.6, align='center', color=color, alpha=0.9, edgecolor='black')
-        etiquetas.append(fase)
-        ax.text(inicio, y_pos + 0.35, f"{inicio.strftime('%d/%m')}", fontsize=8)
-        if duracion > 3: ax.text(fin, y_pos + 0.35, f"{fin.strftime('%d/%m')}", fontsize=8)
-        y_pos += 1
-    
-    ax.set_yticks(range(len(etiquetas))); ax.set_yticklabels(etiquetas)
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d-%b'))
-    ax.xaxis.set_major_locator(mdates.DayLocator(interval=5))
-    ax.grid(True, linestyle='--', alpha=0.5)
-    ax.set_title(f"CRONOGRAMA DE MONTAJE ({rendimiento_tn} Tn/día)")
-    plt.tight_layout(); plt.savefig(ARCHIVO_GANTT, dpi=100); plt.close()
-    return ancho_fig / altura_fig
+# --- ESCENARIOS (WHAT-IF) ---
+def dias_de_montaje(pesos, capacidades):
+    """
+    Reparto en días de la secuencia para varias capacidades (kg/día) a la vez, con la regla del
+    planificador: un conjunto entra en el día si cabe; si no, abre día (aunque él solo la supere).
+    Cada paso cierra un día de todos los escenarios con searchsorted sobre el peso acumulado.
+    Devuelve una matriz (días, escenarios) con el fin (exclusivo) de cada día; al acabar queda en n.
+    """
+    acumulado = np.r_[0.0, np.cumsum(pesos, dtype=np.float64)]; n = len(acumulado) - 1
+    capacidades = np.asarray(capacidades, dtype=np.float64)
+    inicio = np.zeros(len(capacidades), dtype=np.int64); finales = []
+    while True:
+        fin = np.searchsorted(acumulado, acumulado[inicio] + capacidades, side="right") - 1
+        if finales: fin = np.maximum(fin, inicio + 1) # El día 0 puede quedar vacío (primer conjunto > capacidad)
+        fin = np.minimum(fin, n); finales.append(fin); inicio = fin
+        if (inicio >= n).all(): return np.array(finales)
+
+def barrer_escenarios(secuencia, rendimientos_kg, fechas_inicio, cuadrillas=(1,), region=None):
+    """
+    Compara escenarios (rendimiento x cuadrillas x fecha de inicio) sobre una secuencia ya
+    preparada con secuencia_montaje: todas las capacidades se resuelven en una sola pasada y las
+    fechas salen del calendario laborable de la región (bcs_calendario).
+    Devuelve una fila por escenario con dias, fecha_fin, pico_kg, dias_por_nivel y carga_diaria.
+    """
+    if not secuencia: return []
+    peso = np.array([item["peso_kg"] for item in secuencia]); z = np.array([item["_sort_z"] for item in secuencia])
+    combinaciones = [(r, c) for r in rendimientos_kg for c in cuadrillas]
+    finales = dias_de_montaje(peso, [r * c for r, c in combinaciones])
+    acumulado = np.r_[0.0, np.cumsum(peso)]
+    # Los niveles son tramos contiguos de la secuencia
+    inicio_nivel = np.flatnonzero(np.r_[True, z[1:] != z[:-1]]); fin_nivel = np.r_[inicio_nivel[1:], len(z)] - 1
+    resultados = []
+    for j, (rendimiento, n_cuadrillas) in enumerate(combinaciones):
+        fin = finales[:int(np.searchsorted(finales[:, j], len(peso))) + 1, j]
+        dia = np.searchsorted(fin, np.arange(len(peso)), side="right")
+        carga = np.diff(np.r_[0.0, acumulado[fin]])
+        por_nivel = {f"NIVEL +{z[a]/1000.0:.2f}m": int(dia[b] - dia[a] + 1) for a, b in zip(inicio_nivel, fin_nivel)}
+        for fecha in fechas_inicio:
+            calendario = bcs_calendario.calendario_para(fecha, len(fin) - 1, region)
+            resultados.append({
+                "rendimiento_kg": float(rendimiento), "cuadrillas": int(n_cuadrillas), "fecha_inicio": fecha,
+                "dias": len(fin), "fecha_fin": calendario.fechas(fecha, len(fin) - 1).item(),
+                "pico_kg": float(carga.max()), "dias_por_nivel": por_nivel, "carga_diaria": carga
+            })
+    return resultados
+
+def tabla_escenarios(resultados):
+    """Tabla de texto de la comparativa (ordenada por fecha de fin)."""
+    cab = f"{'Tn/DÍA':>8}{'CUADR.':>8}{'INICIO':>12}{'DÍAS':>7}{'FIN':>12}{'PICO kg':>10}"
+    lineas = [cab, "-" * len(cab)]
+    for r in sorted(resultados, key=lambda r: (r["fecha_fin"], r["dias"])):
+        lineas.append(f"{r['rendimiento_kg']/1000.0:>8.2f}{r['cuadrillas']:>8}{r['fecha_inicio'].strftime('%d-%m-%Y'):>12}"
+                      f"{r['dias']:>7}{r['fecha_fin'].strftime('%d-%m-%Y'):>12}{r['pico_kg']:>10.0f}")
+    return "\n".join(lineas)
+
+def fases_gantt(datos):
+    """(fase, primer día, último día) de cada fase constructiva, en orden de montaje."""
+    rangos = {}
+    for item in sorted((d for d in datos if "bcs_fase" in d), key=lambda x: (x["_sort_z"], x["_sort_tipo"])):
+        f = item["bcs_fecha_plan"]; r = rangos.get(item["bcs_fase"])
+        rangos[item["bcs_fase"]] = (f, f) if r is None else (min(r[0], f), max(r[1], f))
+    return [(fase, ini, fin) for fase, (ini, fin) in rangos.items()]
 
 class InformePlanificacion(FPDF):
     def header(self):
@@ -209,19 +226,65 @@ class InformePlanificacion(FPDF):
     def footer(self):
         self.set_y(-15); self.set_font('Arial', 'I', 8)
         self.cell(0, 10, f'Pag {self.page_no()}', 0, 0, 'C')
-    def crear_portada(self, ratio_imagen, rendimiento):
+    def crear_portada(self, rendimiento, fases=()):
         self.add_page()
         if os.path.exists(ARCHIVO_LOGO): self.image(ARCHIVO_LOGO, x=65, y=30, w=80)
         self.ln(80); self.set_font('Arial', 'B', 24); self.cell(0, 20, "PLANIFICACIÓN 4D", 0, 1, 'C')
         self.set_font('Arial', '', 16); self.cell(0, 10, "SECUENCIA DE MONTAJE", 0, 1, 'C')
         self.ln(10); self.set_font('Arial', 'I', 12); self.cell(0, 10, f"Escenario de montaje: {rendimiento} Tn/dia", 0, 1, 'C')
-        if os.path.exists(ARCHIVO_GANTT):
-            self.ln(5); ancho_max = 190.0; alto_max = 120.0
-            w_final = ancho_max; h_final = w_final / ratio_imagen
-            if h_final > alto_max: h_final = alto_max; w_final = h_final * ratio_imagen
-            x_centrada = (210 - w_final) / 2
-            try: self.image(ARCHIVO_GANTT, x=x_centrada, w=w_final, h=h_final)
-            except: pass
+        if fases: self.ln(5); self.dibujar_gantt(fases, rendimiento)
+    def dibujar_gantt(self, fases, rendimiento):
+        """Cronograma vectorial (barras, fechas y eje de días). Si no cabe, sigue en páginas nuevas."""
+        x0 = 10.0; ancho_etiqueta = 48.0; x_barras = x0 + ancho_etiqueta; ancho = 190.0 - ancho_etiqueta
+        inicio = min(i for _, i, _ in fases); dias = (max(f for _, _, f in fases) - inicio).days + 1
+        escala = ancho / dias; y_max = self.h - 20.0
+        paso = next((p for p in (1, 2, 5, 7, 14, 30, 60, 90, 180) if p * escala >= 12.0), 365) # Marcas del eje a >= 12 mm
+        k = 0
+        while k < len(fases):
+            if self.get_y() + 4 * ALTO_FILA_GANTT > y_max: self.add_page()
+            self.set_font('Arial', 'B', 10); self.set_text_color(0)
+            self.cell(0, 6, f"CRONOGRAMA DE MONTAJE ({rendimiento} Tn/día){' (cont.)' if k else ''}", 0, 1, 'C')
+            y_eje = self.get_y() + 4
+            tramo = fases[k:k + max(1, int((y_max - y_eje) // ALTO_FILA_GANTT))]
+            y_fin = y_eje + len(tramo) * ALTO_FILA_GANTT
+            # Eje de fechas y rejilla
+            self.set_font('Arial', '', 6); self.set_line_width(0.1); self.set_draw_color(190)
+            for d in range(0, dias, paso):
+                x = x_barras + d * escala
+                self.dashed_line(x, y_eje, x, y_fin, 1, 1)
+                marca = (inicio + datetime.timedelta(days=d)).strftime('%d/%m')
+                if x + 0.5 + self.get_string_width(marca) <= x_barras + ancho: self.text(x + 0.5, y_eje - 1, marca)
+            self.set_draw_color(0); self.line(x_barras, y_eje, x_barras + ancho, y_eje)
+            # Una barra por fase: fecha en blanco dentro si cabe; si no, a la derecha (o a la izquierda)
+            for j, (fase, ini, fin) in enumerate(tramo):
+                y = y_eje + j * ALTO_FILA_GANTT
+                self.set_font('Arial', '', 7); self.set_text_color(0); self.set_xy(x0, y)
+                self.cell(ancho_etiqueta - 1, ALTO_FILA_GANTT, fase[:40], 0, 0, 'R')
+                xi = x_barras + (ini - inicio).days * escala; w = ((fin - ini).days + 1) * escala
+                self.set_fill_color(*COLORES_GANTT.get("PILARES" if "PILARES" in fase else "VIGAS"))
+                self.rect(xi, y + 1, w, ALTO_FILA_GANTT - 2, 'DF')
+                etiqueta = ini.strftime('%d/%m') + ('' if fin == ini else f" - {fin.strftime('%d/%m')}")
+                self.set_font('Arial', '', 6); ancho_txt = self.get_string_width(etiqueta)
+                if ancho_txt + 2 <= w: self.set_text_color(255); xt = xi + (w - ancho_txt) / 2
+                elif xi + w + 1 + ancho_txt <= x_barras + ancho: xt = xi + w + 1
+                else: xt = max(x_barras, xi - ancho_txt - 1)
+                self.text(xt, y + ALTO_FILA_GANTT / 2 + 0.8, etiqueta); self.set_text_color(0)
+            self.set_y(y_fin + 4); k += len(tramo)
+        self.set_fill_color(255)
+    def dibujar_escenarios(self, resultados):
+        """Barra de días laborables por escenario (vectorial), de menos a más duración."""
+        x0 = 10.0; ancho_etiqueta = 55.0; x_barras = x0 + ancho_etiqueta; ancho = 190.0 - ancho_etiqueta - 25.0
+        escala = ancho / max(r["dias"] for r in resultados)
+        for r in sorted(resultados, key=lambda r: (r["fecha_fin"], r["dias"])):
+            if self.get_y() + ALTO_FILA_GANTT > self.h - 20.0: self.add_page()
+            y = self.get_y(); self.set_font('Arial', '', 7); self.set_xy(x0, y)
+            self.cell(ancho_etiqueta - 1, ALTO_FILA_GANTT, f"{r['rendimiento_kg']/1000.0:g} Tn/día x {r['cuadrillas']} | "
+                      f"{r['fecha_inicio'].strftime('%d/%m/%y')}", 0, 0, 'R')
+            self.set_fill_color(*COLORES_GANTT["VIGAS"]); self.rect(x_barras, y + 1, r["dias"] * escala, ALTO_FILA_GANTT - 2, 'DF')
+            self.text(x_barras + r["dias"] * escala + 1, y + ALTO_FILA_GANTT / 2 + 0.8,
+                      f"{r['dias']} d -> {r['fecha_fin'].strftime('%d/%m/%y')}")
+            self.set_y(y + ALTO_FILA_GANTT)
+        self.set_fill_color(255)
     def cabecera_tabla(self):
         self.set_font('Arial', 'B', 8); self.set_fill_color(240, 240, 240)
         self.cell(20, 6, "Fecha", 1, 0, 'C', 1); self.cell(40, 6, "Nivel", 1, 0, 'L', 1)
@@ -236,17 +299,21 @@ class InformePlanificacion(FPDF):
         self.cell(75, 6, str(desc)[:45], 1)
         self.cell(20, 6, f"{peso:.1f}", 1, 1, 'R')
 
-def generar_informe_4d(datos, fecha_inicio_obra, rendimiento_kg, nombre_pdf="BCS_Planificacion.pdf"):
+def generar_informe_4d(datos, fecha_inicio_obra, rendimiento_kg, nombre_pdf="BCS_Planificacion.pdf", region=None):
     # 1. Calcular cronograma con lógica de conjuntos
-    datos_consolidados = calcular_fechas_para_ifc(datos, fecha_inicio_obra, rendimiento_kg)
+    datos_consolidados = calcular_fechas_para_ifc(datos, fecha_inicio_obra, rendimiento_kg, region)
+    renderizar_informe_4d(datos_consolidados, rendimiento_kg, nombre_pdf)
+
+def renderizar_informe_4d(datos_consolidados, rendimiento_kg, nombre_pdf="BCS_Planificacion.pdf"):
+    """Gantt + PDF a partir de calcular_fechas_para_ifc (no toca la tabla de partes)."""
     rendimiento_tn = rendimiento_kg / 1000.0
     
-    # 2. Generar Gráfico
-    ratio = generar_imagen_gantt(datos_consolidados, rendimiento_tn)
+    # 2. Fases del cronograma (el Gantt se dibuja en vectorial dentro del PDF)
+    fases = fases_gantt(datos_consolidados)
     
     # 3. Generar PDF
     print(f"📅 4D: Generando PDF '{nombre_pdf}'..."); pdf = InformePlanificacion()
-    pdf.crear_portada(ratio, rendimiento_tn)
+    pdf.crear_portada(rendimiento_tn, fases)
     
     # Listado
     pdf.add_page()
@@ -271,6 +338,24 @@ def generar_informe_4d(datos, fecha_inicio_obra, rendimiento_kg, nombre_pdf="BCS
          pdf.cell(170, 5, f"TOTAL ACERO DIA {fecha_actual.strftime('%d-%m-%Y')}:", 1, 0, 'R', 1)
          pdf.cell(20, 5, f"{peso_dia:.1f} kg", 1, 1, 'R', 1)
 
-    if os.path.exists(ARCHIVO_GANTT): os.remove(ARCHIVO_GANTT)
     pdf.output(nombre_pdf)
-    print("✅ 4D: Informe guardado (Por Conjuntos).")
\ No newline at end of file
+    print("✅ 4D: Informe guardado (Por Conjuntos).")
+
+def generar_informe_escenarios(resultados, nombre_pdf="BCS_Escenarios_4D.pdf"):
+    """PDF con la comparativa de escenarios de barrer_escenarios: tabla + gráfico de duraciones."""
+    print(f"📅 4D: Generando comparativa de {len(resultados)} escenarios '{nombre_pdf}'..."); pdf = InformePlanificacion()
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 16); pdf.cell(0, 12, "COMPARATIVA DE ESCENARIOS 4D", 0, 1, 'C'); pdf.ln(3)
+    pdf.set_font('Arial', 'B', 8); pdf.set_fill_color(240, 240, 240)
+    for titulo, w in (("Tn/día", 25), ("Cuadrillas", 25), ("Inicio", 30), ("Días lab.", 25), ("Fin", 30), ("Pico (kg/día)", 35)):
+        pdf.cell(w, 6, titulo, 1, 0, 'C', 1)
+    pdf.ln()
+    pdf.set_font('Arial', '', 8)
+    for r in sorted(resultados, key=lambda r: (r["fecha_fin"], r["dias"])):
+        pdf.cell(25, 5, f"{r['rendimiento_kg']/1000.0:g}", 1, 0, 'C'); pdf.cell(25, 5, str(r["cuadrillas"]), 1, 0, 'C')
+        pdf.cell(30, 5, r["fecha_inicio"].strftime('%d-%m-%Y'), 1, 0, 'C'); pdf.cell(25, 5, str(r["dias"]), 1, 0, 'C')
+        pdf.cell(30, 5, r["fecha_fin"].strftime('%d-%m-%Y'), 1, 0, 'C'); pdf.cell(35, 5, f"{r['pico_kg']:.0f}", 1, 1, 'R')
+    pdf.ln(8); pdf.set_font('Arial', 'B', 10); pdf.cell(0, 6, "DURACIÓN POR ESCENARIO", 0, 1, 'C'); pdf.ln(2)
+    if resultados: pdf.dibujar_escenarios(resultados)
+    pdf.output(nombre_pdf)
+    print("✅ 4D: Comparativa guardada.")
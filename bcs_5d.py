@@ -2,6 +2,9 @@
 from fpdf import FPDF
 import datetime
 import os
+import numpy as np
+import bcs_agregacion
+import bcs_tabla
 
 # --- CONFIGURACIÓN ---
 import os
@@ -10,12 +13,18 @@ CARPETA_ACTUAL = os.path.dirname(os.path.abspath(__file__))
 # Esto combina esa ruta con el nombre del logo
 ARCHIVO_LOGO = os.path.join(CARPETA_ACTUAL, "logo.jpg")
 
+# Precios por categoría: se usan si no hay catálogo (bcs_catalogo) o el perfil no está en él
 PRECIO_ACERO = 2.65       # EUR/kg (Laminado)
 PRECIO_PLACA = 2.10       # EUR/kg (Placa)
 PRECIO_TORNILLERIA = 3.50 # EUR/kg
 PRECIO_REJILLA = 2.50     # EUR/kg
 PRECIO_GENERICO = 2.00    # EUR/kg
 
+PRECIOS_CATEGORIA = {
+    "LAMINADO": PRECIO_ACERO, "PLACA": PRECIO_PLACA,
+    "TORNILLERIA": PRECIO_TORNILLERIA, "REJILLA": PRECIO_REJILLA
+}
+
 class PresupuestoPDF(FPDF):
     def header(self):
         if self.page_no() == 1: return
@@ -123,53 +132,104 @@ class PresupuestoPDF(FPDF):
         )
         self.multi_cell(0, 5, condiciones)
 
-def calcular_costes_para_ifc(datos):
+    def imprimir_sin_catalogo(self, sin_catalogo):
+        self.ln(8); self.set_font('Arial', 'B', 10)
+        self.cell(0, 8, "PERFILES SIN PRECIO DE CATÁLOGO (valorados al precio de su capítulo)", 0, 1, 'L')
+        self.set_fill_color(240, 240, 240); self.set_font('Arial', 'B', 8)
+        self.cell(70, 6, "Perfil", 1, 0, 'L', 1); self.cell(50, 6, "Capítulo", 1, 0, 'L', 1)
+        self.cell(20, 6, "Uds", 1, 0, 'C', 1); self.cell(30, 6, "Peso(kg)", 1, 1, 'R', 1)
+        self.set_font('Arial', '', 8)
+        for item in sin_catalogo:
+            self.cell(70, 6, str(item["perfil"])[:40], 1); self.cell(50, 6, str(item["cat"])[:28], 1)
+            self.cell(20, 6, str(item["uds"]), 1, 0, 'C'); self.cell(30, 6, f"{item['peso']:.1f}", 1, 1, 'R')
+
+def calcular_costes_para_ifc(datos, tarifa=None):
     """
     Función interna que asegura que cada ítem tenga su precio calculado.
+    El precio se resuelve una vez por categoría y se aplica en bloque a la tabla.
+    Con 'tarifa' (bcs_catalogo) manda el catálogo: los pares (perfil, categoría) de la tabla se
+    unen con él en bloque. Devuelve la máscara de filas sin precio de catálogo (None sin tarifa).
     """
     print("💰 5D: Calculando Costes (Interno)...")
-    for item in datos:
-        cat = item.get("categoria", "GENERICO")
-        precio = PRECIO_GENERICO
-        if cat == "LAMINADO": precio = PRECIO_ACERO
-        elif cat == "PLACA": precio = PRECIO_PLACA
-        elif cat == "TORNILLERIA" or item.get("es_tornillo"): precio = PRECIO_TORNILLERIA
-        elif cat == "REJILLA": precio = PRECIO_REJILLA
-        
-        # AQUÍ SE CREAN LAS CLAVES QUE FALTABAN
-        item["bcs_coste_item"] = item["peso_kg"] * precio
-        item["bcs_precio_unitario"] = precio
-
-def generar_informe_costes(datos, nombre_pdf, imagen=None):
-    # 1. EJECUTAR CÁLCULO PRIMERO (Corrección del error)
-    calcular_costes_para_ifc(datos)
+    cols = datos.columnas
+    cats = datos.categorias["categoria"].valores
+    precio_cat = np.array([PRECIOS_CATEGORIA.get(c, PRECIO_GENERICO) for c in cats], dtype=np.float64)
+    # Los tornillos sin categoría propia pagan tornillería (laminado y placa mandan)
+    cat_fija = np.array([c in ("LAMINADO", "PLACA") for c in cats], dtype=bool)
+    precio = precio_cat[cols["categoria"]]
+    precio[cols["es_tornillo"] & ~cat_fija[cols["categoria"]]] = PRECIO_TORNILLERIA
+    sin_catalogo = None
+    if tarifa is not None:
+        agregacion = bcs_agregacion.agregacion(datos)
+        g = agregacion.agrupar(("perfil_maestro", "categoria"))
+        entrada = tarifa.resolver(*zip(*g["claves"])) if g["claves"] else np.zeros(0, dtype=np.int64)
+        por_fila = entrada[agregacion.grupo_por_fila(g)]
+        sin_catalogo = por_fila < 0
+        precio[~sin_catalogo] = tarifa.precio_kg[por_fila[~sin_catalogo]]
     
-    print(f"💰 5D: Generando Presupuesto Legal '{nombre_pdf}'...")
-    
-    # Agrupar datos
-    grupos = {}
-    resumen_capitulos = {} # Para el cuadro final
-    
-    for item in datos:
-        if item["peso_kg"] <= 0: continue
-        cat = item.get("categoria", "GENERICO")
-        # Referencia = Tag (pieza suelta)
-        clave = (cat, item.get("referencia", "S/R"), item.get("perfil_maestro", "Varios"))
-        
-        if clave not in grupos:
-            grupos[clave] = {"uds": 0, "peso": 0.0, "coste": 0.0, "pu": item["bcs_precio_unitario"]}
-        
-        grupos[clave]["uds"] += 1
-        grupos[clave]["peso"] += item["peso_kg"]
-        grupos[clave]["coste"] += item["bcs_coste_item"]
-        
-        # Acumular para resumen
-        resumen_capitulos[cat] = resumen_capitulos.get(cat, 0.0) + item["bcs_coste_item"]
+    # AQUÍ SE CREAN LAS COLUMNAS QUE FALTABAN
+    cols["bcs_coste_item"][:] = cols["peso_kg"] * precio
+    cols["bcs_precio_unitario"][:] = precio
+    return sin_catalogo
+
+def acumular_costes(lotes, acumulado=None, tarifa=None):
+    """
+    Totales 5D en flujo: consume TablaPartes (la tabla completa o los lotes de
+    bcs_core.iter_partes) y va sumando partidas y capítulos sin retener las partes.
+    Con 'tarifa' anota además en "sin_catalogo" los (perfil, categoría) que no están en el catálogo.
+    """
+    if acumulado is None: acumulado = {"grupos": {}, "capitulos": {}}
+    grupos = acumulado["grupos"]; resumen_capitulos = acumulado["capitulos"]
+    for lote in lotes:
+        sin_catalogo = calcular_costes_para_ifc(lote, tarifa)
+        if sin_catalogo is not None:
+            s = bcs_agregacion.agregacion(lote).agrupar(("perfil_maestro", "categoria"), sumas=("peso_kg",),
+                                                        mascara=sin_catalogo & (lote.columnas["peso_kg"] > 0))
+            faltan = acumulado.setdefault("sin_catalogo", {})
+            for k, clave in enumerate(s["claves"]):
+                f = faltan.setdefault(clave, {"uds": 0, "peso": 0.0})
+                f["uds"] += int(s["uds"][k]); f["peso"] += float(s["peso_kg"][k])
+        # Agrupar datos: Referencia = Tag (pieza suelta)
+        g = bcs_agregacion.resumen_partidas(lote, "categoria", ("peso_kg", "bcs_coste_item"),
+                                            mascara=lote.columnas["peso_kg"] > 0)
+        for k, clave in enumerate(g["claves"]):
+            if clave not in grupos:
+                grupos[clave] = {"uds": 0, "peso": 0.0, "coste": 0.0,
+                                 "pu": float(lote.columnas["bcs_precio_unitario"][g["primero"][k]])}
+            coste = float(g["bcs_coste_item"][k])
+            grupos[clave]["uds"] += int(g["uds"][k])
+            grupos[clave]["peso"] += float(g["peso_kg"][k])
+            grupos[clave]["coste"] += coste
+            # Acumular para resumen
+            resumen_capitulos[clave[0]] = resumen_capitulos.get(clave[0], 0.0) + coste
+    return acumulado
+
+def resumen_costes(datos, tarifa=None):
+    """
+    Cálculo 5D sin PDF: escribe las columnas de coste en la tabla y devuelve
+    {"partidas", "capitulos", "sin_catalogo"} (datos simples, se pueden enviar a otro proceso).
+    'datos' puede ser la TablaPartes o un iterable de lotes (modo streaming).
+    'tarifa': catálogo de precios de la obra (bcs_catalogo.tarifa); sin ella, precios por categoría.
+    """
+    # 1. EJECUTAR CÁLCULO Y AGRUPACIÓN (en flujo si llegan lotes)
+    lotes = [datos] if isinstance(datos, bcs_tabla.TablaPartes) else datos
+    acumulado = acumular_costes(lotes, tarifa=tarifa)
 
     lista = []
-    for (cat, ref, desc), v in grupos.items():
+    for (cat, ref, desc), v in acumulado["grupos"].items():
         lista.append({"cat": cat, "ref": ref, "desc": desc, **v})
     lista.sort(key=lambda x: (x["cat"], -x["coste"]))
+    sin_catalogo = [{"perfil": perfil, "cat": cat, **v} for (perfil, cat), v in acumulado.get("sin_catalogo", {}).items()]
+    sin_catalogo.sort(key=lambda x: -x["peso"])
+    if sin_catalogo:
+        print(f"⚠️ 5D: {len(sin_catalogo)} perfiles sin precio de catálogo "
+              f"({sum(x['peso'] for x in sin_catalogo):.0f} kg al precio de su capítulo).")
+    return {"partidas": lista, "capitulos": acumulado["capitulos"], "sin_catalogo": sin_catalogo}
+
+def renderizar_informe_costes(resumen, nombre_pdf, imagen=None):
+    """PDF del presupuesto a partir de resumen_costes."""
+    lista = resumen["partidas"]
+    resumen_capitulos = resumen["capitulos"] # Para el cuadro final
 
     # Generar PDF
     pdf = PresupuestoPDF()
@@ -199,10 +259,16 @@ def generar_informe_costes(datos, nombre_pdf, imagen=None):
 
     # IMPRIMIR RESUMEN LEGAL AL FINAL
     pdf.imprimir_resumen_legal(resumen_capitulos)
+    if resumen.get("sin_catalogo"): pdf.imprimir_sin_catalogo(resumen["sin_catalogo"])
     
     pdf.output(nombre_pdf)
     print("✅ 5D: Presupuesto guardado.")
 
+def generar_informe_costes(datos, nombre_pdf, imagen=None, tarifa=None):
+    """'datos' puede ser la TablaPartes o un iterable de lotes (modo streaming)."""
+    print(f"💰 5D: Generando Presupuesto Legal '{nombre_pdf}'...")
+    renderizar_informe_costes(resumen_costes(datos, tarifa), nombre_pdf, imagen)
+
 # --- PUENTE DE COMPATIBILIDAD ---
 def generar_presupuesto(datos, nombre_pdf):
     # Redirigimos la llamada antigua a la función nueva
@@ -2,6 +2,9 @@
 from fpdf import FPDF
 import datetime
 import os
+import numpy as np
+import bcs_agregacion
+import bcs_tabla
 
 # --- CONFIGURACIÓN ---
 import os
@@ -110,47 +113,58 @@ class InformeHuella(FPDF):
 def calcular_huella_para_ifc(datos):
     """
     Función interna que asegura que cada ítem tenga su huella calculada.
+    La detección de placas se hace una vez por perfil distinto, no por pieza.
     """
     print("🌍 6D: Calculando Huella de Carbono (Interno)...")
-    for item in datos:
-        cat_original = item.get("categoria", "GENERICO")
-        
-        # Detectar placas y asignar factor correcto
-        es_placa = False
-        perfil = str(item.get("perfil_maestro", "")).upper()
-        if "PL" in perfil or "PLATE" in perfil or "CHAPA" in perfil or "FLAT" in perfil: es_placa = True
-        
-        if es_placa: cat_6d = "PLACA"
-        elif item.get("es_tornillo") or cat_original == "TORNILLERIA": cat_6d = "TORNILLERIA"
-        else: cat_6d = cat_original
-
-        factor = FACTORES_IMPACTO.get(cat_6d, 1.50)
-        
-        # ¡AQUÍ ES DONDE SE CREAN LAS CLAVES QUE DABAN ERROR!
-        item["_bcs_cat_6d"] = cat_6d
-        item["bcs_factor_impacto"] = factor
-        item["bcs_huella_item"] = item["peso_kg"] * factor
-
-def generar_informe_sostenibilidad(datos, nombre_pdf, imagen=None):
-    # 1. EJECUTAR CÁLCULO PRIMERO (Corrección del error)
-    calcular_huella_para_ifc(datos)
+    cols = datos.columnas
+    cats = datos.categorias["categoria"]; cats_6d = datos.categorias["_bcs_cat_6d"]
     
-    print(f"🌍 6D: Generando PDF '{nombre_pdf}'...")
+    # Detectar placas y asignar factor correcto
+    perfiles = [str(p).upper() for p in datos.categorias["perfil_maestro"].valores]
+    placa_perfil = np.array([("PL" in p or "PLATE" in p or "CHAPA" in p or "FLAT" in p) for p in perfiles], dtype=bool)
+    es_placa = placa_perfil[cols["perfil_maestro"]]
     
-    # 2. Agrupar datos ya calculados
-    grupos = {}
-    for item in datos:
-        # Ahora sí existe 'bcs_factor_impacto' porque ejecutamos el paso 1
-        if item.get("bcs_factor_impacto", 0) <= 0: continue
-        
-        clave = (item.get("_bcs_cat_6d", "GENERICO"), item.get("referencia", "S/R"), item.get("perfil_maestro", "Varios"))
-        
-        if clave not in grupos: 
-            grupos[clave] = {"uds": 0, "peso": 0.0, "co2": 0.0, "factor": item["bcs_factor_impacto"]}
-            
-        grupos[clave]["uds"] += 1
-        grupos[clave]["peso"] += item["peso_kg"]
-        grupos[clave]["co2"] += item["bcs_huella_item"]
+    mapa = np.array([cats_6d.codigo(c) for c in cats.valores], dtype=np.int32)
+    cod_6d = mapa[cols["categoria"]]
+    cod_6d[cols["es_tornillo"] | (cols["categoria"] == cats.buscar("TORNILLERIA"))] = cats_6d.codigo("TORNILLERIA")
+    cod_6d[es_placa] = cats_6d.codigo("PLACA")
+    
+    factores = np.array([FACTORES_IMPACTO.get(c, 1.50) for c in cats_6d.valores], dtype=np.float64)
+    
+    # ¡AQUÍ ES DONDE SE CREAN LAS COLUMNAS QUE DABAN ERROR!
+    cols["_bcs_cat_6d"][:] = cod_6d
+    cols["bcs_factor_impacto"][:] = factores[cod_6d]
+    cols["bcs_huella_item"][:] = cols["peso_kg"] * cols["bcs_factor_impacto"]
+
+def acumular_huella(lotes, acumulado=None):
+    """
+    Totales 6D en flujo: consume TablaPartes (completa o lotes de bcs_core.iter_partes)
+    y va sumando por (categoría 6D, referencia, perfil) sin retener las partes.
+    """
+    if acumulado is None: acumulado = {}
+    for lote in lotes:
+        calcular_huella_para_ifc(lote)
+        # Solo piezas con factor de impacto
+        g = bcs_agregacion.resumen_partidas(lote, "_bcs_cat_6d", ("peso_kg", "bcs_huella_item"),
+                                            mascara=lote.columnas["bcs_factor_impacto"] > 0)
+        for k, clave in enumerate(g["claves"]):
+            if clave not in acumulado:
+                acumulado[clave] = {"uds": 0, "peso": 0.0, "co2": 0.0,
+                                    "factor": float(lote.columnas["bcs_factor_impacto"][g["primero"][k]])}
+            acumulado[clave]["uds"] += int(g["uds"][k])
+            acumulado[clave]["peso"] += float(g["peso_kg"][k])
+            acumulado[clave]["co2"] += float(g["bcs_huella_item"][k])
+    return acumulado
+
+def resumen_huella(datos):
+    """
+    Cálculo 6D sin PDF: escribe las columnas de huella en la tabla y devuelve
+    {"partidas", "total_co2_tn", "ratio"} (datos simples, se pueden enviar a otro proceso).
+    'datos' puede ser la TablaPartes o un iterable de lotes (modo streaming).
+    """
+    # 1-2. CALCULAR Y AGRUPAR (en flujo si llegan lotes)
+    lotes = [datos] if isinstance(datos, bcs_tabla.TablaPartes) else datos
+    grupos = acumular_huella(lotes)
 
     # 3. Ordenar y preparar lista
     lista = []
@@ -162,6 +176,11 @@ def generar_informe_sostenibilidad(datos, nombre_pdf, imagen=None):
     total_co2_tn = sum(x["co2"] for x in lista) / 1000.0 
     peso_total_kg = sum(x["peso"] for x in lista)
     ratio = (total_co2_tn * 1000) / peso_total_kg if peso_total_kg > 0 else 0
+    return {"partidas": lista, "total_co2_tn": total_co2_tn, "ratio": ratio}
+
+def renderizar_informe_sostenibilidad(resumen, nombre_pdf, imagen=None):
+    """PDF de huella a partir de resumen_huella."""
+    lista = resumen["partidas"]; total_co2_tn = resumen["total_co2_tn"]; ratio = resumen["ratio"]
 
     # 5. Generar PDF
     pdf = InformeHuella()
@@ -183,4 +202,9 @@ def generar_informe_sostenibilidad(datos, nombre_pdf, imagen=None):
 
     pdf.imprimir_veredicto(total_co2_tn, ratio)
     pdf.output(nombre_pdf)
-    print("✅ 6D: Informe ECO guardado.")
\ No newline at end of file
+    print("✅ 6D: Informe ECO guardado.")
+
+def generar_informe_sostenibilidad(datos, nombre_pdf, imagen=None):
+    """'datos' puede ser la TablaPartes o un iterable de lotes (modo streaming)."""
+    print(f"🌍 6D: Generando PDF '{nombre_pdf}'...")
+    renderizar_informe_sostenibilidad(resumen_huella(datos), nombre_pdf, imagen)
\ No newline at end of file
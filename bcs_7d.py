@@ -2,6 +2,8 @@
 from fpdf import FPDF
 import datetime
 import os
+import bcs_agregacion
+import bcs_tabla
 
 # --- CONFIGURACIÓN ---
 import os
@@ -22,35 +24,34 @@ OPERACIONES = [
     {"op": "Inspección Soldaduras", "freq": "Cada 10 años", "desc": "Revisión visual de cordones principales (fisuras)."}
 ]
 
+def acumular_inventario(lotes, grupos=None):
+    """
+    Inventario 7D en flujo: consume TablaPartes (completa o lotes de bcs_core.iter_partes)
+    y va sumando por Assembly Mark sin retener las partes.
+    """
+    if grupos is None: grupos = {}
+    for lote in lotes:
+        # Agrupar por Assembly Mark (Marca de Conjunto), sin la tornillería suelta
+        g = bcs_agregacion.resumen_conjuntos(lote)
+        for k, (ref_conjunto,) in enumerate(g["claves"]):
+            if ref_conjunto not in grupos:
+                grupos[ref_conjunto] = {
+                    "nombre": lote.valor("perfil_maestro", g["primero"][k]),
+                    "peso": 0.0,
+                    "uds": 1, # El conjunto cuenta como unidad representativa
+                    "zona": "General"
+                }
+            grupos[ref_conjunto]["peso"] += float(g["peso_kg"][k])
+    return grupos
+
 def consolidar_inventario(datos_brutos):
     """
     Agrupa elementos sueltos en Conjuntos (Assemblies) para el inventario de mantenimiento.
+    'datos_brutos' puede ser la TablaPartes o un iterable de lotes.
     """
     print("🛠️ 7D: Agrupando inventario para Mantenimiento...")
-    grupos = {}
-    for item in datos_brutos:
-        # Ignorar tornillería suelta en el listado principal de equipos
-        if item.get("es_tornillo", False) or item["categoria"] == "TORNILLERIA": continue
-        
-        # Agrupar por Assembly Mark (Marca de Conjunto)
-        ref_conjunto = item.get("assembly_mark", "S/R")
-        
-        if ref_conjunto not in grupos:
-            grupos[ref_conjunto] = {
-                "nombre": item.get("perfil_maestro", "Elemento Estructural"),
-                "peso": 0.0,
-                "uds": 0,
-                "zona": item.get("nivel", "General") 
-            }
-        
-        grupos[ref_conjunto]["peso"] += item["peso_kg"]
-        # Contamos la pieza maestra como unidad representativa
-        if item["objeto_ifc"] == item.get("perfil_maestro_obj"): 
-             grupos[ref_conjunto]["uds"] += 1
-             
-    # Ajuste de seguridad por si no cuenta bien las unidades
-    for k, v in grupos.items():
-        if v["uds"] == 0: v["uds"] = 1
+    lotes = [datos_brutos] if isinstance(datos_brutos, bcs_tabla.TablaPartes) else datos_brutos
+    grupos = acumular_inventario(lotes)
 
     lista = []
     for ref, datos in grupos.items():
@@ -173,6 +174,10 @@ def generar_informe_7d(datos, nombre_pdf, imagen=None):
     inventario = consolidar_inventario(datos)
     
     # 2. Generar PDF
+    renderizar_informe_7d(inventario, nombre_pdf, imagen)
+
+def renderizar_informe_7d(inventario, nombre_pdf, imagen=None):
+    """PDF del manual a partir de consolidar_inventario."""
     pdf = ManualMantenimiento()
     pdf.crear_portada(imagen)
     pdf.tabla_operaciones()
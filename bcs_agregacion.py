@@ -0,0 +1,93 @@
+# bcs_agregacion.py
+import numpy as np
+
+# --- MOTOR DE AGREGACIÓN COMPARTIDO (4D, 5D, 6D, 7D) ---
+# Un solo sort-and-reduce de la tabla de partes en "átomos": filas con la misma clave
+# completa (conjunto, categoría, referencia, perfil, tornillo y si tienen peso). Todas las
+# agrupaciones de los informes (por conjunto, por partida, por categoría...) son uniones
+# de átomos: se reducen sobre unos cientos de átomos sin volver a ordenar la tabla.
+# La agregación se guarda en la propia tabla y viaja con ella a los procesos del pool.
+COLUMNAS_ATOMO = ("assembly_mark", "categoria", "referencia", "perfil_maestro")
+
+class Agregacion:
+    """
+    Átomos de una TablaPartes: 'atomo' (átomo de cada fila), 'primero' (primera fila de
+    cada átomo, en orden de tabla), 'uds' y las sumas/mínimos de las columnas de extracción.
+    """
+    def __init__(self, tabla):
+        cols = tabla.columnas; n = len(tabla)
+        claves = [cols[c] for c in COLUMNAS_ATOMO] + [cols["es_tornillo"], cols["peso_kg"] > 0]
+        orden = np.lexsort(claves[::-1]) # Estable: dentro de cada átomo, orden de tabla
+        cambio = np.zeros(n, dtype=bool); cambio[:1] = True
+        for k in claves: cambio[1:] |= k[orden][1:] != k[orden][:-1]
+        inicios = np.flatnonzero(cambio)
+        self.n = n; self.tabla = tabla
+        self.atomo = np.empty(n, dtype=np.int64); self.atomo[orden] = np.cumsum(cambio) - 1
+        self.primero = orden[inicios]
+        self.uds = np.diff(np.r_[inicios, n])
+        self.sumas = {"peso_kg": np.add.reduceat(cols["peso_kg"][orden], inicios) if n else np.zeros(0)}
+        self.z_min = np.minimum.reduceat(cols["altura_z"][orden], inicios) if n else np.zeros(0)
+
+    def __len__(self): return len(self.primero)
+
+    def sumar(self, columna):
+        """Suma por átomo; las columnas calculadas (coste, huella...) se suman sin reordenar."""
+        if columna in self.sumas: return self.sumas[columna]
+        return np.bincount(self.atomo, weights=self.tabla.columnas[columna], minlength=len(self))
+
+    def agrupar(self, claves, sumas=(), mascara=None):
+        """
+        Group-by sobre los átomos: las filas (de 'mascara', o todas) con las mismas 'claves'
+        forman un grupo; los grupos salen en orden de primera aparición en la tabla. Devuelve
+        un dict con 'claves' (tuplas decodificadas), 'uds' (filas), 'primero' (primera fila),
+        'z_min', las 'sumas' pedidas, 'atomos' (átomos incluidos) y 'grupo' (grupo de cada uno).
+        Las claves y la máscara deben ser constantes dentro de cada átomo: columnas de
+        COLUMNAS_ATOMO o derivadas de ellas.
+        """
+        t = self.tabla; cols = t.columnas
+        atomos = np.arange(len(self)) if mascara is None else np.flatnonzero(mascara[self.primero])
+        filas = self.primero[atomos]
+        clave = np.zeros(len(atomos), dtype=np.int64)
+        for c in claves: clave = clave * (len(t.categorias[c]) + 1) + cols[c][filas]
+        _, inversa = np.unique(clave, return_inverse=True); inversa = inversa.reshape(-1)
+        n_grupos = int(inversa.max()) + 1 if len(inversa) else 0
+        primero = np.full(n_grupos, self.n, dtype=np.int64); np.minimum.at(primero, inversa, filas)
+        orden = np.argsort(primero, kind="stable")
+        rango = np.empty_like(orden); rango[orden] = np.arange(n_grupos)
+        grupo = rango[inversa]; primero = primero[orden]
+        z_min = np.full(n_grupos, np.inf); np.minimum.at(z_min, grupo, self.z_min[atomos])
+        res = {
+            "claves": [tuple(t.valor(c, i) for c in claves) for i in primero],
+            "uds": np.bincount(grupo, weights=self.uds[atomos], minlength=n_grupos).astype(np.int64),
+            "primero": primero, "z_min": z_min, "atomos": atomos, "grupo": grupo
+        }
+        for c in sumas: res[c] = np.bincount(grupo, weights=self.sumar(c)[atomos], minlength=n_grupos)
+        return res
+
+    def grupo_por_fila(self, res):
+        """Grupo de cada fila de la tabla según un resultado de agrupar (-1 = fila excluida)."""
+        por_atomo = np.full(len(self), -1, dtype=np.int64); por_atomo[res["atomos"]] = res["grupo"]
+        return por_atomo[self.atomo]
+
+def agregacion(tabla):
+    """Agregación de la tabla: se calcula una vez y queda guardada en ella (las columnas de extracción no cambian)."""
+    if tabla.agregacion is None or tabla.agregacion.n != len(tabla): tabla.agregacion = Agregacion(tabla)
+    return tabla.agregacion
+
+# --- TABLAS RESUMEN QUE LEEN LOS INFORMES ---
+def mascara_conjuntos(tabla):
+    """Piezas que forman conjuntos: sin tornillería suelta (4D y 7D)."""
+    cols = tabla.columnas
+    return ~cols["es_tornillo"] & (cols["categoria"] != tabla.categorias["categoria"].buscar("TORNILLERIA"))
+
+def resumen_conjuntos(tabla):
+    """Por Assembly Mark: piezas (uds), peso_kg, z_min y primera pieza."""
+    return agregacion(tabla).agrupar(("assembly_mark",), sumas=("peso_kg",), mascara=mascara_conjuntos(tabla))
+
+def resumen_partidas(tabla, categoria, sumas, mascara=None):
+    """Por (categoría, referencia, perfil); 'categoria' es la columna de capítulo (5D: categoria, 6D: _bcs_cat_6d)."""
+    return agregacion(tabla).agrupar((categoria, "referencia", "perfil_maestro"), sumas=sumas, mascara=mascara)
+
+def resumen_categorias(tabla, categoria="categoria", sumas=("peso_kg",)):
+    """Totales por capítulo."""
+    return agregacion(tabla).agrupar((categoria,), sumas=sumas)
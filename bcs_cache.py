@@ -0,0 +1,76 @@
+# bcs_cache.py
+import hashlib
+import os
+import bcs_tabla
+
+# --- CONFIGURACIÓN ---
+# Caché en disco de la extracción, direccionada por contenido (hash del IFC + versión del extractor)
+CARPETA_CACHE = os.environ.get("BCS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "bcs_suite"))
+USAR_CACHE = os.environ.get("BCS_CACHE", "1") != "0"
+LIMITE_CACHE_MB = 512
+
+def huella_archivo(ruta):
+    """SHA-256 del contenido del archivo (leído por bloques)."""
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""): h.update(bloque)
+    return h.hexdigest()
+
+def clave_huella(huella, version):
+    """Clave de la entrada: mismo IFC + misma versión del extractor = misma clave."""
+    return hashlib.sha256(f"{version}:{huella}".encode()).hexdigest()
+
+def clave_cache(ruta_ifc, version):
+    return clave_huella(huella_archivo(ruta_ifc), version)
+
+def _ruta_entrada(clave):
+    return os.path.join(CARPETA_CACHE, f"{clave}.npz")
+
+def leer(clave, modelo=None):
+    """Devuelve la TablaPartes guardada (o None si no está)."""
+    ruta = _ruta_entrada(clave)
+    if not os.path.exists(ruta): return None
+    try: tabla = bcs_tabla.cargar_tabla(ruta, modelo)
+    except Exception:
+        invalidar(clave); return None  # Entrada corrupta: se descarta
+    os.utime(ruta)  # LRU: marca de último uso
+    return tabla
+
+def guardar(clave, tabla):
+    os.makedirs(CARPETA_CACHE, exist_ok=True)
+    ruta = _ruta_entrada(clave); temporal = ruta + ".tmp"
+    with open(temporal, "wb") as f: bcs_tabla.guardar_tabla(tabla, f)
+    os.replace(temporal, ruta)  # Escritura atómica
+    podar()
+
+def _entradas():
+    if not os.path.isdir(CARPETA_CACHE): return []
+    entradas = []
+    for nombre in os.listdir(CARPETA_CACHE):
+        if not nombre.endswith(".npz"): continue
+        ruta = os.path.join(CARPETA_CACHE, nombre)
+        try: st = os.stat(ruta)
+        except OSError: continue
+        entradas.append((st.st_mtime, st.st_size, ruta))
+    return entradas
+
+def podar(limite_mb=None):
+    """Expulsa las entradas usadas hace más tiempo hasta quedar por debajo del límite."""
+    limite = (LIMITE_CACHE_MB if limite_mb is None else limite_mb) * 1024 * 1024
+    entradas = _entradas()
+    total = sum(tam for _, tam, _ in entradas)
+    for _, tam, ruta in sorted(entradas):
+        if total <= limite: break
+        try: os.remove(ruta); total -= tam
+        except OSError: pass
+
+def invalidar(clave=None):
+    """Borra una entrada concreta, o toda la caché si no se indica clave."""
+    rutas = [r for _, _, r in _entradas()] if clave is None else [_ruta_entrada(clave)]
+    for ruta in rutas:
+        try: os.remove(ruta)
+        except OSError: pass
+
+def invalidar_archivo(ruta_ifc, version):
+    """Borra la entrada de un IFC concreto."""
+    invalidar(clave_cache(ruta_ifc, version))
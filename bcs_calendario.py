@@ -0,0 +1,104 @@
+# bcs_calendario.py
+import csv
+import functools
+import os
+import numpy as np
+
+# --- CONFIGURACIÓN ---
+CARPETA_ACTUAL = os.path.dirname(os.path.abspath(__file__))
+# Festivos y cierres de obra por región: "region;desde;hasta;descripcion" (hasta vacío = un solo día).
+# Una fecha "*-MM-DD" se repite cada año. "ES-MD" hereda lo de "ES"; "*" aplica a todas las regiones.
+ARCHIVO_FESTIVOS = os.environ.get("BCS_FESTIVOS", os.path.join(CARPETA_ACTUAL, "festivos.csv"))
+REGION_DEFECTO = os.environ.get("BCS_REGION", "ES")
+SEMANA_LABORAL = "1111100" # Lunes a viernes
+DIAS_LABORABLES_ANIO = 200 # Estimación prudente para dimensionar el rango de años
+ANIOS_MAXIMOS = 100
+
+@functools.lru_cache(maxsize=4)
+def _leer_festivos(ruta, _mtime):
+    filas = []
+    with open(ruta, encoding="utf-8", newline="") as f:
+        lineas = (l for l in f if l.strip() and not l.lstrip().startswith("#"))
+        for fila in csv.reader(lineas, delimiter=";"):
+            region, desde, hasta = (c.strip() for c in (fila + ["", ""])[:3])
+            filas.append((region.upper(), desde, hasta or desde))
+    return tuple(filas)
+
+def leer_festivos(ruta=None):
+    """Filas (region, desde, hasta) del archivo de festivos ('AAAA-MM-DD' o '*-MM-DD')."""
+    ruta = ruta or ARCHIVO_FESTIVOS
+    if not os.path.exists(ruta): return ()
+    return _leer_festivos(ruta, os.path.getmtime(ruta))
+
+def version_festivos(ruta=None):
+    """Cambia cuando se edita el archivo de festivos (sirve de clave de caché)."""
+    ruta = ruta or ARCHIVO_FESTIVOS
+    return os.path.getmtime(ruta) if os.path.exists(ruta) else None
+
+def regiones(ruta=None):
+    """Regiones definidas en el archivo (para elegir en la interfaz)."""
+    return sorted({r for r, _, _ in leer_festivos(ruta) if r != "*"} | {REGION_DEFECTO.upper()})
+
+def _aplica(region_fila, region):
+    return region_fila == "*" or region == region_fila or region.startswith(region_fila + "-")
+
+def dias_no_laborables(region, anio_desde, anio_hasta, ruta=None):
+    """Festivos y cierres de la región entre dos años (incluidos), como array datetime64[D] ordenado."""
+    bloques = []
+    for region_fila, desde, hasta in leer_festivos(ruta):
+        if not _aplica(region_fila, region): continue
+        anios = range(anio_desde, anio_hasta + 1) if desde.startswith("*") else (None,)
+        for anio in anios:
+            try:
+                d = np.datetime64(desde.replace("*", str(anio)), "D")
+                h = np.datetime64(hasta.replace("*", str(anio)), "D")
+                if h < d and anio is not None: h = np.datetime64(hasta.replace("*", str(anio + 1)), "D") # Cruza el año
+            except ValueError: continue # p.ej. "*-02-29" en año no bisiesto
+            bloques.append(np.arange(d, h + 1))
+    if not bloques: return np.array([], dtype="datetime64[D]")
+    return np.unique(np.concatenate(bloques))
+
+class Calendario:
+    """
+    Días laborables de una región entre dos años (incluidos), precalculados en un array
+    datetime64[D]: la fecha del día k de obra es una indexación del array.
+    """
+    def __init__(self, region, anio_desde, anio_hasta, no_laborables):
+        self.region = region; self.anio_desde = anio_desde; self.anio_hasta = anio_hasta
+        self.no_laborables = no_laborables
+        self.calendario = np.busdaycalendar(weekmask=SEMANA_LABORAL, holidays=no_laborables)
+        dias = np.arange(np.datetime64(f"{anio_desde:04d}-01-01"), np.datetime64(f"{anio_hasta + 1:04d}-01-01"))
+        self.laborables = dias[np.is_busday(dias, busdaycal=self.calendario)]
+
+    def es_laborable(self, fechas):
+        return np.is_busday(np.asarray(fechas, dtype="datetime64[D]"), busdaycal=self.calendario)
+
+    def _base(self, inicio):
+        return int(np.searchsorted(self.laborables, np.datetime64(inicio, "D"), side="right")) - 1
+
+    def cubre(self, inicio, dias):
+        return self._base(inicio) + dias < len(self.laborables)
+
+    def fechas(self, inicio, dias):
+        """Fecha de cada índice de día de obra: el 0 es 'inicio' y el k, el k-ésimo laborable posterior."""
+        dias = np.asarray(dias); inicio = np.datetime64(inicio, "D")
+        return np.where(dias == 0, inicio, self.laborables[self._base(inicio) + np.maximum(dias, 1)])
+
+@functools.lru_cache(maxsize=32)
+def _calendario(region, anio_desde, anio_hasta, ruta, _version):
+    return Calendario(region, anio_desde, anio_hasta, dias_no_laborables(region, anio_desde, anio_hasta, ruta))
+
+def obtener_calendario(region=None, anio_desde=None, anio_hasta=None, ruta=None):
+    """Calendario cacheado por (región, rango de años); se rehace solo si cambia el archivo de festivos."""
+    region = (region or REGION_DEFECTO).upper(); ruta = ruta or ARCHIVO_FESTIVOS
+    return _calendario(region, anio_desde, anio_hasta, ruta, version_festivos(ruta))
+
+def calendario_para(inicio, dias, region=None, ruta=None):
+    """Calendario que cubre 'dias' días laborables desde 'inicio' (amplía el rango de año en año)."""
+    anio_hasta = inicio.year + dias // DIAS_LABORABLES_ANIO
+    while True:
+        calendario = obtener_calendario(region, inicio.year, anio_hasta, ruta)
+        if calendario.cubre(inicio, dias): return calendario
+        if anio_hasta - inicio.year >= ANIOS_MAXIMOS:
+            raise ValueError(f"El calendario '{calendario.region}' no tiene {dias} días laborables en {ANIOS_MAXIMOS} años.")
+        anio_hasta += 1
@@ -0,0 +1,151 @@
+# bcs_catalogo.py
+import csv
+import fnmatch
+import functools
+import os
+import re
+import numpy as np
+import bcs_cache
+
+# --- CATÁLOGO EXTERNO DE PRECIOS 5D ---
+# CSV con cabecera (separador ';', decimales con coma o punto):
+#   perfil;precio_kg[;categoria;calidad;acabado;proveedor]
+# 'perfil' admite: exacto (HEB200), prefijo (HEB*) o comodines (IPE?00, *X10, PL[0-9]*).
+# Todo patrón casa antes literalmente: "L50*5" encuentra el perfil L50*5 como exacto.
+# Los campos vacíos valen para cualquier valor. Las partes solo llevan perfil y categoría:
+# calidad, acabado y proveedor se eligen para toda la obra al pedir la tarifa.
+# Prioridad: exacto > prefijo más largo > comodín; a igualdad, el más específico y luego el más barato.
+ARCHIVO_CATALOGO = os.environ.get("BCS_CATALOGO") # Sin catálogo: precios por categoría de bcs_5d
+VERSION_CATALOGO = "1" # Cambiarla invalida los catálogos compilados
+CAMPOS_TEXTO = ("patron", "categoria", "calidad", "acabado", "proveedor")
+EXACTO, PREFIJO, COMODIN = 0, 1, 2
+_COMODINES = re.compile(r"[*?\[]")
+
+def normalizar(texto):
+    """Mayúsculas y sin espacios: 'heb 200' y 'HEB200' son el mismo perfil."""
+    return "".join(str(texto or "").upper().split())
+
+def _tipo_patron(patron):
+    if not _COMODINES.search(patron): return EXACTO
+    if len(patron) > 1 and patron.endswith("*") and not _COMODINES.search(patron[:-1]): return PREFIJO
+    return COMODIN
+
+def leer_csv(ruta):
+    """Columnas (arrays NumPy) del catálogo en CSV, en orden de archivo."""
+    filas = {c: [] for c in CAMPOS_TEXTO}; tipos = []; precios = []
+    with open(ruta, encoding="utf-8-sig", newline="") as f:
+        lineas = (l for l in f if l.strip() and not l.lstrip().startswith("#"))
+        for fila in csv.DictReader(lineas, delimiter=";"):
+            fila = {(k or "").strip().lower(): v for k, v in fila.items()}
+            try: precio = float(str(fila.get("precio_kg") or "").strip().replace(",", "."))
+            except ValueError: continue # Línea sin precio válido
+            patron = normalizar(fila.get("perfil"))
+            if not patron: continue
+            filas["patron"].append(patron); tipos.append(_tipo_patron(patron)); precios.append(precio)
+            for c in CAMPOS_TEXTO[1:]: filas[c].append(normalizar(fila.get(c)))
+    columnas = {c: np.array(v, dtype=str) for c, v in filas.items()}
+    columnas["tipo"] = np.array(tipos, dtype=np.int8); columnas["precio_kg"] = np.array(precios, dtype=np.float64)
+    return columnas
+
+class Catalogo:
+    """Catálogo compilado: una columna NumPy por campo (patron, tipo, categoria, calidad, acabado, proveedor, precio_kg)."""
+    def __init__(self, columnas, huella=""):
+        self.columnas = columnas; self.huella = huella
+        self.precio_kg = columnas["precio_kg"]
+
+    def __len__(self): return len(self.precio_kg)
+
+    def tarifa(self, calidad=None, acabado=None, proveedor=None):
+        """Entradas válidas para la obra (campo vacío o igual al elegido), ordenadas por preferencia."""
+        cols = self.columnas; validas = np.ones(len(self), dtype=bool); especificidad = np.zeros(len(self), dtype=np.int64)
+        for campo, valor in (("calidad", calidad), ("acabado", acabado), ("proveedor", proveedor)):
+            if valor is None: continue
+            igual = cols[campo] == normalizar(valor)
+            validas &= (cols[campo] == "") | igual; especificidad += igual
+        idx = np.flatnonzero(validas)
+        preferencia = idx[np.lexsort((idx, self.precio_kg[idx], -especificidad[idx]))]
+        return Tarifa(self, preferencia, (self.huella, calidad, acabado, proveedor))
+
+class Tarifa:
+    """Catálogo filtrado para una obra, con índices ordenados para búsqueda binaria por perfil."""
+    def __init__(self, catalogo, entradas, firma):
+        self.catalogo = catalogo; self.entradas = entradas; self.firma = firma
+        self.precio_kg = catalogo.precio_kg; self._indices = {}
+
+    def _indice(self, categoria):
+        """Por tipo de patrón: (patrones ordenados, entrada preferida de cada uno). Las de la categoría van primero."""
+        if categoria not in self._indices:
+            cols = self.catalogo.columnas; e = self.entradas
+            e = e[(cols["categoria"][e] == "") | (cols["categoria"][e] == categoria)]
+            e = e[np.argsort(cols["categoria"][e] == "", kind="stable")]
+            patrones = cols["patron"][e]; tipos = cols["tipo"][e]
+            # Exacto: todos los patrones tal cual; prefijo: sin el '*' final, agrupados por longitud
+            claves, primero = np.unique(patrones, return_index=True) # Primera aparición = preferida
+            indice = {EXACTO: [(None, claves, e[primero])], PREFIJO: []}
+            sub = e[tipos == PREFIJO]; p = np.array([x[:-1] for x in patrones[tipos == PREFIJO]], dtype=str)
+            largos = np.char.str_len(p) if len(p) else np.zeros(0, dtype=np.int64)
+            for largo in np.unique(largos)[::-1]:
+                claves, primero = np.unique(p[largos == largo], return_index=True)
+                indice[PREFIJO].append((int(largo), claves, sub[largos == largo][primero]))
+            indice[COMODIN] = [(re.compile(fnmatch.translate(patrones[k])), e[k]) for k in np.flatnonzero(tipos == COMODIN)]
+            self._indices[categoria] = indice
+        return self._indices[categoria]
+
+    def resolver(self, perfiles, categorias):
+        """Entrada del catálogo para cada par (perfil, categoría); -1 si no hay precio."""
+        perfiles = np.array([normalizar(p) for p in perfiles], dtype=str)
+        categorias = np.array([normalizar(c) for c in categorias], dtype=str)
+        res = np.full(len(perfiles), -1, dtype=np.int64)
+        if not len(perfiles): return res
+        largo_perfil = np.char.str_len(perfiles)
+        for categoria in np.unique(categorias):
+            indice = self._indice(categoria); mia = categorias == categoria
+            for tipo in (EXACTO, PREFIJO):
+                for largo, claves, entradas in indice[tipo]:
+                    pendientes = np.flatnonzero(mia & (res < 0) & (True if largo is None else largo_perfil >= largo))
+                    if not len(pendientes) or not len(claves): continue
+                    buscados = perfiles[pendientes] if largo is None else perfiles[pendientes].astype(f"<U{largo}")
+                    pos = np.minimum(np.searchsorted(claves, buscados), len(claves) - 1)
+                    acierto = claves[pos] == buscados
+                    res[pendientes[acierto]] = entradas[pos[acierto]]
+            for regex, entrada in indice[COMODIN]:
+                pendientes = np.flatnonzero(mia & (res < 0))
+                if not len(pendientes): break
+                acierto = np.array([bool(regex.match(p)) for p in perfiles[pendientes]], dtype=bool)
+                res[pendientes[acierto]] = entrada
+        return res
+
+# --- FORMA COMPILADA (.npz sin pickle, en la carpeta de bcs_cache) ---
+def _ruta_compilado(huella):
+    return os.path.join(bcs_cache.CARPETA_CACHE, f"catalogo_{huella}.npz")
+
+def compilar(ruta_csv):
+    """Lee el CSV y guarda su forma compilada. Devuelve el Catalogo."""
+    huella = bcs_cache.clave_huella(bcs_cache.huella_archivo(ruta_csv), VERSION_CATALOGO)
+    catalogo = Catalogo(leer_csv(ruta_csv), huella)
+    os.makedirs(bcs_cache.CARPETA_CACHE, exist_ok=True)
+    destino = _ruta_compilado(huella); temporal = destino + ".tmp"
+    with open(temporal, "wb") as f: np.savez(f, **catalogo.columnas)
+    os.replace(temporal, destino) # Escritura atómica
+    print(f"💶 CATÁLOGO: {len(catalogo)} precios compilados de '{ruta_csv}'.")
+    return catalogo
+
+@functools.lru_cache(maxsize=4)
+def _cargar(ruta_csv, _mtime):
+    huella = bcs_cache.clave_huella(bcs_cache.huella_archivo(ruta_csv), VERSION_CATALOGO)
+    compilado = _ruta_compilado(huella)
+    if os.path.exists(compilado):
+        try:
+            with np.load(compilado, allow_pickle=False) as f: return Catalogo({c: f[c] for c in f.files}, huella)
+        except Exception: pass # Compilado corrupto: se rehace
+    return compilar(ruta_csv)
+
+def cargar_catalogo(ruta_csv):
+    """Catálogo del CSV: usa la forma compilada si el CSV no ha cambiado (y la memoria si ya se cargó)."""
+    return _cargar(os.path.abspath(ruta_csv), os.path.getmtime(ruta_csv))
+
+def tarifa(ruta_csv=None, calidad=None, acabado=None, proveedor=None):
+    """Tarifa de la obra; sin ruta usa BCS_CATALOGO. None si no hay catálogo (precios por categoría)."""
+    ruta_csv = ruta_csv or ARCHIVO_CATALOGO
+    if not ruta_csv: return None
+    return cargar_catalogo(ruta_csv).tarifa(calidad, acabado, proveedor)
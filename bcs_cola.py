@@ -0,0 +1,332 @@
+# bcs_cola.py
+"""
+Cola local de trabajos para la app web, sin broker externo: una tabla SQLite con los
+trabajos y un pool de procesos trabajadores que la consultan. La app encola la subida y
+consulta el estado; el avance es real (elementos extraídos / total y etapa en curso).
+El IFC subido nunca se escribe a disco: viaja a los trabajadores en memoria compartida.
+"""
+import atexit
+import contextlib
+import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from multiprocessing import shared_memory
+
+# --- CONFIGURACIÓN ---
+CARPETA_ACTUAL = os.path.dirname(os.path.abspath(__file__))
+CARPETA_COLA = os.environ.get("BCS_COLA_DIR", os.path.join(tempfile.gettempdir(), "bcs_cola"))
+TRABAJADORES = int(os.environ.get("BCS_COLA_TRABAJADORES", "2")) # Trabajos a la vez (límite de concurrencia)
+TIMEOUT_TRABAJO_S = float(os.environ.get("BCS_COLA_TIMEOUT", "0")) or None
+HORAS_RETENCION = 24 # Los trabajos terminados (y sus archivos) se borran pasado este tiempo
+PESO_EXTRACCION = 0.6 # Parte de la barra de progreso que corresponde a la extracción
+ESTADOS_FINALES = ("hecho", "error", "cancelado")
+PREFIJO_BLOQUE = "bcs_" # Bloques de memoria compartida con los IFC subidos (uno por huella)
+CABECERA_BLOQUE = 8 # Tamaño real del IFC al principio del bloque (el sistema lo redondea a páginas)
+
+ESQUEMA = """CREATE TABLE IF NOT EXISTS trabajos (
+    id TEXT PRIMARY KEY, sesion TEXT, archivo TEXT, huella TEXT, opciones TEXT,
+    estado TEXT, etapa TEXT, hechas INTEGER, total INTEGER, progreso REAL, mensaje TEXT,
+    trabajador INTEGER, creado REAL, inicio REAL, fin REAL, tiempos TEXT, reemplaza TEXT)"""
+_ESQUEMA_AL_DIA = False
+
+class TrabajoCancelado(Exception):
+    pass
+
+def _conectar():
+    os.makedirs(CARPETA_COLA, exist_ok=True)
+    con = sqlite3.connect(os.path.join(CARPETA_COLA, "cola.sqlite"), timeout=30, isolation_level=None)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL"); con.execute(ESQUEMA)
+    global _ESQUEMA_AL_DIA
+    if not _ESQUEMA_AL_DIA: # Colas creadas antes de la columna 'reemplaza'
+        if "reemplaza" not in {f["name"] for f in con.execute("PRAGMA table_info(trabajos)")}:
+            con.execute("ALTER TABLE trabajos ADD COLUMN reemplaza TEXT")
+        _ESQUEMA_AL_DIA = True
+    return con
+
+def _sql(consulta, *args):
+    """Ejecuta una sentencia (autocommit). Devuelve (filas como dicts, filas afectadas)."""
+    con = _conectar()
+    try:
+        cur = con.execute(consulta, args)
+        return [dict(f) for f in cur.fetchall()], cur.rowcount
+    finally: con.close()
+
+@contextlib.contextmanager
+def _transaccion():
+    """Conexión con BEGIN IMMEDIATE: lo que se hace dentro no se intercala con otros procesos."""
+    con = _conectar()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        yield con
+        con.execute("COMMIT")
+    except BaseException:
+        if con.in_transaction: con.execute("ROLLBACK")
+        raise
+    finally: con.close()
+
+def carpeta_trabajo(tid):
+    return os.path.join(CARPETA_COLA, tid)
+
+# --- IFC SUBIDO EN MEMORIA COMPARTIDA ---
+# La app copia la subida una vez a un bloque con nombre (por huella) y el trabajador lo lee sin copiarlo.
+# El bloque vive mientras quede algún trabajo con esa huella: cambiar las opciones no vuelve a subir nada.
+def _nombre_bloque(huella):
+    return PREFIJO_BLOQUE + huella[:24]
+
+def _guardar_entrada(huella, contenido):
+    """Copia los bytes del IFC a su bloque (si otro trabajo ya lo tiene, se comparte)."""
+    try: bloque = shared_memory.SharedMemory(_nombre_bloque(huella), create=True, size=CABECERA_BLOQUE + len(contenido))
+    except FileExistsError: return
+    bloque.buf[:CABECERA_BLOQUE] = len(contenido).to_bytes(CABECERA_BLOQUE, "little")
+    bloque.buf[CABECERA_BLOQUE:CABECERA_BLOQUE + len(contenido)] = contenido
+    bloque.close()
+
+def _borrar_entrada(huella):
+    try: bloque = shared_memory.SharedMemory(_nombre_bloque(huella))
+    except FileNotFoundError: return
+    bloque.close(); bloque.unlink()
+
+@contextlib.contextmanager
+def entrada(huella):
+    """Bytes del IFC subido (memoryview sobre el bloque, sin copia) mientras dura el 'with'."""
+    try: bloque = shared_memory.SharedMemory(_nombre_bloque(huella))
+    except FileNotFoundError:
+        raise FileNotFoundError("El IFC subido ya no está en memoria (¿se reinició el servidor?). Vuelve a subirlo.") from None
+    vista = bloque.buf[CABECERA_BLOQUE:CABECERA_BLOQUE + int.from_bytes(bloque.buf[:CABECERA_BLOQUE], "little")]
+    try: yield vista
+    finally: vista.release(); bloque.close()
+
+# --- API PARA LA APP ---
+def normalizar_opciones(opciones):
+    """Opciones tal y como quedan guardadas (fechas en ISO): sirve para compararlas."""
+    return json.loads(json.dumps(opciones, sort_keys=True, default=str))
+
+def encolar(contenido, nombre, sesion=None, reemplaza=None, **opciones):
+    """
+    Registra un trabajo con los bytes del IFC subido (se guardan en memoria compartida) y devuelve su id.
+    Si la misma sesión ya tiene ese IFC con las mismas opciones (en cola, en curso o hecho), se reutiliza.
+    'reemplaza': trabajo anterior de la sesión que queda obsoleto. Se cancela ya y se borra (fila y
+    carpeta) cuando termina el nuevo, que antes reutiliza sus entregables de la caché de etapas.
+    Con contenido=None el nuevo trabajo usa el IFC que ya tiene 'reemplaza' (y su nombre si nombre=None).
+    """
+    if contenido is None:
+        previo = estado(reemplaza) if reemplaza else None
+        if previo is None: raise ValueError("Sin IFC: hace falta su contenido o un trabajo 'reemplaza' que siga en la cola.")
+        huella = previo["huella"]; nombre = nombre or previo["archivo"]
+    else: huella = hashlib.sha256(contenido).hexdigest()
+    texto_opciones = json.dumps(opciones, sort_keys=True, default=str)
+    previos, _ = _sql("SELECT id, estado FROM trabajos WHERE sesion IS ? AND huella=? AND archivo=? AND opciones=? "
+                      "AND estado IN ('pendiente', 'en_curso', 'hecho') ORDER BY creado DESC LIMIT 1",
+                      sesion, huella, nombre, texto_opciones)
+    if previos and os.path.isdir(carpeta_trabajo(previos[0]["id"])):
+        if reemplaza and reemplaza != previos[0]["id"]: borrar(reemplaza)
+        return previos[0]["id"]
+
+    tid = uuid.uuid4().hex
+    os.makedirs(carpeta_trabajo(tid))
+    with _transaccion() as con: # Nadie libera el bloque entre guardarlo y registrar el trabajo que lo usa
+        if contenido is not None: _guardar_entrada(huella, contenido)
+        con.execute("INSERT INTO trabajos (id, sesion, archivo, huella, opciones, estado, etapa, hechas, total, progreso, "
+                    "creado, reemplaza) VALUES (?, ?, ?, ?, ?, 'pendiente', 'en cola', 0, 0, 0.0, ?, ?)",
+                    (tid, sesion, nombre, huella, texto_opciones, time.time(), reemplaza))
+    if reemplaza: cancelar(reemplaza)
+    print(f"📥 COLA: Trabajo {tid[:8]} encolado ({nombre}).")
+    return tid
+
+def estado(tid):
+    """Fila del trabajo (dict) con 'posicion' en la cola si está pendiente; None si no existe."""
+    filas, _ = _sql("SELECT * FROM trabajos WHERE id=?", tid)
+    if not filas: return None
+    fila = filas[0]; fila["opciones"] = json.loads(fila["opciones"])
+    fila["tiempos"] = json.loads(fila["tiempos"]) if fila["tiempos"] else {}
+    fila["carpeta"] = carpeta_trabajo(tid)
+    if fila["estado"] == "pendiente":
+        delante, _ = _sql("SELECT COUNT(*) AS n FROM trabajos WHERE estado='pendiente' AND creado < ?", fila["creado"])
+        fila["posicion"] = delante[0]["n"] + 1
+    return fila
+
+def cancelar(tid):
+    """Un trabajo en cola no llega a empezar; uno en curso se detiene en su siguiente aviso de avance."""
+    _sql("UPDATE trabajos SET estado='cancelado', fin=? WHERE id=? AND estado IN ('pendiente', 'en_curso')", time.time(), tid)
+
+def borrar(tid):
+    """Cancela el trabajo y borra su fila y sus archivos (y el IFC en memoria si ya no lo usa ningún otro)."""
+    cancelar(tid)
+    shutil.rmtree(carpeta_trabajo(tid), True)
+    with _transaccion() as con:
+        fila = con.execute("SELECT huella FROM trabajos WHERE id=?", (tid,)).fetchone()
+        con.execute("DELETE FROM trabajos WHERE id=?", (tid,))
+        if fila and not con.execute("SELECT 1 FROM trabajos WHERE huella=? LIMIT 1", (fila["huella"],)).fetchone():
+            _borrar_entrada(fila["huella"])
+
+def borrar_sesion(sesion):
+    """Borra todos los trabajos de una sesión (p.ej. al reiniciar o cambiar de archivo)."""
+    trabajos, _ = _sql("SELECT id FROM trabajos WHERE sesion=?", sesion)
+    for t in trabajos: borrar(t["id"])
+
+def adoptar(tid, sesion):
+    """La página se recargó con el trabajo en la URL: pasa a la sesión nueva y ya no se borra con la anterior."""
+    _sql("UPDATE trabajos SET sesion=? WHERE id=?", sesion, tid)
+
+class VigiaSesion:
+    """
+    Va en el estado de la sesión web: cuando Streamlit la descarta (o el proceso termina) borra sus
+    trabajos, con sus entregables y el IFC en memoria, sin esperar a la purga.
+    """
+    def __init__(self, sesion=None):
+        self.sesion = sesion or uuid.uuid4().hex
+        self._final = weakref.finalize(self, borrar_sesion, self.sesion)
+
+    def cerrar(self):
+        self._final()
+
+def purgar(horas=HORAS_RETENCION):
+    """Borra los trabajos terminados hace más de 'horas' (fila y carpeta)."""
+    viejos, _ = _sql(f"SELECT id FROM trabajos WHERE estado IN {ESTADOS_FINALES} AND fin < ?", time.time() - horas * 3600)
+    for t in viejos: borrar(t["id"])
+    return len(viejos)
+
+def recuperar():
+    """Tras reiniciar el servidor, los trabajos que estaban en curso vuelven a la cola."""
+    _, n = _sql("UPDATE trabajos SET estado='pendiente', etapa='en cola', hechas=0, total=0, progreso=0.0 "
+                "WHERE estado='en_curso'")
+    if n: print(f"♻️ COLA: {n} trabajos interrumpidos vuelven a la cola.")
+
+# --- TRABAJADORES ---
+def _actualizar(tid, **campos):
+    """Actualiza un trabajo en curso. Devuelve False si ya no lo está (cancelado o borrado)."""
+    asignaciones = ", ".join(f"{c}=?" for c in campos)
+    _, n = _sql(f"UPDATE trabajos SET {asignaciones} WHERE id=? AND estado='en_curso'", *campos.values(), tid)
+    return n > 0
+
+class _Avance:
+    """Escribe el avance en la tabla (como mucho cada 0,3 s o al cambiar de etapa) y detecta cancelaciones."""
+    def __init__(self, tid): self.tid = tid; self.etapa = None; self.ultimo = 0.0
+    def __call__(self, etapa, hechas, total, desde, hasta):
+        ahora = time.monotonic()
+        if etapa == self.etapa and hechas < total and ahora - self.ultimo < 0.3: return
+        self.etapa = etapa; self.ultimo = ahora
+        progreso = desde + (hasta - desde) * hechas / max(total, 1)
+        if not _actualizar(self.tid, etapa=etapa, hechas=hechas, total=total, progreso=progreso):
+            raise TrabajoCancelado(self.tid)
+
+def _reclamar(n, huellas):
+    """
+    Toma el trabajo pendiente más antiguo de una sesión que no tenga otro en curso (un usuario
+    con varios modelos no acapara los trabajadores). Entre ellos prefiere un IFC que ya tiene en memoria.
+    """
+    with _transaccion() as con:
+        filas = con.execute("SELECT * FROM trabajos WHERE estado='pendiente' AND (sesion IS NULL OR sesion NOT IN "
+                            "(SELECT sesion FROM trabajos WHERE estado='en_curso' AND sesion IS NOT NULL)) "
+                            "ORDER BY creado").fetchall()
+        fila = next((f for f in filas if f["huella"] in huellas), filas[0] if filas else None)
+        if fila is not None:
+            con.execute("UPDATE trabajos SET estado='en_curso', trabajador=?, inicio=?, etapa='inicio' WHERE id=?",
+                        (n, time.time(), fila["id"]))
+    return dict(fila) if fila is not None else None
+
+def _ejecutar(trabajo, memoria):
+    """Extracción + entregables de un trabajo; la salida de consola va a bcs.log de su carpeta."""
+    import bcs, bcs_core, bcs_pipeline
+    tid = trabajo["id"]; huella = trabajo["huella"]; carpeta = carpeta_trabajo(tid)
+    opciones = json.loads(trabajo["opciones"]); avance = _Avance(tid)
+    with open(os.path.join(carpeta, "bcs.log"), "a", encoding="utf-8") as log:
+        sys.stdout = sys.stderr = log
+        try:
+            with entrada(huella) as contenido:
+                if huella not in memoria:
+                    memoria.clear() # Un solo modelo en memoria por trabajador
+                    datos, modelo = bcs_core.extraer_datos_modelo(
+                        contenido=contenido,
+                        al_avanzar=lambda hechas, total: avance("extraccion", hechas, total, 0.0, PESO_EXTRACCION))
+                    memoria[huella] = (datos, modelo, {})
+                datos, modelo, cache = memoria[huella]
+                if not datos: raise ValueError("No se encontraron elementos estructurales.")
+                rutas = bcs.rutas_salida(trabajo["archivo"], carpeta, opciones.get("ifczip", False))
+                tiempos = bcs_pipeline.generar_entregables(
+                    datos, modelo, rutas,
+                    datetime.date.fromisoformat(opciones["fecha_inicio"]), opciones["rendimiento_kg"],
+                    opciones.get("iso_status", "S2"), opciones.get("iso_suitability", "Para Información"),
+                    al_terminar=lambda etapa, hechas, total: avance(etapa, hechas, total, PESO_EXTRACCION, 1.0),
+                    cache=cache, huella=huella, ruta_zip=rutas["zip"], region=opciones.get("region"), contenido=contenido)
+            _actualizar(tid, estado="hecho", etapa="fin", progreso=1.0, fin=time.time(), tiempos=json.dumps(tiempos))
+        except TrabajoCancelado:
+            print(f"🛑 COLA: Trabajo {tid[:8]} cancelado.")
+        except Exception as e:
+            print(f"❌ {type(e).__name__}: {e}")
+            _actualizar(tid, estado="error", mensaje=f"{type(e).__name__}: {e}", fin=time.time())
+        finally:
+            sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+            if trabajo.get("reemplaza"): borrar(trabajo["reemplaza"]) # Sus entregables ya se han reutilizado
+
+def _bucle_trabajador(n, padre):
+    """Proceso trabajador: reclama trabajos hasta que el proceso que lo lanzó desaparece."""
+    if CARPETA_ACTUAL not in sys.path: sys.path.insert(0, CARPETA_ACTUAL)
+    memoria = {} # huella -> (datos, modelo, caché de etapas): cambiar solo las opciones es barato
+    while os.getppid() == padre:
+        trabajo = _reclamar(n, list(memoria))
+        if trabajo is None: time.sleep(0.5)
+        else: _ejecutar(trabajo, memoria)
+
+class Cola:
+    """Lanza y vigila los procesos trabajadores: reinicia los caídos, aplica el timeout y purga."""
+    def __init__(self, trabajadores=None, timeout_s=None):
+        self.trabajadores = trabajadores or TRABAJADORES
+        self.timeout_s = TIMEOUT_TRABAJO_S if timeout_s is None else timeout_s
+        self.ctx = multiprocessing.get_context("spawn"); self.procesos = {}
+        self._parar = threading.Event(); self._hilo = None
+
+    def _lanzar(self, n):
+        # No daemon: los trabajadores lanzan a su vez el pool de los PDF
+        p = self.ctx.Process(target=_bucle_trabajador, args=(n, os.getpid()), name=f"bcs-trabajador-{n}")
+        p.start(); self.procesos[n] = p
+
+    def arrancar(self):
+        recuperar(); purgar()
+        for n in range(self.trabajadores): self._lanzar(n)
+        self._hilo = threading.Thread(target=self._vigilar, name="bcs-cola", daemon=True); self._hilo.start()
+        atexit.register(self.parar)
+        print(f"🚦 COLA: {self.trabajadores} trabajadores en {CARPETA_COLA}.")
+        return self
+
+    def _vigilar(self):
+        ultima_purga = time.monotonic()
+        while not self._parar.wait(1.0):
+            for n, p in list(self.procesos.items()):
+                if p.is_alive(): continue
+                _sql("UPDATE trabajos SET estado='error', mensaje=?, fin=? WHERE estado='en_curso' AND trabajador=?",
+                     f"El proceso trabajador terminó inesperadamente (código {p.exitcode}).", time.time(), n)
+                self._lanzar(n)
+            if self.timeout_s:
+                lentos, _ = _sql("SELECT id, trabajador FROM trabajos WHERE estado='en_curso' AND inicio < ?",
+                                 time.time() - self.timeout_s)
+                for t in lentos:
+                    _actualizar(t["id"], estado="error", mensaje=f"Tiempo agotado ({self.timeout_s:g} s).", fin=time.time())
+                    p = self.procesos.get(t["trabajador"])
+                    if p: p.terminate(); p.join(); self._lanzar(t["trabajador"])
+            if time.monotonic() - ultima_purga > 600: purgar(); ultima_purga = time.monotonic()
+
+    def parar(self):
+        self._parar.set()
+        for p in self.procesos.values(): p.terminate()
+        for p in self.procesos.values(): p.join()
+
+_COLA = None; _BLOQUEO_COLA = threading.Lock()
+
+def arrancar(trabajadores=None, timeout_s=None):
+    """Cola del proceso: la primera llamada lanza los trabajadores (la app la llama en cada recarga)."""
+    global _COLA
+    with _BLOQUEO_COLA:
+        if _COLA is None: _COLA = Cola(trabajadores, timeout_s).arrancar()
+    return _COLA
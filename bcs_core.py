@@ -1,203 +1,757 @@
 # bcs_core.py
+import os
+import re
+import csv
+import hashlib
+import time
+import multiprocessing
+import array
+import itertools
+import weakref
+import numpy as np
 import ifcopenshell
 import ifcopenshell.util.element
 import ifcopenshell.util.placement
-import google.generativeai as genai
+import ifcopenshell.util.unit
+import bcs_tabla
+import bcs_cache
+import bcs_ia
 
 DENSIDAD_ACERO = 7850.0 
-MODELO_IA = None; CACHE_IA = {}; USAR_IA = False
+VERSION_EXTRACTOR = "7" # Cambiarla invalida la caché de extracciones
+MODELO_IA = None; BACKEND_IA = None; USAR_IA = False
 
-def configurar_ia(api_key):
-    global MODELO_IA, USAR_IA
+def configurar_ia(api_key=None, backend=None):
+    """
+    Activa la reclasificación por IA de las piezas GENERICO (ver bcs_ia).
+    backend="simulado" (o BCS_IA=simulado) usa el backend local sin red.
+    """
+    global MODELO_IA, BACKEND_IA, USAR_IA
+    if (backend or os.environ.get("BCS_IA")) == "simulado":
+        BACKEND_IA = bcs_ia.BackendSimulado(); USAR_IA = True
+        print("🤖 CORE: IA simulada (offline)."); return
     if not api_key or "PON_AQUI" in api_key: USAR_IA = False; return
     try:
+        import google.generativeai as genai # Solo se carga si se activa la IA (~0,6 s)
         genai.configure(api_key=api_key)
         MODELO_IA = genai.GenerativeModel('gemini-pro')
+        BACKEND_IA = bcs_ia.BackendGemini(MODELO_IA)
         USAR_IA = True
         print("🤖 CORE: IA Gemini conectada.")
     except: USAR_IA = False
 
+def categorias_ia():
+    """Categorías que puede devolver la IA: las de las reglas activas más GENERICO."""
+    return list(dict.fromkeys([cat for cat, _, _ in CLASIFICADOR.reglas] + ["GENERICO"]))
+
 def cargar_modelo(ruta):
     print(f"🔄 CORE: Cargando {ruta}...")
     return ifcopenshell.open(ruta)
 
-def obtener_peso_neto(elemento):
-    psets = ifcopenshell.util.element.get_psets(elemento)
-    for ps in psets.values():
-        for key, val in ps.items():
-            k = key.lower()
-            if isinstance(val, (int, float)) and val > 0:
-                if "netweight" in k: return float(val) 
-                if "mass" in k: return float(val)      
-    for ps in psets.values():
-        val = ps.get("NetVolume", ps.get("Volume", 0))
-        if isinstance(val, (int, float)) and val > 0: return float(val) * DENSIDAD_ACERO
-    return 0.0
+def cargar_modelo_bytes(contenido):
+    """Abre un IFC (STEP) desde memoria (bytes o memoryview, p.ej. una subida web) sin pasar por un archivo temporal."""
+    print(f"🔄 CORE: Cargando IFC desde memoria ({len(contenido) / 1024:.1f} KB)...")
+    return ifcopenshell.file.from_string(str(contenido, "utf-8", "replace"))
+
+def modelo_de_tabla(datos, ruta_ifc=None, contenido=None):
+    """Modelo de la tabla; si salió de la caché sin abrirlo, se abre ahora (mismo IFC = mismos ids)."""
+    if datos.modelo is None: datos.modelo = cargar_modelo(ruta_ifc) if contenido is None else cargar_modelo_bytes(contenido)
+    return datos.modelo
+
+# --- ÍNDICE DEL MODELO (Psets, agregaciones, unidades y placements resueltos una sola vez por modelo) ---
+def _aplanar_definicion(definicion):
+    """Convierte un Pset/Qto en una tabla {clave en minúsculas: valor}."""
+    props = ifcopenshell.util.element.get_property_definition(definicion) or {}
+    return {k.lower(): v for k, v in props.items() if k != "id"}
+
+def indexar_propiedades(ifc_file):
+    """
+    Recorre UNA vez IfcRelDefinesByProperties (+ Psets de tipo) y devuelve el índice
+    id -> {clave en minúsculas: valor}. Los Psets compartidos se aplanan una sola vez.
+    """
+    print("🗂️ CORE: Indexando propiedades del modelo...")
+    indice = {}
+    planas = {}  # id de definición -> tabla plana (compartida)
+    propias = set()  # ids cuya tabla ya es una copia propia (se puede mezclar)
+
+    def asignar(objeto, tabla):
+        # La primera definición que aporta una clave es la que manda
+        oid = objeto.id()
+        actual = indice.get(oid)
+        if actual is None: indice[oid] = tabla; return
+        if oid not in propias: actual = dict(actual); indice[oid] = actual; propias.add(oid)
+        for k, v in tabla.items(): actual.setdefault(k, v)
+
+    def plana(definicion):
+        if definicion.id() not in planas: planas[definicion.id()] = _aplanar_definicion(definicion)
+        return planas[definicion.id()]
+
+    for rel in ifc_file.by_type("IfcRelDefinesByProperties"):
+        defs = rel.RelatingPropertyDefinition
+        defs = defs if isinstance(defs, (list, tuple)) else [defs]
+        for d in defs:
+            tabla = plana(d)
+            for obj in rel.RelatedObjects: asignar(obj, tabla)
+
+    # Psets del tipo: solo rellenan claves que la ocurrencia no tenga
+    for rel in ifc_file.by_type("IfcRelDefinesByType"):
+        for d in (getattr(rel.RelatingType, "HasPropertySets", None) or []):
+            tabla = plana(d)
+            for obj in rel.RelatedObjects: asignar(obj, tabla)
+
+    print(f"   -> {len(indice)} elementos indexados ({len(planas)} Psets distintos).")
+    return indice
+
+class IndiceModelo:
+    """
+    Lo que la extracción consulta de un modelo, resuelto una vez: propiedades planas por id,
+    agregaciones, escala de longitud, placements y volúmenes de malla. Lo guarda el propio
+    modelo (indexar_modelo) y las funciones de lectura lo reciben como parámetro: muere con
+    el modelo y dos modelos abiertos a la vez (p.ej. en un trabajador de bcs_cola) no se pisan.
+
+    Con perezoso=True (extracción en flujo) no se indexa el modelo entero: las propiedades de
+    cada pieza se resuelven al pedirlas (mismas reglas que indexar_propiedades), las cotas se
+    calculan por cadena de placements y liberar() olvida lo resuelto entre lotes. Solo quedan
+    para todo el modelo los arrays int64 de agregaciones (16 bytes por relación padre-hijo).
+    """
+    def __init__(self, ifc_file, propiedades=None, perezoso=False):
+        self._modelo = weakref.ref(ifc_file) # Sin ciclo modelo <-> índice
+        self.perezoso = perezoso
+        if perezoso: self.propiedades = {}; self._planas = {}
+        else: self.propiedades = indexar_propiedades(ifc_file) if propiedades is None else propiedades
+        self.agregaciones = IndiceAgregaciones(ifc_file)
+        self.escala_mm = leer_unidades(ifc_file)
+        self.placements = None # ResolutorPlacements (se crea la primera vez que hace falta)
+        self.volumenes = {} # id de malla -> m3 (peso por geometría; la comparten las partes con IfcMappedItem)
+        self.geometria = {"partes": 0, "mallas": 0, "segundos": 0.0}
+
+    @property
+    def modelo(self): return self._modelo()
+
+    def by_id(self, eid): return self._modelo().by_id(eid)
+
+    def props(self, eid):
+        tabla = self.propiedades.get(eid)
+        if tabla is None:
+            if not self.perezoso: return {}
+            tabla = self.propiedades[eid] = self._resolver(self.by_id(eid))
+        return tabla
+
+    def _resolver(self, elemento):
+        """Tabla plana de un elemento: sus Psets por orden de relación y después los de su tipo."""
+        def plana(definicion):
+            if definicion.id() not in self._planas: self._planas[definicion.id()] = _aplanar_definicion(definicion)
+            return self._planas[definicion.id()]
+        rels = sorted(elemento.IsDefinedBy, key=lambda r: r.id())
+        tipos = sorted([r for r in rels if r.is_a("IfcRelDefinesByType")] + list(getattr(elemento, "IsTypedBy", ())),
+                       key=lambda r: r.id())
+        tabla = {}
+        for rel in rels:
+            if not rel.is_a("IfcRelDefinesByProperties"): continue
+            defs = rel.RelatingPropertyDefinition
+            for d in (defs if isinstance(defs, (list, tuple)) else [defs]):
+                for k, v in plana(d).items(): tabla.setdefault(k, v)
+        for rel in tipos:
+            for d in (getattr(rel.RelatingType, "HasPropertySets", None) or []):
+                for k, v in plana(d).items(): tabla.setdefault(k, v)
+        return tabla
+
+    def z(self, placement):
+        """Z absoluta (mm) de un placement."""
+        if self.perezoso: return z_placement(placement, self.escala_mm)
+        if self.placements is None: self.placements = ResolutorPlacements(self.modelo, self.escala_mm)
+        return self.placements.z(placement)
+
+    def liberar(self):
+        """Olvida las propiedades resueltas en modo perezoso (entre lotes de la extracción en flujo)."""
+        if self.perezoso: self.propiedades.clear(); self._planas.clear(); self.volumenes.clear()
+
+def indexar_modelo(ifc_file):
+    """Índice del modelo: se construye la primera vez que se pide y queda guardado en el propio modelo."""
+    indice = getattr(ifc_file, "_indice_bcs", None)
+    if indice is None: indice = ifc_file._indice_bcs = IndiceModelo(ifc_file)
+    return indice
+
+def registrar_indice(modelo, propiedades):
+    """Instala en el modelo un índice de propiedades construido fuera de ifcopenshell (p.ej. el pre-escáner lite)."""
+    modelo._indice_bcs = IndiceModelo(modelo, propiedades)
+    return modelo._indice_bcs
+
+# --- ÍNDICE DE AGREGACIONES (IfcRelAggregates en una sola pasada) ---
+class IndiceAgregaciones:
+    """
+    Descomposición del modelo en arrays: padre -> hijos (formato CSR: claves/inicios/hijos)
+    e hijo -> padre (arrays ordenados). Sustituye al recorrido inverso IsDecomposedBy.
+    """
+    def __init__(self, ifc_file):
+        padres = array.array("q"); hijos = array.array("q")
+        for rel in ifc_file.by_type("IfcRelAggregates"):
+            pid = rel.RelatingObject.id()
+            for h in rel.RelatedObjects: padres.append(pid); hijos.append(h.id())
+        p = np.array(padres, dtype=np.int64); h = np.array(hijos, dtype=np.int64)
+        orden = np.argsort(p, kind="stable") # Mantiene el orden de RelatedObjects
+        self.claves, self.inicios = np.unique(p[orden], return_index=True)
+        self.fines = np.r_[self.inicios[1:], len(p)].astype(np.int64)
+        self.hijos = h[orden]
+        orden = np.argsort(h, kind="stable")
+        self.hijos_ord = h[orden]; self.padre_de_hijo = p[orden]
+        self.contenedores = np.sort(np.array([e.id() for t in TIPOS_CONTENEDOR for e in ifc_file.by_type(t)], dtype=np.int64))
 
-def obtener_propiedad(elemento, nombres_posibles):
-    """Busca una propiedad en los Psets del elemento."""
-    psets = ifcopenshell.util.element.get_psets(elemento)
-    for ps in psets.values():
+    def hijos_de(self, pid):
+        i = np.searchsorted(self.claves, pid)
+        if i < len(self.claves) and self.claves[i] == pid: return self.hijos[self.inicios[i]:self.fines[i]].tolist()
+        return []
+
+    def padre_de(self, hid):
+        """Id del padre de un elemento (-1 si no está agregado)."""
+        i = np.searchsorted(self.hijos_ord, hid)
+        if i < len(self.hijos_ord) and self.hijos_ord[i] == hid: return int(self.padre_de_hijo[i])
+        return -1
+
+    def es_contenedor(self, eid):
+        i = np.searchsorted(self.contenedores, eid)
+        return bool(i < len(self.contenedores) and self.contenedores[i] == eid)
+
+    def con_padre_contenedor(self, ids):
+        """Máscara: elementos que cuelgan de un Assembly/Anclaje (se extraen dentro de él)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(self.hijos_ord): return np.zeros(len(ids), dtype=bool)
+        i = np.searchsorted(self.hijos_ord, ids).clip(max=len(self.hijos_ord) - 1)
+        return (self.hijos_ord[i] == ids) & np.isin(self.padre_de_hijo[i], self.contenedores)
+
+# --- UNIDADES Y PLACEMENTS (cotas en mm) ---
+def leer_unidades(ifc_file):
+    """Factor unidad de longitud del modelo -> mm (de IfcUnitAssignment). El modelo lite trae su escala ya leída."""
+    escala = getattr(ifc_file, "escala_m", None)
+    if escala is None:
+        try: escala = ifcopenshell.util.unit.calculate_unit_scale(ifc_file)
+        except Exception: escala = 0.001 # Exportaciones de estructura metálica: mm
+    return escala * 1000.0
+
+def cota_mm(valor, escala_mm=1.0):
+    """
+    Cota de un Pset en mm. Los valores numéricos están en la unidad del modelo (escala_mm).
+    Los textos (p.ej. '+3.500' de Tekla) no llevan unidad: se mantiene la regla por magnitud.
+    """
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool): return float(valor) * escala_mm
+    v = float(str(valor).replace('+', ''))
+    return v * 1000.0 if abs(v) < 200 else v
+
+class ResolutorPlacements:
+    """
+    Matriz absoluta de cada IfcLocalPlacement del modelo, calculada una vez para todos.
+    Los nodos se componen por niveles de profundidad con matmul apilado (los padres comunes no se repiten).
+    """
+    def __init__(self, ifc_file, escala_mm):
+        nodos = ifc_file.by_type("IfcLocalPlacement")
+        self.posicion = {p.id(): i for i, p in enumerate(nodos)}
+        n = len(nodos)
+        locales = np.empty((n, 4, 4)); padre = np.full(n, -1, dtype=np.int64)
+        for i, p in enumerate(nodos):
+            locales[i] = ifcopenshell.util.placement.get_axis2placement(p.RelativePlacement)
+            rel = p.PlacementRelTo
+            if rel is not None and rel.id() in self.posicion: padre[i] = self.posicion[rel.id()]
+
+        # Profundidad de cada nodo en su cadena (0 = relativo al mundo)
+        profundidad = np.zeros(n, dtype=np.int64); anc = padre.copy()
+        for _ in range(n):
+            vivos = anc >= 0
+            if not vivos.any(): break
+            profundidad[vivos] += 1; anc[vivos] = padre[anc[vivos]]
+
+        self.matrices = locales.copy()
+        for d in range(1, int(profundidad.max(initial=0)) + 1):
+            idx = np.flatnonzero(profundidad == d)
+            self.matrices[idx] = np.matmul(self.matrices[padre[idx]], locales[idx])
+        self.z_mm = self.matrices[:, 2, 3] * escala_mm; self.escala_mm = escala_mm
+        print(f"   -> {n} placements resueltos ({int(profundidad.max(initial=0)) + 1} niveles).")
+
+    def z(self, placement):
+        i = self.posicion.get(placement.id())
+        if i is not None: return float(self.z_mm[i])
+        # IfcGridPlacement u otros: cálculo directo
+        return ifcopenshell.util.placement.get_local_placement(placement)[2][3] * self.escala_mm
+
+def z_placement(placement, escala_mm):
+    """Z absoluta (mm) de un placement sin resolver el resto del modelo (mismas cuentas que ResolutorPlacements)."""
+    cadena = []; nodo = placement
+    while nodo is not None and nodo.is_a("IfcLocalPlacement"): cadena.append(nodo); nodo = nodo.PlacementRelTo
+    if not cadena: return ifcopenshell.util.placement.get_local_placement(placement)[2][3] * escala_mm
+    matriz = ifcopenshell.util.placement.get_axis2placement(cadena[-1].RelativePlacement)[None]
+    for nodo in reversed(cadena[:-1]):
+        matriz = np.matmul(matriz, ifcopenshell.util.placement.get_axis2placement(nodo.RelativePlacement)[None])
+    return float(matriz[0, 2, 3] * escala_mm)
+
+def altura_placement(elemento, indice=None):
+    """Z absoluta (mm) del ObjectPlacement de un elemento (sin índice, en unidades del modelo)."""
+    placement = getattr(elemento, "ObjectPlacement", None)
+    if placement is None: return 0.0
+    if indice is None: return ifcopenshell.util.placement.get_local_placement(placement)[2][3]
+    return indice.z(placement)
+
+def propiedades_planas(elemento, indice=None):
+    """Devuelve la tabla plana de propiedades de un elemento (entidad o id) desde el índice del modelo."""
+    if indice is not None: return indice.props(elemento if isinstance(elemento, int) else elemento.id())
+    # Sin índice (uso suelto de las funciones): resolución directa
+    if isinstance(elemento, int): return {}
+    tabla = {}
+    for ps in ifcopenshell.util.element.get_psets(elemento).values():
         for k, v in ps.items():
-            if k in nombres_posibles and v: return str(v)
+            if k != "id": tabla.setdefault(k.lower(), v)
+    return tabla
+
+def obtener_peso_neto(elemento, indice=None):
+    props = propiedades_planas(elemento, indice)
+    for k, val in props.items():
+        if isinstance(val, (int, float)) and val > 0:
+            if "netweight" in k: return float(val)
+            if "mass" in k: return float(val)
+    val = props.get("netvolume", props.get("volume", 0))
+    if isinstance(val, (int, float)) and val > 0: return float(val) * DENSIDAD_ACERO
+    return 0.0
+
+def obtener_propiedad(elemento, nombres_posibles, indice=None):
+    """Busca una propiedad en los Psets del elemento (por orden de preferencia)."""
+    props = propiedades_planas(elemento, indice)
+    for nombre in nombres_posibles:
+        v = props.get(nombre.lower())
+        if v: return str(v)
     return ""
 
-def obtener_tag(elemento):
+def obtener_tag(elemento, indice=None):
     """Obtiene el TAG (Marca de Parte). Ej: p102, m30, C1 (si es pieza suelta)."""
     # Tekla suele exportar el Tag en 'Mark', 'Reference' o 'Part Position'
-    tag = obtener_propiedad(elemento, ["Mark", "Reference", "Pos", "Part Position", "Part Mark"])
+    tag = obtener_propiedad(elemento, ["Mark", "Reference", "Pos", "Part Position", "Part Mark"], indice)
     if not tag: 
         if elemento.Name and len(elemento.Name) < 15: return elemento.Name
         return f"ID-{elemento.id()}"
     return tag
 
-def obtener_assembly_mark(elemento, padre=None):
+def obtener_assembly_mark(elemento, padre=None, indice=None):
     """Obtiene el ASSEMBLY MARK (Marca de Conjunto). Ej: C1, V20."""
     # 1. Si tiene padre (Assembly), la marca del padre es la que manda.
+    if padre is None and indice is not None:
+        pid = indice.agregaciones.padre_de(elemento.id())
+        if indice.agregaciones.es_contenedor(pid): padre = indice.by_id(pid)
     if padre:
-        asm_mark = obtener_propiedad(padre, ["Assembly/Cast unit Mark", "Assembly Mark", "Mark"])
+        asm_mark = obtener_propiedad(padre, ["Assembly/Cast unit Mark", "Assembly Mark", "Mark"], indice)
         if asm_mark: return asm_mark
         
     # 2. Si es un elemento suelto, intentamos buscar su propia Assembly Mark
-    asm_mark = obtener_propiedad(elemento, ["Assembly/Cast unit Mark", "Assembly Mark"])
+    asm_mark = obtener_propiedad(elemento, ["Assembly/Cast unit Mark", "Assembly Mark"], indice)
     if asm_mark: return asm_mark
     
     # 3. Si no tiene, asumimos que es una pieza suelta y su Tag es su Assembly Mark
-    return obtener_tag(elemento)
+    return obtener_tag(elemento, indice)
 
-def obtener_altura_real(elemento, padre=None):
+def obtener_altura_real(elemento, padre=None, indice=None):
     objetos = [elemento]
     if padre: objetos.append(padre)
-    claves = ["Assembly/Cast unit bottom elevation", "Bottom elevation", "Elevation"]
+    claves = ["assembly/cast unit bottom elevation", "bottom elevation", "elevation"]
+    escala = indice.escala_mm if indice is not None else 1.0
     for obj in objetos:
-        psets = ifcopenshell.util.element.get_psets(obj)
-        for ps in psets.values():
-            for k in claves:
-                if k in ps:
-                    try:
-                        v = float(str(ps[k]).replace('+', ''))
-                        if abs(v) < 200: return v * 1000.0
-                        return v
-                    except: pass
-    try:
-        return ifcopenshell.util.placement.get_local_placement(elemento.ObjectPlacement)[2][3]
+        props = propiedades_planas(obj, indice)
+        for k in claves:
+            if k in props:
+                try: return cota_mm(props[k], escala)
+                except: pass
+    try: return altura_placement(elemento, indice)
     except: return 0.0
 
-def obtener_perfil_real(elemento):
+def obtener_desnivel(elemento, indice=None):
+    """Desnivel en mm entre la cota superior y la inferior de sus Psets (0 si falta alguna): lo usa el 4D."""
+    bottom = None; top = None
+    escala = indice.escala_mm if indice is not None else 1.0
+    for k_low, v in propiedades_planas(elemento, indice).items():
+        if "bottom elevation" in k_low:
+            try: bottom = cota_mm(v, escala)
+            except (TypeError, ValueError): pass
+        if "top elevation" in k_low:
+            try: top = cota_mm(v, escala)
+            except (TypeError, ValueError): pass
+    return abs(top - bottom) if bottom is not None and top is not None else 0.0
+
+def obtener_perfil_real(elemento, indice=None):
     if hasattr(elemento, "Description") and elemento.Description: return str(elemento.Description)
-    prof = obtener_propiedad(elemento, ["Profile", "Profile Name"])
+    prof = obtener_propiedad(elemento, ["Profile", "Profile Name"], indice)
     if prof: return prof
     if hasattr(elemento, "ObjectType") and elemento.ObjectType: return str(elemento.ObjectType)
     return str(elemento.Name) if elemento.Name else "S/N"
 
-def es_placa_confirmada(elemento):
-    p = obtener_perfil_real(elemento).upper().strip()
-    return p.startswith("PL") or p.startswith("FL") or "PLATE" in p or "CHAPA" in p or "PLANCHA" in p
-
-def es_tornillo_estricto(elemento):
-    if es_placa_confirmada(elemento): return False
-    if elemento.is_a("IfcMechanicalFastener"): return True
-    p = obtener_perfil_real(elemento).upper()
-    n = (elemento.Name or "").upper()
-    txt = n + " " + p
-    bad = ["BOLT", "NUT", "WASHER", "TORNILLO", "TUERCA", "ARANDELA", "ANCHOR", "ROD"]
-    return any(x in txt for x in bad)
-
-def clasificar_elemento(elemento):
-    if es_placa_confirmada(elemento): return "PLACA"
-    p = obtener_perfil_real(elemento).upper().replace(" ", "")
-    if any(x in p for x in ["IPE","HEA","HEB","UPN","SHS","RHS","TUBO","HSS","W","UB","UC","ANGULO"]): return "LAMINADO"
-    if len(p) > 1 and p[0] == "L" and p[1].isdigit(): return "LAMINADO"
-    if "REJILLA" in p or "TRAMEX" in p: return "REJILLA"
-    return "GENERICO"
-
-def extraer_datos_bcs(ifc_file):
-    print("🧠 CORE: Extrayendo datos (Separando TAG vs ASSEMBLY MARK)...")
-    datos = []
+# --- CLASIFICADOR (reglas compiladas + memoria por perfil distinto) ---
+# (categoría, texto evaluado, patrones regex). Se evalúan en orden y la primera que casa manda.
+# Textos: "perfil" = perfil en mayúsculas sin espacios extremos; "compacto" = sin ningún espacio.
+REGLAS_CLASIFICACION = [
+    ("PLACA",    "perfil",   ["^PL", "^FL", "PLATE", "CHAPA", "PLANCHA"]),
+    ("LAMINADO", "compacto", ["IPE", "HEA", "HEB", "UPN", "SHS", "RHS", "TUBO", "HSS", "W", "UB", "UC", "ANGULO", r"^L\d"]),
+    ("REJILLA",  "compacto", ["REJILLA", "TRAMEX"]),
+]
+PATRONES_TORNILLO = ["BOLT", "NUT", "WASHER", "TORNILLO", "TUERCA", "ARANDELA", "ANCHOR", "ROD"]
+CLASES_TORNILLO = ["IfcMechanicalFastener"]
+LIMITE_MEMO_CLASIFICADOR = 20000 # Combinaciones recordadas (~5 MB); al llenarse se empieza de nuevo
+
+class Clasificador:
+    """
+    Compila cada regla en una sola alternancia regex y memoriza el resultado por
+    (perfil, nombre, clase IFC): clasificar cuesta O(perfiles distintos), no O(piezas).
+    """
+    def __init__(self, reglas=None, patrones_tornillo=None, clases_tornillo=None):
+        def compilar(patrones): return re.compile("|".join(f"(?:{p})" for p in patrones))
+        self.reglas = [(cat, campo, compilar(pats)) for cat, campo, pats in (reglas or REGLAS_CLASIFICACION) if pats]
+        self.tornillo = compilar(patrones_tornillo or PATRONES_TORNILLO)
+        self.clases_tornillo = {c.upper() for c in (clases_tornillo or CLASES_TORNILLO)}
+        self.firma = hashlib.sha256(repr((reglas or REGLAS_CLASIFICACION, patrones_tornillo or PATRONES_TORNILLO,
+                                          sorted(self.clases_tornillo))).encode()).hexdigest()[:12]
+        self.memo = {}
+
+    def clasificar(self, perfil, nombre, clase):
+        """Devuelve (categoría, es_tornillo) para una combinación perfil / nombre / clase IFC."""
+        clave = (perfil, nombre, clase)
+        res = self.memo.get(clave)
+        if res is None:
+            if len(self.memo) >= LIMITE_MEMO_CLASIFICADOR: self.memo.clear() # Nombres únicos por pieza: memoria acotada
+            textos = {"perfil": perfil.upper().strip(), "compacto": perfil.upper().replace(" ", "")}
+            cat = next((c for c, campo, rx in self.reglas if rx.search(textos[campo])), "GENERICO")
+            if cat == "PLACA": tornillo = False # Una placa confirmada nunca es tornillería
+            else: tornillo = clase.upper() in self.clases_tornillo or bool(self.tornillo.search(nombre.upper() + " " + perfil.upper()))
+            res = self.memo[clave] = (cat, tornillo)
+        return res
+
+def cargar_reglas_csv(ruta):
+    """
+    Lee una tabla de reglas CSV (columnas: categoria;campo;patron), una fila por patrón.
+    La categoría TORNILLO alimenta los patrones de tornillería. Devuelve (reglas, patrones_tornillo).
+    """
+    reglas = {}; tornillo = []
+    with open(ruta, newline="", encoding="utf-8") as f:
+        for fila in csv.DictReader(f, delimiter=";"):
+            cat = fila["categoria"].strip().upper(); patron = fila["patron"].strip()
+            if cat == "TORNILLO": tornillo.append(patron)
+            else: reglas.setdefault((cat, fila.get("campo", "").strip() or "compacto"), []).append(patron)
+    return [(cat, campo, pats) for (cat, campo), pats in reglas.items()], tornillo
+
+# Tabla de reglas de la instalación (también la leen los procesos trabajadores al importar el módulo)
+ARCHIVO_REGLAS = os.environ.get("BCS_REGLAS") # Sin tabla: REGLAS_CLASIFICACION y PATRONES_TORNILLO
+CLASIFICADOR = Clasificador(*cargar_reglas_csv(ARCHIVO_REGLAS)) if ARCHIVO_REGLAS else Clasificador()
+
+def configurar_clasificador(reglas=None, patrones_tornillo=None, clases_tornillo=None):
+    """Sustituye las reglas de clasificación (p.ej. las leídas con cargar_reglas_csv)."""
+    global CLASIFICADOR
+    CLASIFICADOR = Clasificador(reglas, patrones_tornillo, clases_tornillo)
+    return CLASIFICADOR
+
+def clasificacion(elemento, indice=None):
+    """(perfil, categoría, es_tornillo) de un elemento: un único cálculo de perfil por llamada."""
+    perfil = obtener_perfil_real(elemento, indice)
+    return (perfil,) + CLASIFICADOR.clasificar(perfil, elemento.Name or "", elemento.is_a())
+
+def es_placa_confirmada(elemento, indice=None):
+    return clasificacion(elemento, indice)[1] == "PLACA"
+
+def es_tornillo_estricto(elemento, indice=None):
+    return clasificacion(elemento, indice)[2]
+
+def clasificar_elemento(elemento, indice=None):
+    return clasificacion(elemento, indice)[1]
+
+def firma_extractor():
+    """Versión del extractor + reglas activas: cambia si cambia el resultado de la extracción."""
+    return f"{VERSION_EXTRACTOR}-{CLASIFICADOR.firma}" + ("-geo" if USAR_PESO_GEOMETRIA else "")
+
+TIPOS_CONTENEDOR = ["IfcElementAssembly", "IfcMechanicalFastener"]
+TIPOS_SUELTOS = ["IfcBeam", "IfcColumn", "IfcPlate", "IfcMember", "IfcDiscreteAccessory", "IfcBuildingElementProxy"]
+
+def partes_de_contenedor(asm, indice, _visitados=None):
+    """
+    Partes válidas (no tornillería) de un Assembly/Anclaje. Si no tiene, el propio contenedor.
+    Los Assemblies anidados se expanden hasta sus piezas (que pertenecen al de nivel superior).
+    """
+    visitados = _visitados if _visitados is not None else {asm.id()}
+    partes = []
+    # Buscamos partes hijas en el índice de agregaciones
+    for hid in indice.agregaciones.hijos_de(asm.id()):
+        if hid in visitados: continue
+        visitados.add(hid)
+        hijo = indice.by_id(hid)
+        if indice.agregaciones.es_contenedor(hid): partes.extend(partes_de_contenedor(hijo, indice, visitados))
+        elif not es_tornillo_estricto(hijo, indice): partes.append(hijo)
     
-    # 1. CONTENEDORES (Assemblies + Anclajes)
-    contenedores = ifc_file.by_type("IfcElementAssembly") + ifc_file.by_type("IfcMechanicalFastener")
-    ids_procesados = set()
-
-    for asm in contenedores:
-        partes = []
-        # Buscamos partes hijas
-        if asm.IsDecomposedBy:
-            for rel in asm.IsDecomposedBy: 
-                for hijo in rel.RelatedObjects:
-                    if not es_tornillo_estricto(hijo): partes.append(hijo)
-        
-        # Si no tiene hijos válidos, miramos si el propio assembly es válido
-        if not partes:
-            if not es_tornillo_estricto(asm): partes = [asm]
-            else: continue
+    # Si no tiene hijos válidos, miramos si el propio assembly es válido
+    if not partes and not es_tornillo_estricto(asm, indice): partes = [asm]
+    return partes
 
-        # PROCESAMOS CADA PARTE INDIVIDUALMENTE
-        for parte in partes:
-            ids_procesados.add(parte.id())
-            ids_procesados.add(asm.id())
-            
-            w = obtener_peso_neto(parte)
-            if w <= 0.001 and es_placa_confirmada(parte): w = 1.0
-            
-            if w > 0.001:
-                cat = clasificar_elemento(parte)
-                perfil = obtener_perfil_real(parte)
-                z = obtener_altura_real(parte, padre=asm)
-                
-                # --- LA CLAVE ---
-                tag = obtener_tag(parte)                    # Ej: p102
-                asm_mark = obtener_assembly_mark(parte, asm) # Ej: C1
-                
-                datos.append({
-                    "objeto_ifc": parte, "partes_hijas": [parte], 
-                    "referencia": tag,            # PARA 5D y 6D (Detalle)
-                    "assembly_mark": asm_mark,    # PARA 4D (Agrupación)
-                    "categoria": cat, "peso_kg": w, "altura_z": z, "es_tornillo": False,
-                    "perfil_maestro": perfil
-                })
-
-    # 2. SUELTOS
-    tipos = ["IfcBeam", "IfcColumn", "IfcPlate", "IfcMember", "IfcDiscreteAccessory", "IfcBuildingElementProxy"]
-    sueltos = []
-    for t in tipos: sueltos.extend(ifc_file.by_type(t))
+def huella_propiedades(elemento, padre=None, indice=None, peso=None):
+    """
+    Firma (int64) de todo lo que decide la fila de una parte: atributos y Psets de la
+    pieza y de su Assembly, la Z de su placement y, con USAR_PESO_GEOMETRIA, el peso
+    resuelto (puede venir de la geometría). Una pieza movida o re-modelada cambia de firma.
+    """
+    h = hashlib.blake2b(digest_size=8)
+    for obj in (elemento, padre):
+        if obj is None: continue
+        h.update(repr((obj.GlobalId, obj.is_a(), obj.Name, obj.Description, obj.ObjectType)).encode())
+        h.update(repr(sorted(propiedades_planas(obj, indice).items(), key=lambda kv: kv[0])).encode())
+    h.update(repr(round(altura_placement(elemento, indice), 3)).encode())
+    if USAR_PESO_GEOMETRIA and peso is not None: h.update(repr(round(peso, 6)).encode())
+    return int.from_bytes(h.digest(), "little", signed=True)
+
+# --- PESO POR GEOMETRÍA (opcional, para IFC exportados sin cantidades) ---
+USAR_PESO_GEOMETRIA = os.environ.get("BCS_PESO_GEOMETRIA", "0") == "1"
+
+def calcular_pesos_geometricos(ifc_file, partes, indice, hilos=None):
+    """
+    Peso (kg) por id de las 'partes' a partir de su geometría: un recorrido multihilo de
+    ifcopenshell.geom limitado a esas piezas. Las que comparten malla (IfcMappedItem: el
+    iterador devuelve el mismo forma.geometry.id) se miden una vez; los volúmenes quedan en el índice.
+    """
+    partes = list({p.id(): p for p in partes if getattr(p, "Representation", None) is not None}.values())
+    if not partes: return {}
+    from ifcopenshell import geom; from ifcopenshell.util import shape # Solo se cargan en este modo
+    t0 = time.perf_counter()
+    pesos = {}; volumenes = indice.volumenes; mallas = 0 # id de malla -> m3 (el iterador trabaja en metros)
+    iterador = geom.iterator(geom.settings(), ifc_file, hilos or os.cpu_count() or 1, include=partes)
+    if iterador.initialize():
+        while True:
+            forma = iterador.get()
+            vol = volumenes.get(forma.geometry.id)
+            if vol is None: vol = volumenes[forma.geometry.id] = abs(shape.get_volume(forma.geometry)); mallas += 1
+            if vol > 0: pesos[forma.id] = vol * DENSIDAD_ACERO
+            if not iterador.next(): break
+    e = indice.geometria
+    e.update(partes=e["partes"] + len(pesos), mallas=e["mallas"] + mallas, segundos=e["segundos"] + time.perf_counter() - t0)
+    return pesos
+
+def informe_geometria(indice):
+    e = indice.geometria
+    if USAR_PESO_GEOMETRIA and e["partes"]:
+        print(f"   -> {e['partes']} partes con peso por geometría ({e['mallas']} mallas, {e['segundos']:.1f} s).")
+
+def registro_parte(parte, padre=None, indice=None, peso=None):
+    """
+    Fila BCS de una parte (None si no tiene peso útil). 'padre' es su Assembly si lo tiene.
+    'peso' es el ya resuelto por _pesar (Psets o geometría); sin él se leen los Psets.
+    """
+    perfil, cat, _ = clasificacion(parte, indice)
+    if peso is None: peso = obtener_peso_neto(parte, indice)
+    w = 1.0 if peso <= 0.001 and cat == "PLACA" else peso
+    if w <= 0.001: return None
     
-    for elem in sueltos:
-        if elem.id() in ids_procesados: continue
-        if es_tornillo_estricto(elem): continue
-        w = obtener_peso_neto(elem)
-        if w <= 0.001 and es_placa_confirmada(elem): w = 1.0
-
-        if w > 0.001:
-            cat = clasificar_elemento(elem)
-            perfil = obtener_perfil_real(elem)
-            z = obtener_altura_real(elem)
-            
-            tag = obtener_tag(elem)
-            asm_mark = obtener_assembly_mark(elem, None) # Suelto = él mismo
-
-            datos.append({
-                "objeto_ifc": elem, "partes_hijas": [elem],
-                "referencia": tag,
-                "assembly_mark": asm_mark,
-                "categoria": cat, "peso_kg": w, "altura_z": z, "es_tornillo": False,
-                "perfil_maestro": perfil
-            })
+    # --- LA CLAVE ---
+    return {
+        "id": parte.id(), "id_padre": padre.id() if padre else -1,
+        "global_id": parte.GlobalId, "huella_props": huella_propiedades(parte, padre, indice, peso),
+        "referencia": obtener_tag(parte, indice),                     # PARA 5D y 6D (Detalle). Ej: p102
+        "assembly_mark": obtener_assembly_mark(parte, padre, indice), # PARA 4D (Agrupación). Ej: C1 (suelto = él mismo)
+        "categoria": cat, "peso_kg": w,
+        "altura_z": obtener_altura_real(parte, padre, indice),
+        "desnivel_mm": obtener_desnivel(parte, indice),               # PARA 4D (Pilares): sin abrir el modelo después
+        "perfil_maestro": perfil
+    }
+
+def contenedores_raiz(ifc_file, indice):
+    """Ids (int64) de los Assemblies/Anclajes de primer nivel (los anidados se expanden dentro de su padre)."""
+    ids = np.array([e.id() for t in TIPOS_CONTENEDOR for e in ifc_file.by_type(t)], dtype=np.int64)
+    return ids[~indice.agregaciones.con_padre_contenedor(ids)]
+
+def sueltos_libres(ifc_file, indice):
+    """Ids (int64) de los elementos sueltos que no cuelgan de ningún Assembly/Anclaje (regla de "ya procesado")."""
+    ids = np.array([e.id() for t in TIPOS_SUELTOS for e in ifc_file.by_type(t)], dtype=np.int64)
+    return ids[~indice.agregaciones.con_padre_contenedor(ids)]
+
+def _avisador(al_avanzar, total):
+    """Llama a al_avanzar(hechas, total) como mucho ~100 veces (y siempre al terminar)."""
+    paso = max(1, total // 100)
+    def avisar(hechas):
+        if al_avanzar and (hechas % paso == 0 or hechas == total): al_avanzar(hechas, total)
+    return avisar
+
+def iter_unidades(ifc_file, al_avanzar=None, indice=None):
+    """
+    Pares (parte, padre) en el orden de extracción, con la regla de "ya procesado" aplicada.
+    al_avanzar(hechas, total) informa del avance en contenedores + sueltos recorridos.
+    Sin 'indice' se usa el del modelo (indexar_modelo).
+    """
+    indice = indice or indexar_modelo(ifc_file)
+    raices = contenedores_raiz(ifc_file, indice); sueltos = sueltos_libres(ifc_file, indice)
+    avisar = _avisador(al_avanzar, len(raices) + len(sueltos))
+    # 1. CONTENEDORES (Assemblies + Anclajes)
+    for k, aid in enumerate(raices, 1):
+        # PROCESAMOS CADA PARTE INDIVIDUALMENTE
+        asm = indice.by_id(int(aid))
+        for parte in partes_de_contenedor(asm, indice): yield parte, asm
+        avisar(k)
+
+    # 2. SUELTOS (los que cuelgan de un contenedor ya salieron en el paso 1)
+    for k, eid in enumerate(sueltos, len(raices) + 1):
+        elem = indice.by_id(int(eid))
+        if not es_tornillo_estricto(elem, indice): yield elem, None
+        avisar(k)
+
+LOTE_INDICE = 2000 # Unidades entre liberaciones del índice perezoso
+LOTE_GEOMETRIA = 500 # Unidades por recorrido del iterador geométrico (USAR_PESO_GEOMETRIA)
+
+def _pesar(ifc_file, unidades, indice, hilos=None):
+    """(parte, padre, peso) de un tramo de unidades: Psets y, si faltan y USAR_PESO_GEOMETRIA, geometría."""
+    tramo = [(parte, padre, obtener_peso_neto(parte, indice)) for parte, padre in unidades]
+    if USAR_PESO_GEOMETRIA and isinstance(ifc_file, ifcopenshell.file):
+        pesos = calcular_pesos_geometricos(ifc_file, [p for p, _, w in tramo if w <= 0.001], indice, hilos)
+        if pesos: tramo = [(p, padre, pesos.get(p.id(), w) if w <= 0.001 else w) for p, padre, w in tramo]
+    return tramo
+
+def iter_unidades_con_peso(ifc_file, al_avanzar=None, indice=None):
+    """
+    Como iter_unidades pero con el peso de cada parte: (parte, padre, peso). Las partes sin
+    peso en sus Psets se pesan por geometría en tramos de LOTE_GEOMETRIA unidades, dentro del
+    mismo recorrido (sin una pasada previa por todo el modelo).
+    """
+    indice = indice or indexar_modelo(ifc_file)
+    indice.geometria.update(partes=0, mallas=0, segundos=0.0)
+    unidades = iter_unidades(ifc_file, al_avanzar, indice)
+    while True:
+        tramo = _pesar(ifc_file, itertools.islice(unidades, LOTE_GEOMETRIA), indice)
+        if not tramo: return
+        yield from tramo
+
+def _iter_registros(ifc_file, indice, al_avanzar=None):
+    for n, (parte, padre, peso) in enumerate(iter_unidades_con_peso(ifc_file, al_avanzar, indice), 1):
+        reg = registro_parte(parte, padre, indice, peso)
+        if reg: yield reg
+        if n % LOTE_INDICE == 0: indice.liberar()
+
+def _iter_lotes(registros, modelo, lote):
+    constructor = bcs_tabla.ConstructorTabla(modelo)
+    for reg in registros:
+        constructor.agregar(reg)
+        if len(constructor) >= lote:
+            yield constructor.construir(); constructor = bcs_tabla.ConstructorTabla(modelo)
+    if len(constructor): yield constructor.construir()
+
+def iter_partes(ifc_file, lote=None, al_avanzar=None):
+    """
+    Extracción en flujo (streaming): entrega las partes según se visitan Assemblies y sueltos.
+    Sin 'lote' entrega dicts (uno por parte); con lote=N entrega TablaPartes de N filas.
+    Si el modelo no está indexado se usa un índice perezoso que no se guarda en él: la
+    memoria añadida no crece con el modelo salvo por el índice de agregaciones.
+    """
+    indice = getattr(ifc_file, "_indice_bcs", None) or IndiceModelo(ifc_file, perezoso=True)
+    if lote: return _iter_lotes(_iter_registros(ifc_file, indice, al_avanzar), ifc_file, lote)
+    return _iter_registros(ifc_file, indice, al_avanzar)
+
+def extraer_datos_bcs(ifc_file, al_avanzar=None):
+    print("🧠 CORE: Extrayendo datos (Separando TAG vs ASSEMBLY MARK)...")
+    indice = indexar_modelo(ifc_file)
+    datos = bcs_tabla.ConstructorTabla(ifc_file)
+    for parte in _iter_registros(ifc_file, indice, al_avanzar): datos.agregar(parte)
+    print(f"✅ CORE: {len(datos)} partes extraídas con Tag y Assembly Mark.")
+    informe_geometria(indice)
+    tabla = datos.construir(); tabla.firma = firma_extractor()
+    return tabla
+
+# --- EXTRACCIÓN PARALELA (pool de procesos) ---
+_MODELO_TRABAJADOR = None # Modelo del proceso (heredado por fork o abierto desde la ruta)
+
+def _iniciar_trabajador(ruta_ifc):
+    global _MODELO_TRABAJADOR
+    if ruta_ifc: _MODELO_TRABAJADOR = ifcopenshell.open(ruta_ifc)
+    indexar_modelo(_MODELO_TRABAJADOR) # Con fork ya viene en el modelo heredado
+
+def _extraer_fragmento(tarea):
+    """Procesa un fragmento de ids en un proceso. Devuelve los registros en orden."""
+    fase, ids = tarea
+    indice = indexar_modelo(_MODELO_TRABAJADOR)
+    unidades = []
+    for eid in ids:
+        elem = _MODELO_TRABAJADOR.by_id(eid)
+        if fase == "contenedores": unidades.extend((parte, elem) for parte in partes_de_contenedor(elem, indice))
+        elif not es_tornillo_estricto(elem, indice): unidades.append((elem, None))
+    registros = []
+    # Peso por geometría del fragmento en este proceso (un hilo: los procesos ya reparten el trabajo)
+    for parte, padre, peso in _pesar(_MODELO_TRABAJADOR, unidades, indice, hilos=1):
+        reg = registro_parte(parte, padre, indice, peso)
+        if reg: registros.append(reg)
+    return registros
+
+def _fragmentar(ids, n):
+    paso = max(1, -(-len(ids) // n))
+    return [ids[i:i + paso] for i in range(0, len(ids), paso)]
+
+def extraer_datos_paralelo(ifc_file, procesos=None, ruta_ifc=None, al_avanzar=None):
+    """
+    Igual que extraer_datos_bcs pero repartiendo Assemblies y sueltos en fragmentos
+    entre 'procesos' procesos (por defecto, todos los núcleos). Con 'fork' los procesos
+    heredan el modelo ya abierto; si no hay fork (Windows) cada uno abre 'ruta_ifc'.
+    El orden de salida y la regla de "ya procesado" (índice de agregaciones) son los del modo secuencial.
+    """
+    global _MODELO_TRABAJADOR
+    procesos = procesos or os.cpu_count() or 1
+    metodos = multiprocessing.get_all_start_methods()
+    if procesos <= 1 or ("fork" not in metodos and not ruta_ifc):
+        return extraer_datos_bcs(ifc_file, al_avanzar)
+
+    print(f"🧠 CORE: Extrayendo datos en paralelo ({procesos} procesos)...")
+    indice = indexar_modelo(ifc_file) # Con fork el índice se hereda dentro del modelo
+    if "fork" in metodos:
+        ctx = multiprocessing.get_context("fork"); ruta_ifc = None
+        _MODELO_TRABAJADOR = ifc_file
+    else:
+        ctx = multiprocessing.get_context("spawn")
+
+    n_fragmentos = procesos * 4 # Fragmentos pequeños para equilibrar la carga
+    datos = bcs_tabla.ConstructorTabla(ifc_file)
+    try:
+        with ctx.Pool(procesos, initializer=_iniciar_trabajador, initargs=(ruta_ifc,)) as pool:
+            # 1. CONTENEDORES: el orden de los fragmentos mantiene el orden secuencial
+            ids = contenedores_raiz(ifc_file, indice).tolist()
+            tareas = [("contenedores", f) for f in _fragmentar(ids, n_fragmentos)]
+            # 2. SUELTOS: la regla de "ya procesado" sale del índice de agregaciones (sin esperar a la fase 1)
+            ids = sueltos_libres(ifc_file, indice).tolist()
+            tareas += [("sueltos", f) for f in _fragmentar(ids, n_fragmentos)]
+            total = sum(len(f) for _, f in tareas); hechas = 0
+            for (_, fragmento), registros in zip(tareas, pool.imap(_extraer_fragmento, tareas)):
+                for reg in registros: datos.agregar(reg)
+                hechas += len(fragmento)
+                if al_avanzar: al_avanzar(hechas, total)
+    finally:
+        _MODELO_TRABAJADOR = None
 
     print(f"✅ CORE: {len(datos)} partes extraídas con Tag y Assembly Mark.")
-    return datos
+    tabla = datos.construir(); tabla.firma = firma_extractor()
+    return tabla
 
 # --- FUNCIÓN DE COMPATIBILIDAD (PARA ARREGLAR EL ERROR DE APP.PY) ---
-def extraer_datos_modelo(ruta_ifc):
+def extraer_datos_modelo(ruta_ifc=None, procesos=1, usar_cache=None, contenido=None, al_avanzar=None):
     """
     Esta función es un 'puente' para que el app.py encuentre el nombre que busca.
     Usa tu lógica avanzada pero devuelve lo que app.py espera (datos, modelo).
+    Con procesos > 1 (o None = todos los núcleos) la extracción es paralela.
+    Si el mismo IFC ya se extrajo, la tabla se recupera de la caché en disco y el modelo NO se
+    abre (se devuelve None): quien lo necesite (el Injector) lo abre con modelo_de_tabla.
+    Con 'contenido' (bytes del IFC) el modelo se abre en memoria en lugar de desde ruta_ifc.
+    al_avanzar(hechas, total) informa del avance de la extracción (no se llama si sale de la caché).
     """
-    # 1. Cargamos el modelo usando tu función existente
-    modelo = cargar_modelo(ruta_ifc)
+    # 1. Caché por contenido: mismo IFC + misma versión del extractor
+    if usar_cache is None: usar_cache = bcs_cache.USAR_CACHE
+    if not usar_cache: clave = None
+    elif contenido is None: clave = bcs_cache.clave_cache(ruta_ifc, firma_extractor())
+    else: clave = bcs_cache.clave_huella(hashlib.sha256(contenido).hexdigest(), firma_extractor())
+    datos = bcs_cache.leer(clave) if clave else None
+    if datos is not None:
+        print(f"⚡ CORE: {len(datos)} partes recuperadas de la caché.")
+        modelo = None
+    else:
+        # 2. Cargamos el modelo (el Injector escribe sobre él) y extraemos los datos
+        modelo = cargar_modelo(ruta_ifc) if contenido is None else cargar_modelo_bytes(contenido)
+        if procesos == 1: datos = extraer_datos_bcs(modelo, al_avanzar)
+        else: datos = extraer_datos_paralelo(modelo, procesos=procesos, ruta_ifc=ruta_ifc, al_avanzar=al_avanzar)
+        if clave:
+            try: bcs_cache.guardar(clave, datos)
+            except OSError as e: print(f"⚠️ CORE: No se pudo guardar la caché ({e}).")
     
-    # 2. Extraemos los datos usando tu función avanzada existente
-    datos = extraer_datos_bcs(modelo)
+    # 3. Piezas GENERICO: segunda opinión de la IA (la caché guarda siempre el resultado de las reglas)
+    if USAR_IA and BACKEND_IA is not None:
+        modelo = modelo_de_tabla(datos, ruta_ifc, contenido) # La IA lee el nombre de las piezas
+        bcs_ia.reclasificar_genericos(datos, categorias_ia(), BACKEND_IA)
+        datos.firma += "-ia" # Categorías que no salen de las reglas: no vale como 'anterior' de una incremental
     
-    # 3. Devolvemos la tupla (datos, modelo) para satisfacer a app.py
+    # 4. Devolvemos la tupla (datos, modelo) para satisfacer a app.py
     return datos, modelo
\ No newline at end of file
@@ -0,0 +1,149 @@
+# bcs_ia.py
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import bcs_cache
+
+# --- CLASIFICACIÓN POR IA DE LAS PIEZAS "GENERICO" ---
+# Las reglas de bcs_core deciden primero. Solo las piezas que quedan como GENERICO se consultan,
+# deduplicadas por (perfil, nombre) y en lotes de muchos perfiles por petición. Las respuestas se
+# guardan en disco con caducidad. Si el backend falla o tarda, se queda el resultado de las reglas.
+PERFILES_POR_LOTE = 40
+PETICIONES_SIMULTANEAS = 4
+TIMEOUT_LOTE_S = 20.0
+TTL_CACHE_IA_DIAS = float(os.environ.get("BCS_IA_TTL_DIAS", "30"))
+
+class BackendIA:
+    """Interfaz: clasifica un lote de (perfil, nombre) devolviendo una categoría (o None) por pieza."""
+    nombre = "base"
+    async def clasificar_lote(self, piezas, categorias): raise NotImplementedError
+
+class BackendGemini(BackendIA):
+    """Google Gemini (google.generativeai), una petición por lote."""
+    nombre = "gemini"
+    def __init__(self, modelo): self.modelo = modelo
+
+    async def clasificar_lote(self, piezas, categorias):
+        prompt = ("Clasifica cada pieza de estructura metálica en una de estas categorías: "
+                  f"{', '.join(categorias)}. Responde SOLO con una lista JSON de categorías, "
+                  "una por pieza y en el mismo orden.\n"
+                  + json.dumps([{"perfil": p, "nombre": n} for p, n in piezas], ensure_ascii=False))
+        respuesta = await self.modelo.generate_content_async(prompt)
+        texto = respuesta.text
+        lista = json.loads(texto[texto.index("["):texto.rindex("]") + 1])
+        return [str(c).strip().upper() if str(c).strip().upper() in categorias else None for c in lista]
+
+class BackendSimulado(BackendIA):
+    """Backend local determinista (sin red): pistas por palabra clave. Para trabajar offline y en pruebas."""
+    nombre = "simulado"
+    PISTAS = {
+        "PLACA": ("PLATE", "PLACA", "CHAPA", "CARTELA", "RIGIDIZADOR", "STIFFENER", "GUSSET"),
+        "REJILLA": ("GRATING", "REJILLA", "TRAMEX", "PELDA"),
+        "LAMINADO": ("BEAM", "VIGA", "COLUMN", "PILAR", "ANGLE", "CHANNEL", "CORREA", "PURLIN", "PERFIL")
+    }
+    def __init__(self, latencia_s=0.0): self.latencia_s = latencia_s
+
+    async def clasificar_lote(self, piezas, categorias):
+        if self.latencia_s: await asyncio.sleep(self.latencia_s)
+        res = []
+        for perfil, nombre in piezas:
+            texto = f"{perfil} {nombre}".upper()
+            res.append(next((c for c, pistas in self.PISTAS.items()
+                             if c in categorias and any(p in texto for p in pistas)), "GENERICO"))
+        return res
+
+class CacheIA:
+    """Respuestas ya obtenidas en disco: clave -> [categoría, instante]. Caducan a los TTL días."""
+    def __init__(self, ruta=None, ttl_dias=None):
+        self.ruta = ruta or os.path.join(bcs_cache.CARPETA_CACHE, "clasificacion_ia.json")
+        self.ttl = (TTL_CACHE_IA_DIAS if ttl_dias is None else ttl_dias) * 86400
+        self.cambios = False
+        try:
+            with open(self.ruta, encoding="utf-8") as f: self.datos = json.load(f)
+        except (OSError, ValueError): self.datos = {}
+
+    @staticmethod
+    def clave(backend, pieza, categorias):
+        return hashlib.sha256(repr((backend.nombre, pieza, sorted(categorias))).encode()).hexdigest()[:24]
+
+    def obtener(self, clave):
+        e = self.datos.get(clave)
+        if e is None or time.time() - e[1] > self.ttl: return None
+        return e[0]
+
+    def poner(self, clave, categoria):
+        self.datos[clave] = [categoria, time.time()]; self.cambios = True
+
+    def guardar(self):
+        if not self.cambios: return
+        ahora = time.time()
+        self.datos = {k: e for k, e in self.datos.items() if ahora - e[1] <= self.ttl} # Purga de caducadas
+        try:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            temporal = self.ruta + ".tmp"
+            with open(temporal, "w", encoding="utf-8") as f: json.dump(self.datos, f)
+            os.replace(temporal, self.ruta); self.cambios = False
+        except OSError as e: print(f"⚠️ IA: No se pudo guardar la caché ({e}).")
+
+def _ejecutar(corrutina):
+    """asyncio.run, también si ya hay un bucle de eventos activo en este hilo (se usa otro hilo)."""
+    try: asyncio.get_running_loop()
+    except RuntimeError: return asyncio.run(corrutina)
+    with concurrent.futures.ThreadPoolExecutor(1) as ex: return ex.submit(asyncio.run, corrutina).result()
+
+def clasificar_piezas(piezas, categorias, backend, cache=None, lote=None, simultaneas=None, timeout_s=None):
+    """
+    piezas: iterable de (perfil, nombre), se deduplican. Devuelve {(perfil, nombre): categoría}
+    solo con las resueltas (caché o backend); las demás conservan el resultado de las reglas.
+    """
+    lote = lote or PERFILES_POR_LOTE; simultaneas = simultaneas or PETICIONES_SIMULTANEAS
+    timeout_s = TIMEOUT_LOTE_S if timeout_s is None else timeout_s
+    cache = cache if cache is not None else CacheIA()
+    unicas = list(dict.fromkeys(piezas))
+    res = {}; pendientes = []
+    for p in unicas:
+        c = cache.obtener(CacheIA.clave(backend, p, categorias))
+        if c is None: pendientes.append(p)
+        else: res[p] = c
+    lotes = [pendientes[i:i + lote] for i in range(0, len(pendientes), lote)]
+
+    async def consultar_todos():
+        semaforo = asyncio.Semaphore(simultaneas)
+        async def consultar(piezas_lote):
+            async with semaforo:
+                try: return piezas_lote, await asyncio.wait_for(backend.clasificar_lote(piezas_lote, categorias), timeout_s)
+                except Exception as e: return piezas_lote, e # Caído o lento: se quedan las reglas
+        return await asyncio.gather(*(consultar(l) for l in lotes))
+
+    fallidas = 0
+    for piezas_lote, cats in (_ejecutar(consultar_todos()) if lotes else []):
+        if isinstance(cats, Exception) or len(cats) != len(piezas_lote): fallidas += len(piezas_lote); continue
+        for p, c in zip(piezas_lote, cats):
+            if c is None: fallidas += 1; continue
+            res[p] = c; cache.poner(CacheIA.clave(backend, p, categorias), c)
+    cache.guardar()
+    print(f"🤖 IA: {len(unicas)} perfiles distintos ({len(unicas) - len(pendientes)} en caché, "
+          f"{len(lotes)} peticiones, {fallidas} sin respuesta -> reglas).")
+    return res
+
+def reclasificar_genericos(tabla, categorias, backend, **opciones):
+    """Reclasifica en la tabla las partes GENERICO con el backend. Devuelve cuántas filas cambian."""
+    codigo = tabla.categorias["categoria"].buscar("GENERICO")
+    if codigo < 0: return 0
+    filas = np.flatnonzero(tabla.columnas["categoria"] == codigo)
+    if not len(filas): return 0
+    piezas = [(tabla.valor("perfil_maestro", i), (tabla.entidad(i).Name or "") if tabla.modelo is not None else "")
+              for i in filas]
+    res = clasificar_piezas(piezas, categorias, backend, **opciones)
+    por_categoria = {}
+    for i, p in zip(filas, piezas):
+        c = res.get(p)
+        if c and c != "GENERICO": por_categoria.setdefault(c, []).append(i)
+    for c, f in por_categoria.items(): tabla.asignar_categoria("categoria", np.array(f), c)
+    cambiadas = sum(len(f) for f in por_categoria.values())
+    print(f"   -> {cambiadas} de {len(filas)} partes GENERICO reclasificadas.")
+    return cambiadas
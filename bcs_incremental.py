@@ -0,0 +1,67 @@
+# bcs_incremental.py
+import numpy as np
+import bcs_core
+import bcs_tabla
+
+# --- EXTRACCIÓN INCREMENTAL ENTRE REVISIONES (P01, P02, ...) ---
+# Las partes se identifican por GlobalId (los #ids STEP cambian entre exportaciones)
+# y se comparan por la firma de propiedades guardada en la tabla (huella_props).
+# Solo la extracción es incremental: 4D/5D/6D/7D se recalculan sobre la tabla nueva.
+
+def extraer_incremental(tabla_anterior, ifc_nuevo):
+    """
+    Extrae la nueva revisión reutilizando las filas que no han cambiado.
+    Devuelve (tabla_nueva, cambios). Solo se re-extraen las partes nuevas o modificadas.
+    Si la tabla anterior es de otro extractor (firma distinta: versión, reglas, modo lite o
+    geometría) sus filas no valen: se hace la extracción completa y cambios es None.
+    """
+    firma = bcs_core.firma_extractor()
+    if tabla_anterior.firma != firma:
+        print(f"⚠️ INCREMENTAL: La tabla anterior es de otro extractor ({tabla_anterior.firma or 'sin firma'} "
+              f"frente a {firma}): extracción completa.")
+        return bcs_core.extraer_datos_bcs(ifc_nuevo), None
+    print("🔁 INCREMENTAL: Comparando revisión por GlobalId...")
+    indice = bcs_core.indexar_modelo(ifc_nuevo)
+    ant = tabla_anterior.columnas
+    fila_anterior = {gid.decode("ascii"): k for k, gid in enumerate(ant["global_id"])}
+
+    nueva = bcs_tabla.ConstructorTabla(ifc_nuevo)
+    vistos = set(); añadidos = []; modificados = []; sin_cambios = 0
+    for parte, padre, peso in bcs_core.iter_unidades_con_peso(ifc_nuevo, indice=indice):
+        gid = parte.GlobalId; k = fila_anterior.get(gid)
+        huella = bcs_core.huella_propiedades(parte, padre, indice, peso)
+        repetida = k is not None and k in vistos # Misma pieza bajo otro Assembly
+        if k is not None and not repetida and int(ant["huella_props"][k]) == huella:
+            # Sin cambios: copiamos la fila anterior con los ids del nuevo archivo
+            reg = {c: tabla_anterior.valor(c, k) for c in bcs_tabla.COLUMNAS_NUMERICAS + bcs_tabla.COLUMNAS_CATEGORICAS}
+            reg.update({"id": parte.id(), "id_padre": padre.id() if padre else -1, "global_id": gid, "huella_props": huella})
+            vistos.add(k); sin_cambios += 1
+        else:
+            reg = bcs_core.registro_parte(parte, padre, indice, peso)
+            if reg is None: continue
+            if repetida: pass
+            elif k is not None: vistos.add(k); modificados.append(gid)
+            else: añadidos.append(gid)
+        nueva.agregar(reg)
+    tabla_nueva = nueva.construir(); tabla_nueva.firma = firma
+
+    eliminados = [gid for gid, k in fila_anterior.items() if k not in vistos]
+    tocados = set(añadidos) | set(modificados)
+    gids_nuevos = [g.decode("ascii") for g in tabla_nueva.columnas["global_id"]]
+    cambios = {
+        "añadidos": añadidos, "modificados": modificados, "eliminados": eliminados, "sin_cambios": sin_cambios,
+        # Filas cambiadas: las que salen de la revisión anterior y las que entran en la nueva
+        "filas_salida": np.array([fila_anterior[g] for g in modificados + eliminados], dtype=np.int64),
+        "filas_entrada": np.array([k for k, g in enumerate(gids_nuevos) if g in tocados], dtype=np.int64),
+    }
+    # Conjuntos cuyo cronograma 4D depende de alguna parte cambiada
+    cambios["conjuntos_afectados"] = sorted(
+        {tabla_anterior.valor("assembly_mark", k) for k in cambios["filas_salida"]} |
+        {tabla_nueva.valor("assembly_mark", k) for k in cambios["filas_entrada"]})
+    imprimir_resumen(cambios)
+    return tabla_nueva, cambios
+
+def imprimir_resumen(cambios):
+    print(f"   -> Añadidas: {len(cambios['añadidos'])} | Modificadas: {len(cambios['modificados'])} | "
+          f"Eliminadas: {len(cambios['eliminados'])} | Sin cambios: {cambios['sin_cambios']}")
+    print(f"   -> Conjuntos afectados (4D): {len(cambios['conjuntos_afectados'])}")
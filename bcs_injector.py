@@ -1,7 +1,8 @@
 # bcs_injector.py
 import ifcopenshell
-import ifcopenshell.api
 import datetime
+import os
+import zipfile
 
 # --- MAPEO UNICLASS 2015 (Estándar ISO 19650) ---
 MAPEO_UNICLASS = {
@@ -12,12 +13,49 @@ MAPEO_UNICLASS = {
     "GENERICO":    "Pr_20_29_87"     
 }
 
+# Grupos de Psets que se pueden inyectar por separado (cada uno depende de parámetros distintos)
+GRUPOS_PSETS = ("gestion", "tecnico", "4d", "5d", "6d")
+
+NIVEL_ZIP = 6 # Compresión DEFLATE del .ifczip (el texto STEP se reduce 5-10x)
+
+def escribir_ifc(ifc_file, ruta):
+    """Guarda el modelo. Con extensión .ifczip lo guarda comprimido (ZIP con un único .ifc dentro)."""
+    if not ruta.lower().endswith(".ifczip"):
+        ifc_file.write(ruta); return
+    nombre = os.path.splitext(os.path.basename(ruta))[0] + ".ifc"
+    plano = ruta + ".ifc.tmp"; temporal = ruta + ".tmp"
+    try:
+        # ifcopenshell escribe el STEP a disco sin copiarlo en memoria; z.write lo comprime por bloques
+        ifc_file.write(plano, format=".ifc")
+        with zipfile.ZipFile(temporal, "w", zipfile.ZIP_DEFLATED, compresslevel=NIVEL_ZIP) as z: z.write(plano, nombre)
+        os.replace(temporal, ruta) # Se publica de forma atómica
+    finally:
+        for sobrante in (plano, temporal):
+            if os.path.exists(sobrante): os.remove(sobrante)
+
+def buscar_pset(element, nombre_pset):
+    """Pset del elemento con ese nombre (None si no lo tiene). En IFC4 una relación puede
+    apuntar a un IfcPropertySetDefinitionSet (tupla de definiciones): se mira cada una."""
+    for rel in getattr(element, "IsDefinedBy", None) or ():
+        if not rel.is_a("IfcRelDefinesByProperties"): continue
+        definiciones = rel.RelatingPropertyDefinition
+        if not isinstance(definiciones, tuple): definiciones = (definiciones,)
+        for pset in definiciones:
+            if pset.is_a("IfcPropertySet") and pset.Name == nombre_pset: return pset
+    return None
+
 # CAMBIO CLAVE: Añadidos argumentos con valores por defecto para que no falle
-def generar_ifc_enriquecido(ifc_file, ruta_salida, datos, iso_status="S2", iso_suitability="Para Información"):
-    print(f"💉 INJECTOR: Generando IFC final '{ruta_salida}'...")
+def generar_ifc_enriquecido(ifc_file, ruta_salida, datos, iso_status="S2", iso_suitability="Para Información", grupos=None):
+    """
+    Inyecta los Psets BCS en el modelo y lo guarda en 'ruta_salida' (None = no escribir; .ifczip = comprimido).
+    'grupos' limita qué Psets se escriben. Repetir sobre el mismo modelo edita los Psets existentes.
+    """
+    grupos = set(GRUPOS_PSETS if grupos is None else grupos)
+    print(f"💉 INJECTOR: {'Generando IFC final ' + repr(ruta_salida) if ruta_salida else 'Inyectando Psets'} ({', '.join(g for g in GRUPOS_PSETS if g in grupos)})...")
     print(f"   -> Configuración ISO: Status={iso_status} | Uso={iso_suitability}")
+    import ifcopenshell.api # Solo hace falta al escribir
     
-    count = 0
+    count = 0; fallidos = 0
     fecha_hoy = datetime.date.today().strftime("%Y-%m-%d")
     
     # Nombres de Psets
@@ -28,7 +66,7 @@ def generar_ifc_enriquecido(ifc_file, ruta_salida, datos, iso_status="S2", iso_s
     PSET_4D      = "BCS_4D_PLANIFICACION"
     
     for item in datos:
-        element = item["objeto_ifc"]
+        element = ifc_file.by_id(item["id"])
         cat = item.get("categoria", "GENERICO")
         
         # --- 1. PREPARACIÓN DE DATOS ---
@@ -75,30 +113,24 @@ def generar_ifc_enriquecido(ifc_file, ruta_salida, datos, iso_status="S2", iso_s
 
         # --- 2. INYECCIÓN ---
         def inyectar_pset(nombre_pset, propiedades):
+            nonlocal fallidos
             if not propiedades: return
+            # Si ya existe (segunda pasada sobre el mismo modelo) se edita; si no, se crea
+            pset = buscar_pset(element, nombre_pset)
             try:
-                # Intentar crear nuevo
-                pset = ifcopenshell.api.run("pset.add_pset", ifc_file, product=element, name=nombre_pset)
+                if pset is None: pset = ifcopenshell.api.run("pset.add_pset", ifc_file, product=element, name=nombre_pset)
                 ifcopenshell.api.run("pset.edit_pset", ifc_file, pset=pset, properties=propiedades)
-            except:
-                # Si falla (ya existe), buscar y editar
-                try: 
-                    for rel in element.IsDefinedBy:
-                        if rel.is_a("IfcRelDefinesByProperties"):
-                            defi = rel.RelatingPropertyDefinition
-                            if defi.Name == nombre_pset:
-                                ifcopenshell.api.run("pset.edit_pset", ifc_file, pset=defi, properties=propiedades)
-                                break
-                except: pass
+            except RuntimeError: fallidos += 1 # ifcopenshell rechaza el atributo (p.ej. elemento sin Psets posibles)
 
         # Inyectamos todo en orden
-        inyectar_pset(PSET_GESTION, props_gestion)
-        inyectar_pset(PSET_TECNICO, props_tecnicas)
-        inyectar_pset(PSET_4D, props_4d)      # <--- AQUÍ ENTRA EL 4D
-        inyectar_pset(PSET_COSTES, props_costes)
-        inyectar_pset(PSET_HUELLA, props_huella)
+        if "gestion" in grupos: inyectar_pset(PSET_GESTION, props_gestion)
+        if "tecnico" in grupos: inyectar_pset(PSET_TECNICO, props_tecnicas)
+        if "4d" in grupos: inyectar_pset(PSET_4D, props_4d)      # <--- AQUÍ ENTRA EL 4D
+        if "5d" in grupos: inyectar_pset(PSET_COSTES, props_costes)
+        if "6d" in grupos: inyectar_pset(PSET_HUELLA, props_huella)
         
         count += 1
 
-    ifc_file.write(ruta_salida)
-    print(f"✅ INJECTOR: Archivo guardado correctamente ({count} elementos procesados).")
\ No newline at end of file
+    if fallidos: print(f"⚠️ INJECTOR: {fallidos} Psets no se pudieron escribir.")
+    if ruta_salida: escribir_ifc(ifc_file, ruta_salida)
+    print(f"✅ INJECTOR: {'Archivo guardado correctamente' if ruta_salida else 'Psets inyectados'} ({count} elementos procesados).")
\ No newline at end of file
@@ -0,0 +1,188 @@
+# bcs_lite.py
+import mmap
+import re
+import bcs_core
+
+# --- MODO LITE: pre-escáner STEP para presupuestos rápidos (solo cantidades) ---
+# Lee el IFC con mmap e indexa únicamente las entidades que usa extraer_datos_bcs,
+# sin construir el grafo de objetos de ifcopenshell. No hay geometría: si un elemento
+# no tiene cota en sus Psets su altura queda a 0. No se leen Psets de tipo.
+# La unidad de longitud se toma de la primera IfcSIUnit de longitud del archivo.
+
+# Tipo STEP -> tipo IFC que devuelve by_type (las variantes StandardCase cuentan como su padre)
+TIPOS_ELEMENTO = {t.upper(): t for t in bcs_core.TIPOS_CONTENEDOR + bcs_core.TIPOS_SUELTOS}
+for _t in ("IfcBeam", "IfcColumn", "IfcPlate", "IfcMember"):
+    TIPOS_ELEMENTO[(_t + "StandardCase").upper()] = _t
+TIPOS_RELACION = ("IFCRELAGGREGATES", "IFCRELDEFINESBYPROPERTIES")
+TIPOS_DEFINICION = ("IFCPROPERTYSET", "IFCELEMENTQUANTITY")
+TIPOS_UNIDAD = ("IFCSIUNIT",)
+PREFIJOS_SI = {None: 1.0, "KILO": 1e3, "DECI": 1e-1, "CENTI": 1e-2, "MILLI": 1e-3}
+TIPOS_VALOR = ("IFCPROPERTYSINGLEVALUE", "IFCQUANTITYLENGTH", "IFCQUANTITYAREA", "IFCQUANTITYVOLUME",
+               "IFCQUANTITYWEIGHT", "IFCQUANTITYCOUNT", "IFCQUANTITYTIME")
+
+_TIPOS = list(TIPOS_ELEMENTO) + list(TIPOS_RELACION) + list(TIPOS_DEFINICION) + list(TIPOS_VALOR) + list(TIPOS_UNIDAD)
+_ENTIDAD = re.compile(rb"(?m)^[ \t]*#(\d+)[ \t]*=[ \t]*(" + b"|".join(t.encode() for t in _TIPOS) + rb")[ \t]*\(")
+_NUMERO = re.compile(rb"[-+0-9.Ee]+")
+_NOMBRE = re.compile(rb"[A-Z0-9_]+")
+_X2 = re.compile(r"\\X2\\((?:[0-9A-F]{4})+)\\X0\\")
+_X = re.compile(r"\\X\\([0-9A-F]{2})")
+
+class Ref(int):
+    """Referencia STEP (#123)."""
+
+def _decodificar(texto):
+    """Decodifica las secuencias de escape de cadenas STEP (\\X2\\ y \\X\\)."""
+    if "\\" not in texto: return texto
+    texto = _X2.sub(lambda m: "".join(chr(int(m.group(1)[i:i + 4], 16)) for i in range(0, len(m.group(1)), 4)), texto)
+    texto = _X.sub(lambda m: chr(int(m.group(1), 16)), texto)
+    return texto.replace("\\\\", "\\")
+
+def _saltar_blancos(buf, i):
+    while buf[i] in b" \t\r\n": i += 1
+    return i
+
+def _leer_valor(buf, i):
+    """Lee un valor STEP desde la posición i. Devuelve (valor, posición siguiente)."""
+    i = _saltar_blancos(buf, i)
+    c = buf[i]
+    if c == 0x27: # ' cadena ('' = comilla escapada)
+        j = i + 1
+        while True:
+            k = buf.find(b"'", j)
+            if buf[k + 1] == 0x27: j = k + 2; continue
+            return _decodificar(buf[i + 1:k].replace(b"''", b"'").decode("latin-1")), k + 1
+    if c == 0x23: # #ref
+        m = _NUMERO.match(buf, i + 1)
+        return Ref(int(m.group())), m.end()
+    if c == 0x28: # (lista)
+        valores = []; i += 1
+        while True:
+            i = _saltar_blancos(buf, i)
+            if buf[i] == 0x29: return valores, i + 1
+            v, i = _leer_valor(buf, i); valores.append(v)
+            i = _saltar_blancos(buf, i)
+            if buf[i] == 0x2C: i += 1
+    if c in (0x24, 0x2A): return None, i + 1 # $ y *
+    if c == 0x2E: # .ENUM.
+        k = buf.find(b".", i + 1); enum = buf[i + 1:k].decode()
+        return {"T": True, "F": False}.get(enum, enum), k + 1
+    m = _NOMBRE.match(buf, i)
+    if m and buf[m.start()] in b"ABCDEFGHIJKLMNOPQRSTUVWXYZ": # IFCLABEL('x') -> 'x'
+        interior, j = _leer_valor(buf, m.end())
+        return (interior[0] if interior else None), j
+    m = _NUMERO.match(buf, i)
+    txt = m.group()
+    try: return (float(txt) if b"." in txt or b"E" in txt.upper() else int(txt)), m.end()
+    except ValueError: return txt.decode(), m.end()
+
+class RelacionLite:
+    def __init__(self, relacionante, relacionados): self.RelatingObject = relacionante; self.RelatedObjects = relacionados
+
+class EntidadLite:
+    """Elemento mínimo con la interfaz que usan las funciones de bcs_core."""
+    __slots__ = ("_id", "_tipo", "GlobalId", "Name", "Description", "ObjectType", "ObjectPlacement", "IsDecomposedBy")
+    def __init__(self, eid, tipo, args):
+        self._id = eid; self._tipo = tipo
+        self.GlobalId, _, self.Name, self.Description, self.ObjectType = (list(args) + [None] * 5)[:5]
+        self.ObjectPlacement = None; self.IsDecomposedBy = []
+    def id(self): return self._id
+    def is_a(self, tipo=None):
+        if tipo is None: return self._tipo
+        return tipo.upper() == self._tipo.upper()
+
+class ModeloLite:
+    """Resultado del pre-escaneo: elementos por tipo (en orden de archivo), índice de propiedades y unidad."""
+    def __init__(self, ruta):
+        self.ruta = ruta; self.tipos = {}; self.entidades = {}; self.indice = {}
+        self.escala_m = None # Unidad de longitud (IfcSIUnit) en metros
+    def by_type(self, tipo): return list(self.tipos.get(tipo, []))
+    def by_id(self, eid): return self.entidades[eid]
+
+def escanear(ruta_ifc):
+    """Pre-escanea el IFC (mmap + regex) y construye un ModeloLite."""
+    print(f"⚡ LITE: Pre-escaneando {ruta_ifc}...")
+    modelo = ModeloLite(ruta_ifc)
+    valores = {}; definiciones = {}; agregaciones = []; asignaciones = []
+    with open(ruta_ifc, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        for m in _ENTIDAD.finditer(buf):
+            eid = int(m.group(1)); tipo = m.group(2).decode()
+            args, _ = _leer_valor(buf, m.end() - 1)
+            if tipo in TIPOS_ELEMENTO:
+                ent = EntidadLite(eid, TIPOS_ELEMENTO[tipo], args)
+                modelo.entidades[eid] = ent
+                modelo.tipos.setdefault(TIPOS_ELEMENTO[tipo], []).append(ent)
+            elif tipo == "IFCRELAGGREGATES": agregaciones.append((args[4], args[5]))
+            elif tipo == "IFCRELDEFINESBYPROPERTIES": asignaciones.append((args[4], args[5]))
+            elif tipo == "IFCPROPERTYSET": definiciones[eid] = args[4] or []
+            elif tipo == "IFCELEMENTQUANTITY": definiciones[eid] = args[5] or []
+            elif tipo == "IFCPROPERTYSINGLEVALUE": valores[eid] = (args[0], args[2])
+            elif tipo == "IFCSIUNIT":
+                if args[1] == "LENGTHUNIT" and args[3] == "METRE" and modelo.escala_m is None:
+                    modelo.escala_m = PREFIJOS_SI.get(args[2], 1.0)
+            else: valores[eid] = (args[0], args[3]) # IfcQuantity*: Name, ..., Value
+
+    # Descomposición (IfcRelAggregates / IsDecomposedBy) solo entre elementos indexados
+    for padre, hijos in agregaciones:
+        if padre in modelo.entidades:
+            rel = RelacionLite(modelo.entidades[padre], [modelo.entidades[h] for h in hijos if h in modelo.entidades])
+            modelo.entidades[padre].IsDecomposedBy.append(rel)
+            modelo.tipos.setdefault("IfcRelAggregates", []).append(rel)
+
+    # Índice plano de propiedades, mismas reglas que bcs_core.indexar_propiedades
+    planas = {}; propias = set()
+    for relacionados, defi in asignaciones:
+        for d in (defi if isinstance(defi, list) else [defi]):
+            if d not in planas:
+                tabla = {}
+                for p in definiciones.get(d, []):
+                    if p in valores and valores[p][0]: tabla.setdefault(valores[p][0].lower(), valores[p][1])
+                planas[d] = tabla
+            for obj in relacionados:
+                # La primera definición que aporta una clave es la que manda
+                actual = modelo.indice.get(obj)
+                if actual is None: modelo.indice[obj] = planas[d]; continue
+                if obj not in propias: actual = dict(actual); modelo.indice[obj] = actual; propias.add(obj)
+                for k, v in planas[d].items(): actual.setdefault(k, v)
+    n = len(modelo.entidades)
+    if modelo.escala_m is None: modelo.escala_m = 0.001 # Mismo criterio que bcs_core.leer_unidades
+    print(f"   -> {n} elementos, {len(planas)} Psets, {len(modelo.indice)} elementos con propiedades.")
+    return modelo
+
+def extraer_datos_lite(ruta_ifc):
+    """Misma tabla de partes que extraer_datos_modelo, sin abrir el IFC con ifcopenshell."""
+    modelo = escanear(ruta_ifc)
+    bcs_core.registrar_indice(modelo, modelo.indice)
+    datos = bcs_core.extraer_datos_bcs(modelo)
+    datos.firma = "lite-" + datos.firma # Sin Psets de tipo ni geometría: no vale como 'anterior' de una completa
+    return datos, modelo
+
+def comparar_con_completo(rutas_ifc, tolerancia_z=1.0):
+    """
+    Divergencia del modo lite frente a la extracción completa sobre un conjunto de validación.
+    Devuelve una fila por archivo con partes, diferencia de peso y % de discrepancias por columna.
+    """
+    informe = []
+    for ruta in rutas_ifc:
+        completo = bcs_core.extraer_datos_bcs(bcs_core.cargar_modelo(ruta))
+        lite, _ = extraer_datos_lite(ruta)
+        fila_c = {int(i): k for k, i in enumerate(completo.columnas["id"])}
+        fila_l = {int(i): k for k, i in enumerate(lite.columnas["id"])}
+        comunes = [i for i in fila_c if i in fila_l]
+        peso_c = float(completo.columnas["peso_kg"].sum()); peso_l = float(lite.columnas["peso_kg"].sum())
+        res = {
+            "archivo": ruta, "partes_completo": len(completo), "partes_lite": len(lite),
+            "solo_completo": len(fila_c) - len(comunes), "solo_lite": len(fila_l) - len(comunes),
+            "dif_peso_pct": 100.0 * (peso_l - peso_c) / peso_c if peso_c else 0.0
+        }
+        for col in ("categoria", "perfil_maestro", "referencia", "assembly_mark", "peso_kg", "altura_z", "desnivel_mm"):
+            distintos = 0
+            for i in comunes:
+                a = completo.valor(col, fila_c[i]); b = lite.valor(col, fila_l[i])
+                if col in ("altura_z", "desnivel_mm"): distintos += abs(a - b) > tolerancia_z
+                elif col == "peso_kg": distintos += abs(a - b) > 1e-6 * max(1.0, abs(a))
+                else: distintos += a != b
+            res[f"dif_{col}_pct"] = 100.0 * distintos / len(comunes) if comunes else 0.0
+        informe.append(res)
+        print(f"🔎 LITE: {ruta}: {res['partes_lite']}/{res['partes_completo']} partes, "
+              f"peso {res['dif_peso_pct']:+.2f}%, Z distinta en {res['dif_altura_z_pct']:.1f}%")
+    return informe
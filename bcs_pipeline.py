@@ -0,0 +1,236 @@
+# bcs_pipeline.py
+import concurrent.futures
+import functools
+import multiprocessing
+import os
+import shutil
+import time
+import zipfile
+
+# --- EJECUTOR DE ETAPAS (DAG) ---
+# Cada etapa declara de qué resultados depende y arranca en cuanto están listos.
+# Los cálculos que escriben columnas en la tabla se hacen en el proceso principal;
+# los PDF (que solo leen resúmenes) van a un pool de procesos y se solapan entre sí
+# y con el Injector. Con una caché (p.ej. la de la sesión web) las etapas cuya clave
+# no ha cambiado no se repiten. Las claves no incluyen rutas: si la salida en caché está
+# en otra carpeta (otro trabajo de la misma sesión), se enlaza o copia a la nueva.
+PROCESOS_RENDER = min(4, os.cpu_count() or 1)
+
+class Etapa:
+    """
+    Paso del DAG: funcion(*resultados de 'entradas'). Con en_proceso=True se ejecuta en el pool.
+    'clave': parámetros propios que lee la etapa (None = no se cachea); la clave efectiva
+    añade la de sus entradas. 'salida': archivo que genera (si falta, se repite aunque esté en caché;
+    si está en caché con otra ruta, se lleva a la nueva).
+    """
+    __slots__ = ("nombre", "funcion", "entradas", "en_proceso", "clave", "salida")
+    def __init__(self, nombre, funcion, entradas=(), en_proceso=False, clave=None, salida=None):
+        self.nombre = nombre; self.funcion = funcion; self.entradas = tuple(entradas); self.en_proceso = en_proceso
+        self.clave = clave; self.salida = salida
+
+def _cronometrar(funcion, args):
+    t0 = time.perf_counter(); res = funcion(*args)
+    return res, time.perf_counter() - t0
+
+def _contexto_pool():
+    """forkserver si existe (procesos limpios y baratos, también bajo Streamlit); si no, spawn."""
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in metodos else "spawn")
+
+def _llevar_salida(origen, destino):
+    """Pone en 'destino' un archivo ya generado: enlace duro si se puede (mismo disco); si no, copia."""
+    if os.path.abspath(origen) == os.path.abspath(destino): return
+    os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+    if os.path.lexists(destino): os.remove(destino)
+    try: os.link(origen, destino)
+    except OSError: shutil.copyfile(origen, destino)
+
+def claves_efectivas(etapas, claves):
+    """Clave de cada etapa = (su clave, claves de sus entradas). None si algo no es cacheable."""
+    efectivas = dict(claves); pendientes = list(etapas)
+    while pendientes:
+        listas = [e for e in pendientes if all(d in efectivas or d not in {x.nombre for x in pendientes} for d in e.entradas)]
+        if not listas: break # Ciclo: lo detecta ejecutar()
+        for e in listas:
+            previas = tuple(efectivas.get(d) for d in e.entradas)
+            efectivas[e.nombre] = None if e.clave is None or None in previas else (e.clave, previas)
+            pendientes.remove(e)
+    return efectivas
+
+def ejecutar(etapas, valores, procesos=None, al_terminar=None, cache=None, claves=None):
+    """
+    Ejecuta las etapas respetando sus dependencias. 'valores' trae las entradas iniciales
+    (p.ej. {"datos": tabla}). Devuelve (valores con todos los resultados, segundos por etapa).
+    al_terminar(nombre, hechas, total) se llama al acabar cada etapa (barras de progreso).
+    cache: dict nombre -> (clave efectiva, resultado, salida) que se reutiliza entre llamadas;
+    claves: clave de cada entrada inicial (p.ej. el hash del IFC).
+    """
+    valores = dict(valores); tiempos = {}; pendientes = list(etapas); total = len(pendientes)
+    efectivas = claves_efectivas(etapas, claves or {}) if cache is not None else {}
+    procesos = PROCESOS_RENDER if procesos is None else procesos
+    pool = None; en_vuelo = {}
+
+    def terminar(etapa, res, segundos):
+        valores[etapa.nombre] = res; tiempos[etapa.nombre] = segundos
+        if efectivas.get(etapa.nombre) is not None: cache[etapa.nombre] = (efectivas[etapa.nombre], res, etapa.salida)
+        if al_terminar: al_terminar(etapa.nombre, len(tiempos), total)
+
+    def en_cache(etapa):
+        clave = efectivas.get(etapa.nombre)
+        if clave is None or etapa.nombre not in cache or cache[etapa.nombre][0] != clave: return False
+        salida = cache[etapa.nombre][2]
+        return etapa.salida is None or (salida is not None and os.path.exists(salida))
+
+    def preparar(etapa):
+        # Se escribe siempre un archivo nuevo: la ruta puede ser un enlace a la salida de otro trabajo
+        if etapa.salida and os.path.lexists(etapa.salida): os.remove(etapa.salida)
+
+    try:
+        while pendientes or en_vuelo:
+            listas = [e for e in pendientes if all(d in valores for d in e.entradas)]
+            # 0. Lo que no ha cambiado se toma de la caché
+            reutilizadas = [e for e in listas if en_cache(e)]
+            for e in reutilizadas:
+                pendientes.remove(e)
+                if e.salida: _llevar_salida(cache[e.nombre][2], e.salida)
+                terminar(e, cache[e.nombre][1], 0.0)
+            if reutilizadas: continue
+            if pool is None and procesos > 1 and any(e.en_proceso for e in listas): # Solo si hay algo que mandar
+                pool = concurrent.futures.ProcessPoolExecutor(procesos, mp_context=_contexto_pool())
+            # 1. Al pool todo lo que ya se puede lanzar
+            for e in listas:
+                if e.en_proceso and pool:
+                    pendientes.remove(e); preparar(e)
+                    en_vuelo[pool.submit(_cronometrar, e.funcion, [valores[d] for d in e.entradas])] = e
+            # 2. Una etapa local (y se vuelve a mirar qué ha quedado libre)
+            locales = [e for e in listas if not (e.en_proceso and pool)]
+            if locales:
+                e = locales[0]; pendientes.remove(e); preparar(e)
+                terminar(e, *_cronometrar(e.funcion, [valores[d] for d in e.entradas])); continue
+            if not en_vuelo:
+                faltan = sorted({d for e in pendientes for d in e.entradas if d not in valores})
+                raise ValueError(f"Etapas bloqueadas: {[e.nombre for e in pendientes]} (faltan {faltan}).")
+            # 3. Esperar a que termine algo del pool
+            hechos, _ = concurrent.futures.wait(en_vuelo, return_when=concurrent.futures.FIRST_COMPLETED)
+            for f in hechos: terminar(en_vuelo.pop(f), *f.result())
+    finally:
+        if pool: pool.shutdown(wait=True, cancel_futures=True)
+    return valores, tiempos
+
+# --- ENTREGABLES DE LA SUITE (mismo flujo que app_web) ---
+def _inyectar(ifc_file, datos, *_columnas_listas, grupos, iso_status="S2", iso_suitability="Para Información"):
+    import bcs_injector
+    bcs_injector.generar_ifc_enriquecido(ifc_file=ifc_file, ruta_salida=None, datos=datos, iso_status=iso_status,
+                                         iso_suitability=iso_suitability, grupos=grupos)
+
+def _escribir_ifc(ifc_file, *_psets_listos, ruta_salida):
+    import bcs_injector
+    bcs_injector.escribir_ifc(ifc_file, ruta_salida)
+    print(f"✅ INJECTOR: Archivo guardado correctamente '{ruta_salida}'.")
+
+def _modelo(datos, ifc_obj=None, ruta_ifc=None, contenido=None):
+    """Modelo para el Injector: el ya abierto o, si la tabla salió de la caché, el IFC de 'ruta_ifc' (o de 'contenido')."""
+    if ifc_obj is not None: return ifc_obj
+    if not ruta_ifc and contenido is None: raise ValueError("Sin modelo IFC ni ruta para abrirlo: no se puede generar el IFC enriquecido.")
+    import bcs_core
+    return bcs_core.modelo_de_tabla(datos, ruta_ifc, contenido)
+
+def etapas_entregables(rutas, fecha_inicio, rendimiento_kg, iso_status="S2", iso_suitability="Para Información",
+                       region=None, tarifa=None):
+    """
+    DAG de 4D/5D/6D/7D + IFC enriquecido. Entradas: "datos" (TablaPartes) y "modelo" (en
+    generar_entregables, una etapa que solo abre el IFC cuando lo pide el Injector).
+    El 7D viaja completo al pool (la tabla se serializa sin el modelo IFC).
+    Las claves declaran qué parámetros lee cada etapa: cambiar la fecha, el rendimiento o el
+    calendario (región o archivo de festivos) solo repite el 4D (cálculo, PDF y Pset);
+    cambiar el estado ISO solo repite su Pset; cambiar el catálogo de precios, el 5D.
+    Las rutas no forman parte de las claves: un trabajo nuevo reutiliza los archivos del anterior.
+    Sin "ifc_final" en 'rutas' (modo lite) solo se generan los PDF.
+    """
+    import bcs_4d, bcs_5d, bcs_6d, bcs_7d, bcs_calendario
+    etapas = [
+        Etapa("5d_calculo", functools.partial(bcs_5d.resumen_costes, tarifa=tarifa), ("datos",),
+              clave=(tarifa.firma if tarifa else None,)),
+        Etapa("6d_calculo", bcs_6d.resumen_huella, ("datos",), clave=()),
+        Etapa("4d_calculo", functools.partial(bcs_4d.calcular_fechas_para_ifc, fecha_inicio_obra=fecha_inicio,
+                                              rendimiento_kg_dia=rendimiento_kg, region=region), ("datos",),
+              clave=(fecha_inicio, rendimiento_kg, region, bcs_calendario.version_festivos())),
+        Etapa("7d", functools.partial(bcs_7d.generar_informe_7d, nombre_pdf=rutas["pdf_7d"]), ("datos",), en_proceso=True,
+              clave=(), salida=rutas["pdf_7d"]),
+        Etapa("5d_pdf", functools.partial(bcs_5d.renderizar_informe_costes, nombre_pdf=rutas["pdf_5d"]),
+              ("5d_calculo",), en_proceso=True, clave=(), salida=rutas["pdf_5d"]),
+        Etapa("6d_pdf", functools.partial(bcs_6d.renderizar_informe_sostenibilidad, nombre_pdf=rutas["pdf_6d"]),
+              ("6d_calculo",), en_proceso=True, clave=(), salida=rutas["pdf_6d"]),
+        Etapa("4d_pdf", functools.partial(bcs_4d.renderizar_informe_4d, rendimiento_kg=rendimiento_kg,
+                                          nombre_pdf=rutas["pdf_4d"]), ("4d_calculo",), en_proceso=True,
+              clave=(rendimiento_kg,), salida=rutas["pdf_4d"])
+    ]
+    if "ifc_final" not in rutas: return etapas
+    return etapas + [
+        # El Injector solo necesita las columnas bcs_* (no espera a los PDF), por grupos de Psets
+        Etapa("ifc_base", functools.partial(_inyectar, grupos=("tecnico", "5d", "6d")),
+              ("modelo", "datos", "5d_calculo", "6d_calculo"), clave=()),
+        Etapa("ifc_iso", functools.partial(_inyectar, grupos=("gestion",), iso_status=iso_status,
+                                           iso_suitability=iso_suitability),
+              ("modelo", "datos"), clave=(iso_status, iso_suitability)),
+        Etapa("ifc_4d", functools.partial(_inyectar, grupos=("4d",)), ("modelo", "datos", "4d_calculo"), clave=()),
+        Etapa("ifc", functools.partial(_escribir_ifc, ruta_salida=rutas["ifc_final"]),
+              ("modelo", "ifc_base", "ifc_iso", "ifc_4d"), clave=(os.path.splitext(rutas["ifc_final"])[1],), salida=rutas["ifc_final"])
+    ]
+
+class PaqueteZip:
+    """
+    ZIP con todos los entregables, escrito según terminan las etapas: cada archivo se copia
+    por bloques (nunca entero en memoria) y el ZIP solo aparece con su nombre final al cerrarlo.
+    """
+    YA_COMPRIMIDOS = (".ifczip", ".zip", ".png", ".jpg") # Se guardan sin recomprimir
+
+    def __init__(self, ruta):
+        self.ruta = ruta; self._temporal = ruta + ".tmp"; self.nombres = []
+        self.zip = zipfile.ZipFile(self._temporal, "w", zipfile.ZIP_DEFLATED)
+
+    def agregar(self, ruta):
+        nombre = os.path.basename(ruta)
+        if nombre in self.nombres or not os.path.exists(ruta): return
+        tipo = zipfile.ZIP_STORED if nombre.lower().endswith(self.YA_COMPRIMIDOS) else zipfile.ZIP_DEFLATED
+        self.zip.write(ruta, nombre, compress_type=tipo); self.nombres.append(nombre)
+
+    def cerrar(self):
+        self.zip.close(); os.replace(self._temporal, self.ruta)
+        print(f"🗜️ PAQUETE: {len(self.nombres)} entregables en '{self.ruta}'.")
+
+    def descartar(self):
+        self.zip.close()
+        if os.path.exists(self._temporal): os.remove(self._temporal)
+
+def generar_entregables(datos, ifc_obj, rutas, fecha_inicio, rendimiento_kg, iso_status="S2",
+                        iso_suitability="Para Información", procesos=None, al_terminar=None, cache=None, huella=None,
+                        ruta_zip=None, region=None, tarifa=None, ruta_ifc=None, contenido=None):
+    """
+    Genera los cuatro PDF y el IFC enriquecido. Devuelve los segundos por etapa.
+    Con 'cache' (dict de la sesión) y 'huella' (hash del IFC) solo se repite lo que ha cambiado.
+    Con 'ruta_zip' además empaqueta cada entregable en ese ZIP en cuanto está listo.
+    'region': calendario de festivos del 4D (por defecto bcs_calendario.REGION_DEFECTO).
+    'tarifa': precios 5D de bcs_catalogo (por defecto la del catálogo de BCS_CATALOGO, si existe).
+    Con ifc_obj=None (tabla de la caché) el modelo se abre desde 'ruta_ifc' (o los bytes 'contenido') solo para el Injector.
+    """
+    import bcs_agregacion, bcs_catalogo
+    if tarifa is None: tarifa = bcs_catalogo.tarifa()
+    bcs_agregacion.agregacion(datos) # Un solo sort-and-reduce para 4D/5D/6D/7D (viaja con la tabla al pool)
+    etapas = etapas_entregables(rutas, fecha_inicio, rendimiento_kg, iso_status, iso_suitability, region, tarifa)
+    if "ifc_final" in rutas:
+        etapas.insert(0, Etapa("modelo", functools.partial(_modelo, ifc_obj=ifc_obj, ruta_ifc=ruta_ifc, contenido=contenido), ("datos",), clave=()))
+    claves = {"datos": huella} if huella else {}
+    paquete = PaqueteZip(ruta_zip) if ruta_zip else None
+    salidas = {e.nombre: e.salida for e in etapas if e.salida}
+
+    def terminada(nombre, hechas, total):
+        if paquete and nombre in salidas: paquete.agregar(salidas[nombre])
+        if al_terminar: al_terminar(nombre, hechas, total)
+
+    try: _, tiempos = ejecutar(etapas, {"datos": datos}, procesos, terminada, cache, claves)
+    except BaseException:
+        if paquete: paquete.descartar()
+        raise
+    if paquete: paquete.cerrar()
+    return tiempos
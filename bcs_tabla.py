@@ -0,0 +1,169 @@
+# bcs_tabla.py
+import array
+import datetime
+from collections.abc import MutableMapping
+import numpy as np
+
+# --- ESQUEMA DE LA TABLA DE PARTES ---
+# Columnas que rellena la extracción (CORE)
+COLUMNAS_NUMERICAS = ("peso_kg", "altura_z", "desnivel_mm")
+COLUMNAS_CATEGORICAS = ("categoria", "perfil_maestro", "referencia", "assembly_mark")
+# Columnas que añaden después 4D / 5D / 6D (vacías hasta que se calculan)
+COLUMNAS_CALCULADAS_NUM = ("bcs_coste_item", "bcs_precio_unitario", "bcs_huella_item", "bcs_factor_impacto")
+COLUMNAS_CALCULADAS_CAT = ("bcs_fase", "_bcs_cat_6d")
+COLUMNA_FECHA = "bcs_fecha_plan"
+
+class Categorias:
+    """Diccionario de una columna categórica: valor <-> código entero."""
+    def __init__(self, valores=()):
+        self.valores = []; self._codigos = {}
+        for v in valores: self.codigo(v)
+
+    def codigo(self, valor):
+        c = self._codigos.get(valor)
+        if c is None:
+            c = len(self.valores); self._codigos[valor] = c; self.valores.append(valor)
+        return c
+
+    def buscar(self, valor):
+        """Código de un valor sin darlo de alta (-1 si no existe)."""
+        return self._codigos.get(valor, -1)
+
+    def __getitem__(self, c): return self.valores[c]
+    def __len__(self): return len(self.valores)
+
+class TablaPartes:
+    """
+    Tabla columnar de partes: arrays NumPy para los valores numéricos, códigos
+    categóricos para textos repetidos e ids de entidad en lugar de objetos IFC.
+    Iterar la tabla devuelve vistas FilaParte (tipo dict) por compatibilidad.
+    """
+    def __init__(self, columnas, categorias, modelo=None, firma=""):
+        n = len(columnas["id"])
+        self.columnas = columnas; self.categorias = categorias; self.modelo = modelo
+        self.firma = firma  # bcs_core.firma_extractor() del extractor que generó la tabla
+        self.extras = {}  # claves sueltas añadidas por fila (formato antiguo)
+        self.agregacion = None  # bcs_agregacion: átomos para los group-by de los informes
+        for c in COLUMNAS_CALCULADAS_NUM: self.columnas.setdefault(c, np.full(n, np.nan))
+        for c in COLUMNAS_CALCULADAS_CAT:
+            self.categorias.setdefault(c, Categorias([""]))
+            self.columnas.setdefault(c, np.zeros(n, dtype=np.int32))
+        self.columnas.setdefault(COLUMNA_FECHA, np.full(n, np.datetime64("NaT"), dtype="datetime64[D]"))
+
+    def __len__(self): return len(self.columnas["id"])
+    def __iter__(self): return (FilaParte(self, i) for i in range(len(self)))
+
+    def __getstate__(self):
+        """Al serializar (pickle) se omite el modelo IFC: la tabla viaja sola entre procesos."""
+        estado = dict(self.__dict__); estado["modelo"] = None
+        return estado
+
+    def __getitem__(self, clave):
+        if isinstance(clave, str): return self.columnas[clave]
+        return FilaParte(self, int(clave))
+
+    def valor(self, columna, i):
+        """Valor decodificado de una celda."""
+        if columna in self.categorias: return self.categorias[columna][self.columnas[columna][i]]
+        return self.columnas[columna][i]
+
+    def subtabla(self, filas):
+        """Nueva tabla con las filas indicadas (comparte los diccionarios categóricos)."""
+        return TablaPartes({c: v[filas] for c, v in self.columnas.items()}, self.categorias, self.modelo, self.firma)
+
+    def entidad(self, i):
+        return self.modelo.by_id(int(self.columnas["id"][i]))
+
+    def asignar_categoria(self, columna, filas, valor):
+        """Escribe el mismo valor categórico en un conjunto de filas."""
+        self.columnas[columna][filas] = self.categorias[columna].codigo(valor)
+
+class ConstructorTabla:
+    """Acumula partes fila a fila en buffers compactos y genera la TablaPartes."""
+    def __init__(self, modelo=None):
+        self.modelo = modelo
+        self.enteros = {"id": array.array("q"), "id_padre": array.array("q"), "huella_props": array.array("q")}
+        self.global_ids = []
+        self.numericas = {c: array.array("d") for c in COLUMNAS_NUMERICAS}
+        self.codigos = {c: array.array("i") for c in COLUMNAS_CATEGORICAS}
+        self.categorias = {c: Categorias() for c in COLUMNAS_CATEGORICAS}
+
+    def agregar(self, parte):
+        """parte: dict con id, id_padre (-1 si es suelta), global_id, huella_props, columnas numéricas y categóricas."""
+        self.enteros["id"].append(parte["id"]); self.enteros["id_padre"].append(parte.get("id_padre", -1))
+        self.enteros["huella_props"].append(parte.get("huella_props", 0))
+        self.global_ids.append((parte.get("global_id") or "").encode("ascii", "replace"))
+        for c, buf in self.numericas.items(): buf.append(parte[c])
+        for c, buf in self.codigos.items(): buf.append(self.categorias[c].codigo(parte[c]))
+
+    def __len__(self): return len(self.enteros["id"])
+
+    def construir(self):
+        columnas = {c: np.array(b, dtype=np.int64) for c, b in self.enteros.items()}
+        columnas.update({c: np.array(b, dtype=np.float64) for c, b in self.numericas.items()})
+        columnas.update({c: np.array(b, dtype=np.int32) for c, b in self.codigos.items()})
+        columnas["global_id"] = np.array(self.global_ids, dtype="S")
+        columnas["es_tornillo"] = np.zeros(len(self), dtype=bool)
+        return TablaPartes(columnas, self.categorias, self.modelo)
+
+class FilaParte(MutableMapping):
+    """Vista tipo dict de una fila de la tabla (compatibilidad con el antiguo 'datos')."""
+    __slots__ = ("tabla", "i")
+    def __init__(self, tabla, i): self.tabla = tabla; self.i = i
+
+    def _presente(self, k):
+        t = self.tabla
+        if k in ("objeto_ifc", "partes_hijas"): return t.modelo is not None
+        if k in COLUMNAS_CALCULADAS_NUM: return not np.isnan(t.columnas[k][self.i])
+        if k in COLUMNAS_CALCULADAS_CAT: return t.columnas[k][self.i] != 0
+        if k == COLUMNA_FECHA: return not np.isnat(t.columnas[k][self.i])
+        if k in t.columnas: return True
+        return k in t.extras.get(self.i, {})
+
+    def __contains__(self, k): return isinstance(k, str) and self._presente(k)
+
+    def __getitem__(self, k):
+        t = self.tabla; i = self.i
+        if not self._presente(k): raise KeyError(k)
+        if k == "objeto_ifc": return t.entidad(i)
+        if k == "partes_hijas": return [t.entidad(i)]
+        if k in t.categorias: return t.valor(k, i)
+        if k == COLUMNA_FECHA: return t.columnas[k][i].astype(datetime.date)
+        if k in ("id", "id_padre", "huella_props"): return int(t.columnas[k][i])
+        if k == "global_id": return t.columnas[k][i].decode("ascii")
+        if k == "es_tornillo": return bool(t.columnas[k][i])
+        if k in t.columnas: return float(t.columnas[k][i])
+        return t.extras[i][k]
+
+    def __setitem__(self, k, v):
+        t = self.tabla; i = self.i
+        if k in t.categorias: t.columnas[k][i] = t.categorias[k].codigo(v)
+        elif k == COLUMNA_FECHA: t.columnas[k][i] = np.datetime64(v, "D")
+        elif k in t.columnas: t.columnas[k][i] = v
+        else: t.extras.setdefault(i, {})[k] = v
+
+    def __delitem__(self, k):
+        del self.tabla.extras[self.i][k]
+
+    def __iter__(self):
+        claves = ["objeto_ifc", "partes_hijas"] + list(self.tabla.columnas) + list(self.tabla.extras.get(self.i, {}))
+        return (k for k in claves if self._presente(k))
+
+    def __len__(self): return sum(1 for _ in self)
+
+# --- PERSISTENCIA BINARIA (formato .npz de NumPy, sin pickle) ---
+COLUMNAS_BASE = ("id", "id_padre", "global_id", "huella_props", "es_tornillo") + COLUMNAS_NUMERICAS + COLUMNAS_CATEGORICAS
+
+def guardar_tabla(tabla, destino):
+    """Guarda las columnas de extracción (no las calculadas) y la firma del extractor en 'destino' (ruta o fichero abierto)."""
+    arrays = {f"col_{c}": tabla.columnas[c] for c in COLUMNAS_BASE}
+    for c in COLUMNAS_CATEGORICAS: arrays[f"cat_{c}"] = np.array(tabla.categorias[c].valores, dtype=str)
+    np.savez(destino, firma=np.array(tabla.firma, dtype=str), **arrays)
+
+def cargar_tabla(origen, modelo=None):
+    """Reconstruye una TablaPartes guardada con guardar_tabla (firma "" si el archivo no la trae)."""
+    with np.load(origen, allow_pickle=False) as f:
+        columnas = {c: f[f"col_{c}"] for c in COLUMNAS_BASE}
+        categorias = {c: Categorias(f[f"cat_{c}"].tolist()) for c in COLUMNAS_CATEGORICAS}
+        firma = str(f["firma"]) if "firma" in f.files else ""
+    return TablaPartes(columnas, categorias, modelo, firma)
@@ -0,0 +1,100 @@
+# tests/conftest.py
+# Modelos IFC pequeños generados con ifcopenshell.api (sin archivos binarios en el repo).
+import os
+import sys
+import numpy as np
+import pytest
+import ifcopenshell
+import ifcopenshell.api
+
+CARPETA_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if CARPETA_REPO not in sys.path: sys.path.insert(0, CARPETA_REPO)
+
+NIVELES_MM = (0.0, 3500.0, 7000.0)
+VIGAS_POR_NIVEL = 9 # Por encima de bcs_4d.UMBRAL_VIGAS_POR_NIVEL: cada cota es un nivel maestro
+
+def _pset(f, producto, nombre, propiedades):
+    pset = ifcopenshell.api.run("pset.add_pset", f, product=producto, name=nombre)
+    ifcopenshell.api.run("pset.edit_pset", f, pset=pset, properties=propiedades)
+
+def _elemento(f, clase, nombre, perfil, peso, z=0.0, marca=None, props=None):
+    e = ifcopenshell.api.run("root.create_entity", f, ifc_class=clase, name=nombre)
+    e.Description = perfil
+    m = np.eye(4); m[2, 3] = z
+    ifcopenshell.api.run("geometry.edit_object_placement", f, product=e, matrix=m)
+    _pset(f, e, "Tekla Common", dict({"Mark": marca or nombre}, **(props or {})))
+    if peso: _pset(f, e, "BaseQuantities", {"NetWeight": float(peso)})
+    return e
+
+def _conjunto(f, marca, z, partes):
+    asm = ifcopenshell.api.run("root.create_entity", f, ifc_class="IfcElementAssembly", name=marca)
+    ifcopenshell.api.run("geometry.edit_object_placement", f, product=asm, matrix=np.eye(4))
+    _pset(f, asm, "Tekla Assembly", {"Assembly/Cast unit Mark": marca, "Assembly/Cast unit bottom elevation": z})
+    ifcopenshell.api.run("aggregate.assign_object", f, relating_object=asm, products=partes)
+    return asm
+
+def crear_modelo(ruta):
+    """Nave de tres niveles: vigas con chapas y tornillos, pilares (desnivel en Psets) y piezas sueltas."""
+    f = ifcopenshell.file(schema="IFC4")
+    ifcopenshell.api.run("root.create_entity", f, ifc_class="IfcProject", name="Pruebas BCS")
+    ifcopenshell.api.run("unit.assign_unit", f, length={"is_metric": True, "raw": "MILLIMETERS"})
+    perfiles = ("IPE300", "HEB200", "UPN 160", "RHS120*80*5")
+    for n, z in enumerate(NIVELES_MM):
+        for k in range(VIGAS_POR_NIVEL):
+            marca = f"V{n}{k}"
+            viga = _elemento(f, "IfcBeam", f"b{n}{k}", perfiles[k % len(perfiles)], 150 + 37 * k + 11 * n, z, f"b{k % 4}")
+            chapa = _elemento(f, "IfcPlate", f"pl{n}{k}", "PL10*150", 4.5 + k % 3, z, "pl1")
+            tornillo = _elemento(f, "IfcMechanicalFastener", f"t{n}{k}", "M20", 0.4, z, "t1")
+            _conjunto(f, marca, z + 5.0 * (k % 3), [viga, chapa, tornillo])
+    for k in range(4): # Pilares de planta baja a cubierta (los pesados se detectan por desnivel)
+        pilar = _elemento(f, "IfcColumn", f"c{k}", "HEA200" if k < 3 else "HEA 100", 420 - 90 * k, 0.0, "c1",
+                          {"Bottom elevation": "+0.000", "Top elevation": "+7.000"})
+        _conjunto(f, f"P{k}", 0.0, [pilar])
+    # Sueltas: angular, chapa sin peso (1 kg por regla), rejilla, genérica, tornillo suelto y una sin peso
+    _elemento(f, "IfcMember", "ang1", "L50*5", 18.0, 3500.0)
+    _elemento(f, "IfcPlate", "chapa1", "CHAPA 8", 0.0, 3500.0)
+    _elemento(f, "IfcMember", "rej1", "REJILLA 30/2", 80.0, 7000.0)
+    _elemento(f, "IfcBuildingElementProxy", "gen1", "XYZ-99", 30.0, 7000.0)
+    _elemento(f, "IfcMember", "varilla1", "ROD M16", 2.0, 0.0)
+    _elemento(f, "IfcMember", "hueco1", "SHS100*5", 0.0, 0.0)
+    f.write(ruta)
+    return ruta
+
+def crear_revision(ruta_anterior, ruta):
+    """Siguiente revisión del modelo (mismos GlobalId): una pieza cambia de peso, otra de perfil, un pilar
+    desaparece y entra un conjunto nuevo."""
+    f = ifcopenshell.open(ruta_anterior)
+    por_nombre = {e.Name: e for e in f.by_type("IfcElement")}
+    for rel in por_nombre["b13"].IsDefinedBy:
+        if rel.RelatingPropertyDefinition.Name == "BaseQuantities":
+            ifcopenshell.api.run("pset.edit_pset", f, pset=rel.RelatingPropertyDefinition, properties={"NetWeight": 999.0})
+    por_nombre["ang1"].Description = "L60*6"
+    ifcopenshell.api.run("root.remove_product", f, product=por_nombre["c2"])
+    viga = _elemento(f, "IfcBeam", "b99", "IPE360", 510.0, 7000.0, "b9")
+    _conjunto(f, "V99", 7000.0, [viga])
+    f.write(ruta)
+    return ruta
+
+def comprobar_iguales(a, b):
+    """Misma tabla de partes: columnas numéricas idénticas y mismos textos fila a fila."""
+    import bcs_tabla
+    assert len(a) == len(b)
+    for c in ("id", "id_padre", "global_id", "huella_props", "es_tornillo") + bcs_tabla.COLUMNAS_NUMERICAS:
+        np.testing.assert_array_equal(a.columnas[c], b.columnas[c], err_msg=c)
+    for c in bcs_tabla.COLUMNAS_CATEGORICAS:
+        assert [a.valor(c, i) for i in range(len(a))] == [b.valor(c, i) for i in range(len(b))], c
+
+@pytest.fixture(scope="session")
+def ruta_modelo(tmp_path_factory):
+    return crear_modelo(str(tmp_path_factory.mktemp("ifc") / "nave.ifc"))
+
+@pytest.fixture(scope="session")
+def ruta_revision(ruta_modelo, tmp_path_factory):
+    return crear_revision(ruta_modelo, str(tmp_path_factory.mktemp("ifc") / "nave_P02.ifc"))
+
+@pytest.fixture
+def sin_cache(monkeypatch, tmp_path):
+    """Cachés en una carpeta temporal (extracciones y catálogos compilados)."""
+    import bcs_cache
+    monkeypatch.setattr(bcs_cache, "CARPETA_CACHE", str(tmp_path / "cache"))
+    monkeypatch.setattr(bcs_cache, "USAR_CACHE", False)
@@ -0,0 +1,122 @@
+# tests/test_4d.py
+# Paridad de la planificación 4D (niveles, verticalidad, fases y fechas) con el planificador original por bucles.
+import datetime
+import statistics
+import ifcopenshell
+import ifcopenshell.util.element
+import numpy as np
+import pytest
+import bcs_4d
+import bcs_calendario
+import bcs_core
+
+INICIO = datetime.date(2026, 1, 5) # Lunes
+
+# --- REFERENCIA: planificador anterior (dicts por pieza y un cursor de fechas) ---
+def desnivel_referencia(elemento):
+    bottom = None; top = None
+    for ps in ifcopenshell.util.element.get_psets(elemento).values():
+        for k, v in ps.items():
+            if "bottom elevation" in k.lower(): bottom = float(str(v).replace('+', ''))
+            if "top elevation" in k.lower(): top = float(str(v).replace('+', ''))
+    if bottom is None or top is None: return 0.0
+    if abs(top) < 200: top *= 1000.0
+    if abs(bottom) < 200: bottom *= 1000.0
+    return abs(top - bottom)
+
+def plan_referencia(filas, modelo, inicio, rendimiento, festivos=()):
+    grupos = {}
+    for fila in filas:
+        g = grupos.setdefault(fila["assembly_mark"], {"peso": 0.0, "partes": [], "z": 99999.0})
+        g["peso"] += fila["peso_kg"]; g["partes"].append(fila); g["z"] = min(g["z"], fila["altura_z"])
+    items = []
+    for ref, g in grupos.items():
+        maestro = sorted(g["partes"], key=lambda x: x["peso_kg"], reverse=True)[0]
+        perfil = maestro["perfil_maestro"].upper()
+        vertical = (g["peso"] >= 160.0 and any(x in perfil for x in ["HEA", "HEB", "HEM", "HD", "SHS", "RHS", "TUB", "IPE", "UPN", "W"])
+                    and desnivel_referencia(modelo.by_id(maestro["id"])) > 1800.0)
+        items.append({"ref": ref, "peso": g["peso"], "z": g["z"], "vertical": vertical, "ids": [p["id"] for p in g["partes"]]})
+    alturas = sorted(i["z"] for i in items if not i["vertical"])
+    niveles = []; actual = [alturas[0]]
+    for z in alturas[1:]:
+        if z - actual[-1] < 400.0: actual.append(z); continue
+        if len(actual) >= 8: niveles.append(statistics.mean(actual))
+        actual = [z]
+    if len(actual) >= 8: niveles.append(statistics.mean(actual))
+    niveles = niveles or [statistics.mean(alturas)]
+    for i in items:
+        z_nivel = round(i["z"] / 1000.0) * 1000.0 if i["vertical"] else min(niveles, key=lambda x: abs(x - i["z"]))
+        i["z_nivel"] = z_nivel; i["fase"] = f"NIVEL +{z_nivel/1000.0:.2f}m | {'PILARES' if i['vertical'] else 'VIGAS'}"
+    items.sort(key=lambda i: (i["z_nivel"], "01" if i["vertical"] else "02", -i["peso"]))
+    cursor = inicio; acum = 0.0
+    for i in items:
+        if acum + i["peso"] <= rendimiento: acum += i["peso"]
+        else:
+            cursor += datetime.timedelta(days=1)
+            while cursor.weekday() >= 5 or cursor in festivos: cursor += datetime.timedelta(days=1)
+            acum = i["peso"]
+        i["fecha"] = cursor
+    return items, niveles
+
+def planificar(ruta_ifc, rendimiento, festivos=(), region=None):
+    """(plan de calcular_fechas_para_ifc, plan de referencia, tabla planificada, niveles de referencia)."""
+    modelo = ifcopenshell.open(ruta_ifc)
+    datos = bcs_core.extraer_datos_bcs(modelo)
+    esperado, niveles = plan_referencia([dict(f) for f in datos], modelo, INICIO, rendimiento, festivos)
+    return bcs_4d.calcular_fechas_para_ifc(datos, INICIO, rendimiento, region), esperado, datos, niveles
+
+def comprobar_plan(obtenido, esperado, datos):
+    assert [(i["referencia"], i["bcs_fase"], i["bcs_fecha_plan"]) for i in obtenido] == \
+           [(i["ref"], i["fase"], i["fecha"]) for i in esperado]
+    fila = {int(x): k for k, x in enumerate(datos.columnas["id"])}
+    for i in esperado: # Cada pieza hereda fecha y fase de su conjunto
+        for eid in i["ids"]:
+            assert datos.columnas["bcs_fecha_plan"][fila[eid]].astype(object) == i["fecha"]
+            assert datos.valor("bcs_fase", fila[eid]) == i["fase"]
+
+@pytest.fixture
+def sin_festivos(monkeypatch, tmp_path):
+    monkeypatch.setattr(bcs_calendario, "ARCHIVO_FESTIVOS", str(tmp_path / "no_existe.csv"))
+
+@pytest.mark.parametrize("rendimiento", [300.0, 1500.0, 4000.0, 1e9])
+def test_fechas_sin_festivos(ruta_modelo, sin_cache, sin_festivos, rendimiento):
+    obtenido, esperado, datos, _ = planificar(ruta_modelo, rendimiento)
+    comprobar_plan(obtenido, esperado, datos)
+
+def test_niveles_y_pilares(ruta_modelo, sin_cache, sin_festivos):
+    obtenido, esperado, _, niveles = planificar(ruta_modelo, 1500.0)
+    assert len(niveles) == 3
+    np.testing.assert_allclose(bcs_4d.detectar_niveles_maestros(obtenido), niveles)
+    pilares = sorted(i["referencia"] for i in obtenido if i["es_vertical"])
+    assert pilares == sorted(i["ref"] for i in esperado if i["vertical"]) == ["P0", "P1", "P2"]
+    assert all(i["desnivel_mm"] == 7000.0 for i in obtenido if i["es_vertical"])
+
+# --- FESTIVOS (bcs_calendario) ---
+FESTIVOS_CSV = """# region;desde;hasta;descripcion
+ES;*-01-06;;Reyes
+ES;2026-01-12;2026-01-14;Cierre de obra
+ES-MD;*-01-20;;Fiesta local
+ES-CT;2026-01-21;;Otra comunidad
+*;2026-02-02;;Todas las regiones
+"""
+DIAS_ES = {datetime.date(2026, 1, 6), datetime.date(2026, 1, 12), datetime.date(2026, 1, 13), datetime.date(2026, 1, 14),
+           datetime.date(2026, 2, 2)}
+
+@pytest.fixture
+def con_festivos(monkeypatch, tmp_path):
+    ruta = tmp_path / "festivos.csv"; ruta.write_text(FESTIVOS_CSV, encoding="utf-8")
+    monkeypatch.setattr(bcs_calendario, "ARCHIVO_FESTIVOS", str(ruta))
+
+@pytest.mark.parametrize("region, festivos", [("ES", DIAS_ES), ("ES-MD", DIAS_ES | {datetime.date(2026, 1, 20)})])
+@pytest.mark.parametrize("rendimiento", [300.0, 1500.0])
+def test_fechas_con_festivos(ruta_modelo, sin_cache, con_festivos, region, festivos, rendimiento):
+    obtenido, esperado, datos, _ = planificar(ruta_modelo, rendimiento, festivos, region)
+    comprobar_plan(obtenido, esperado, datos)
+    assert not festivos & {i["bcs_fecha_plan"] for i in obtenido}
+
+def test_festivos_cambian_el_plan(ruta_modelo, sin_cache, sin_festivos, monkeypatch, tmp_path):
+    libre = [i["bcs_fecha_plan"] for i in planificar(ruta_modelo, 300.0)[0]]
+    ruta = tmp_path / "festivos.csv"; ruta.write_text(FESTIVOS_CSV, encoding="utf-8")
+    monkeypatch.setattr(bcs_calendario, "ARCHIVO_FESTIVOS", str(ruta))
+    con_cierre = [i["bcs_fecha_plan"] for i in planificar(ruta_modelo, 300.0)[0]]
+    assert con_cierre[-1] - libre[-1] == datetime.timedelta(days=7) # 5 festivos laborables = una semana más
@@ -0,0 +1,52 @@
+# tests/test_cache.py
+# Caché en disco de la extracción: ida y vuelta por .npz, clave por contenido y versión, expulsión LRU.
+import os
+import ifcopenshell
+import pytest
+import bcs_cache
+import bcs_core
+from conftest import comprobar_iguales
+
+@pytest.fixture
+def cache(sin_cache, monkeypatch):
+    monkeypatch.setattr(bcs_cache, "USAR_CACHE", True)
+    return bcs_cache
+
+def entradas(cache):
+    return sorted(os.listdir(cache.CARPETA_CACHE)) if os.path.isdir(cache.CARPETA_CACHE) else []
+
+def test_ida_y_vuelta(cache, ruta_modelo, monkeypatch):
+    datos, modelo = bcs_core.extraer_datos_modelo(ruta_modelo)
+    clave = cache.clave_cache(ruta_modelo, bcs_core.firma_extractor())
+    assert modelo is not None and entradas(cache) == [f"{clave}.npz"]
+    leidos, sin_abrir = bcs_core.extraer_datos_modelo(ruta_modelo)
+    assert sin_abrir is None # De la caché: el IFC no se abre
+    comprobar_iguales(leidos, datos); assert leidos.firma == datos.firma
+    assert bcs_core.modelo_de_tabla(leidos, ruta_modelo).by_id(int(leidos.columnas["id"][0])).GlobalId == leidos.valor("global_id", 0).decode()
+    with open(ruta_modelo, "rb") as f: contenido = f.read()
+    assert bcs_core.extraer_datos_modelo(contenido=contenido)[1] is None # Misma clave desde los bytes subidos
+    # Otras reglas: otra versión del extractor, otra entrada
+    monkeypatch.setattr(bcs_core, "CLASIFICADOR", bcs_core.Clasificador(patrones_tornillo=["BOLT"]))
+    assert bcs_core.extraer_datos_modelo(ruta_modelo)[1] is not None and len(entradas(cache)) == 2
+
+def test_entrada_corrupta(cache, ruta_modelo):
+    datos, _ = bcs_core.extraer_datos_modelo(ruta_modelo)
+    ruta = os.path.join(cache.CARPETA_CACHE, entradas(cache)[0])
+    with open(ruta, "wb") as f: f.write(b"no es un npz")
+    assert cache.leer(cache.clave_cache(ruta_modelo, bcs_core.firma_extractor())) is None and not os.path.exists(ruta)
+    otra_vez, modelo = bcs_core.extraer_datos_modelo(ruta_modelo) # Se extrae de nuevo y se vuelve a guardar
+    assert modelo is not None and os.path.exists(ruta)
+    comprobar_iguales(otra_vez, datos)
+
+def test_expulsion_lru(cache, ruta_modelo, monkeypatch):
+    tabla = bcs_core.extraer_datos_bcs(ifcopenshell.open(ruta_modelo))
+    for n, clave in enumerate("abc"):
+        cache.guardar(clave, tabla); os.utime(cache._ruta_entrada(clave), (1000 + n, 1000 + n))
+    tam = os.path.getsize(cache._ruta_entrada("a"))
+    assert cache.leer("a") is not None # Usada ahora: pasa a ser la más reciente
+    cache.podar(2.5 * tam / 2**20)
+    assert entradas(cache) == ["a.npz", "c.npz"] # Sale la usada hace más tiempo
+    monkeypatch.setattr(cache, "LIMITE_CACHE_MB", 1.5 * tam / 2**20)
+    cache.guardar("d", tabla) # Guardar poda con el límite configurado
+    assert entradas(cache) == ["d.npz"]
+    cache.invalidar(); assert entradas(cache) == []
@@ -0,0 +1,122 @@
+# tests/test_catalogo.py
+# Catálogo externo de precios 5D: búsqueda indexada (exacto / prefijo / comodín) frente a una búsqueda lineal.
+import fnmatch
+import os
+import ifcopenshell
+import numpy as np
+import pytest
+import bcs_5d
+import bcs_catalogo
+import bcs_core
+
+CATALOGO_CSV = """perfil;precio_kg;categoria;calidad;acabado;proveedor
+# Exactos (también los que llevan comodines: casan antes literalmente)
+HEA200;1,10;;;;
+hea 200;1.05;;S355;;
+L50*5;1.20;;;;
+IPE300;1.00;PLACA;;;
+# Prefijos
+IPE*;1.30;;;;
+IPE3*;1.25;;;;
+RHS*;1.90;LAMINADO;;;
+RHS*;1.70;;;GALVANIZADO;
+UPN*;1.80;;;;PROVEEDOR B
+CHAPA*;2.00;PLACA;;;
+# Comodines
+PL[0-9]*;1.40;;;;
+SHS???*5;1.50;;;;
+*X10;0.90;;;;
+IPE?00;1.35;;;;
+# Líneas que se descartan
+REJILLA*;abc;;;;
+;1.00;;;;
+"""
+PERFILES = ["HEA200", "hea 200", "HEA 100", "L50*5", "L50X5", "IPE300", "IPE 360", "IPE450", "IPE", "IPE3", "RHS120*80*5",
+            "UPN 160", "CHAPA 8", "PL10*150", "PLX", "SHS100*5", "SHS100*6", "60X10", "X10", "REJILLA 30/2", "XYZ-99", ""]
+CATEGORIAS = ["LAMINADO", "PLACA", "GENERICO", "REJILLA"]
+OBRAS = [(None, None, None), ("S355", None, None), ("S275", "GALVANIZADO", "PROVEEDOR B"), ("s355", "galvanizado", None)]
+
+@pytest.fixture
+def ruta_csv(tmp_path, sin_cache):
+    ruta = tmp_path / "precios.csv"; ruta.write_text(CATALOGO_CSV, encoding="utf-8")
+    return str(ruta)
+
+# --- REFERENCIA: recorrido lineal de las filas del catálogo ---
+def filas_referencia(catalogo, calidad, acabado, proveedor):
+    """Entradas válidas para la obra en orden de preferencia: más específica, más barata, orden de archivo."""
+    cols = catalogo.columnas; filas = []
+    for k in range(len(catalogo)):
+        especificidad = 0; valida = True
+        for campo, valor in (("calidad", calidad), ("acabado", acabado), ("proveedor", proveedor)):
+            if valor is None: continue
+            if cols[campo][k] == bcs_catalogo.normalizar(valor): especificidad += 1
+            elif cols[campo][k]: valida = False
+        if valida: filas.append((-especificidad, float(cols["precio_kg"][k]), k))
+    return [k for _, _, k in sorted(filas)]
+
+def resolver_referencia(catalogo, filas, perfil, categoria):
+    cols = catalogo.columnas; perfil = bcs_catalogo.normalizar(perfil); categoria = bcs_catalogo.normalizar(categoria)
+    candidatas = [k for k in filas if cols["categoria"][k] == categoria] + [k for k in filas if cols["categoria"][k] == ""]
+    for k in candidatas:
+        if cols["patron"][k] == perfil: return k
+    prefijos = [k for k in candidatas if cols["tipo"][k] == bcs_catalogo.PREFIJO and perfil.startswith(cols["patron"][k][:-1])]
+    if prefijos: return max(prefijos, key=lambda k: (len(cols["patron"][k]), -prefijos.index(k)))
+    for k in candidatas:
+        if cols["tipo"][k] == bcs_catalogo.COMODIN and fnmatch.fnmatchcase(perfil, cols["patron"][k]): return k
+    return -1
+
+def test_lectura_csv(ruta_csv):
+    catalogo = bcs_catalogo.cargar_catalogo(ruta_csv)
+    assert len(catalogo) == 14
+    assert list(catalogo.columnas["patron"][:4]) == ["HEA200", "HEA200", "L50*5", "IPE300"]
+    assert list(catalogo.columnas["tipo"]) == [0, 0, 2, 0] + [1] * 6 + [2] * 4
+    assert catalogo.precio_kg[0] == 1.10
+
+@pytest.mark.parametrize("obra", OBRAS)
+def test_resolver_como_referencia(ruta_csv, obra):
+    catalogo = bcs_catalogo.cargar_catalogo(ruta_csv); tarifa = catalogo.tarifa(*obra)
+    filas = filas_referencia(catalogo, *obra)
+    assert tarifa.entradas.tolist() == filas
+    pares = [(p, c) for p in PERFILES for c in CATEGORIAS]
+    obtenido = tarifa.resolver([p for p, _ in pares], [c for _, c in pares])
+    assert obtenido.tolist() == [resolver_referencia(catalogo, filas, p, c) for p, c in pares]
+
+def test_precios_esperados(ruta_csv):
+    tarifa = bcs_catalogo.tarifa(ruta_csv)
+    def precio(perfil, categoria="LAMINADO"):
+        k = tarifa.resolver([perfil], [categoria])[0]
+        return None if k < 0 else float(tarifa.precio_kg[k])
+    assert precio("HEA 200") == 1.05                                      # Exacto: el más barato
+    assert precio("L50*5") == 1.20 and precio("L50X5") == 1.20            # Literal y, además, como comodín
+    assert precio("IPE300") == 1.25 and precio("IPE300", "PLACA") == 1.00 # Prefijo más largo / exacto de su categoría
+    assert precio("IPE450") == 1.30 and precio("IPE") == 1.30             # Como fnmatch: "IPE*" casa con "IPE"
+    assert precio("RHS120*80*5") == 1.90 and precio("RHS120*80*5", "GENERICO") == 1.70 # Los de la categoría primero
+    assert precio("PL10*150", "PLACA") == 1.40 and precio("60X10") == 0.90
+    assert precio("XYZ-99", "GENERICO") is None
+    assert float(tarifa.precio_kg[bcs_catalogo.tarifa(ruta_csv, calidad="S275").resolver(["HEA200"], ["LAMINADO"])[0]]) == 1.10
+
+def test_forma_compilada(ruta_csv):
+    catalogo = bcs_catalogo.cargar_catalogo(ruta_csv)
+    assert os.path.exists(bcs_catalogo._ruta_compilado(catalogo.huella))
+    bcs_catalogo._cargar.cache_clear() # Sin memoria: se lee el .npz
+    desde_npz = bcs_catalogo.cargar_catalogo(ruta_csv)
+    for c, v in catalogo.columnas.items(): np.testing.assert_array_equal(desde_npz.columnas[c], v)
+
+def test_sin_catalogo_en_el_modelo(ruta_modelo, ruta_csv):
+    datos = bcs_core.extraer_datos_bcs(ifcopenshell.open(ruta_modelo))
+    catalogo = bcs_catalogo.cargar_catalogo(ruta_csv); tarifa = catalogo.tarifa()
+    filas = filas_referencia(catalogo, None, None, None)
+    resumen = bcs_5d.resumen_costes(datos, tarifa)
+    faltan = {}; cols = datos.columnas
+    for i, fila in enumerate(datos):
+        k = resolver_referencia(catalogo, filas, fila["perfil_maestro"], fila["categoria"])
+        precio = bcs_5d.PRECIOS_CATEGORIA.get(fila["categoria"], bcs_5d.PRECIO_GENERICO) if k < 0 else catalogo.precio_kg[k]
+        assert cols["bcs_precio_unitario"][i] == pytest.approx(precio)
+        assert cols["bcs_coste_item"][i] == pytest.approx(fila["peso_kg"] * precio)
+        if k < 0:
+            f = faltan.setdefault((fila["perfil_maestro"], fila["categoria"]), {"uds": 0, "peso": 0.0})
+            f["uds"] += 1; f["peso"] += fila["peso_kg"]
+    assert {(x["perfil"], x["cat"]): (x["uds"], pytest.approx(x["peso"])) for x in resumen["sin_catalogo"]} == \
+           {clave: (v["uds"], pytest.approx(v["peso"])) for clave, v in faltan.items()}
+    assert {"HEB200", "HEA 100", "REJILLA 30/2", "XYZ-99"} == {x["perfil"] for x in resumen["sin_catalogo"]}
+    assert bcs_5d.resumen_costes(datos)["sin_catalogo"] == [] # Sin tarifa: precios por categoría
@@ -0,0 +1,93 @@
+# tests/test_clasificador.py
+# Paridad del clasificador por reglas regex con las funciones originales (cadenas 'in' / startswith) y tabla de reglas propia.
+import itertools
+import os
+import subprocess
+import sys
+import ifcopenshell
+import pytest
+import bcs
+import bcs_core
+from conftest import CARPETA_REPO
+
+# --- REFERENCIA: clasificación anterior a las reglas compiladas ---
+def placa_referencia(perfil):
+    p = perfil.upper().strip()
+    return p.startswith("PL") or p.startswith("FL") or "PLATE" in p or "CHAPA" in p or "PLANCHA" in p
+
+def tornillo_referencia(perfil, nombre, clase):
+    if placa_referencia(perfil): return False
+    if clase == "IfcMechanicalFastener": return True
+    txt = nombre.upper() + " " + perfil.upper()
+    return any(x in txt for x in ["BOLT", "NUT", "WASHER", "TORNILLO", "TUERCA", "ARANDELA", "ANCHOR", "ROD"])
+
+def categoria_referencia(perfil):
+    if placa_referencia(perfil): return "PLACA"
+    p = perfil.upper().replace(" ", "")
+    if any(x in p for x in ["IPE","HEA","HEB","UPN","SHS","RHS","TUBO","HSS","W","UB","UC","ANGULO"]): return "LAMINADO"
+    if len(p) > 1 and p[0] == "L" and p[1].isdigit(): return "LAMINADO"
+    if "REJILLA" in p or "TRAMEX" in p: return "REJILLA"
+    return "GENERICO"
+
+PERFILES = ["PL10*150", "pl 10", "  FL20*200", "BASE PLATE 20", "Chapa 8", "PLANCHA 5", "IPE300", "hea 200", "HEB 400",
+            "UPN 160", "SHS100*5", "RHS120*80*5", "TUBO 60.3", "HSS 4x4", "W12X26", "UB 203x133", "UC254", "ANGULO 50",
+            "L50*5", "L 60*6", "LX", "L", "REJILLA 30/2", "tramex", "XYZ-99", "", "S/N", "M20", "ROD M16", "CL 20",
+            "ANCHOR BOLT M24", "PLACA ANCLAJE", "HD 400", "IPEA 270", "C 20", "NUTRIA", "FLANGE", "  ", "ÑANDÚ"]
+NOMBRES = ["", "BOLT", "nut m20", "Viga", "washer", "TORNILLO", "arandela", "Pilar P1"]
+CLASES = ["IfcBeam", "IfcColumn", "IfcPlate", "IfcMember", "IfcMechanicalFastener", "IfcBuildingElementProxy"]
+
+@pytest.mark.parametrize("perfil", PERFILES)
+def test_reglas_como_referencia(perfil):
+    clasificador = bcs_core.Clasificador()
+    for nombre, clase in itertools.product(NOMBRES, CLASES):
+        esperado = (categoria_referencia(perfil), tornillo_referencia(perfil, nombre, clase))
+        assert clasificador.clasificar(perfil, nombre, clase) == esperado, (perfil, nombre, clase)
+        assert clasificador.clasificar(perfil, nombre, clase) == esperado # Respuesta memorizada
+
+def test_modelo_como_referencia(ruta_modelo):
+    f = ifcopenshell.open(ruta_modelo); indice = bcs_core.indexar_modelo(f)
+    elementos = f.by_type("IfcElement")
+    assert len(elementos) > 30
+    for e in elementos:
+        perfil = e.Description or e.Name or "S/N"
+        esperado = (perfil, categoria_referencia(perfil), tornillo_referencia(perfil, e.Name or "", e.is_a()))
+        assert bcs_core.clasificacion(e, indice) == bcs_core.clasificacion(e) == esperado # Con índice y sin él
+        assert bcs_core.clasificar_elemento(e, indice) == categoria_referencia(perfil)
+        assert bcs_core.es_placa_confirmada(e, indice) == placa_referencia(perfil)
+        assert bcs_core.es_tornillo_estricto(e, indice) == tornillo_referencia(perfil, e.Name or "", e.is_a())
+
+def test_extraccion_usa_la_misma_categoria(ruta_modelo, sin_cache):
+    datos = bcs_core.extraer_datos_bcs(ifcopenshell.open(ruta_modelo))
+    categorias = {fila["perfil_maestro"]: fila["categoria"] for fila in datos}
+    assert categorias == {p: categoria_referencia(p) for p in categorias}
+    assert {"PLACA", "LAMINADO", "REJILLA", "GENERICO"} <= set(categorias.values())
+    assert not any(p in categorias for p in ("M20", "ROD M16")) # Tornillería fuera de la tabla
+
+# --- TABLA DE REGLAS DE LA INSTALACIÓN (BCS_REGLAS / --reglas) ---
+REGLAS_CSV = """categoria;campo;patron
+PLACA;perfil;^PL
+LAMINADO;compacto;IPE
+LAMINADO;compacto;HE[AB]
+ESPECIAL;compacto;XYZ
+TORNILLO;;^M\\d
+"""
+
+@pytest.fixture
+def ruta_reglas(tmp_path, monkeypatch):
+    ruta = tmp_path / "reglas.csv"; ruta.write_text(REGLAS_CSV, encoding="utf-8")
+    monkeypatch.setenv("BCS_REGLAS", ""); monkeypatch.delenv("BCS_REGLAS") # Al terminar no queda (--reglas la pone)
+    monkeypatch.setattr(bcs_core, "CLASIFICADOR", bcs_core.CLASIFICADOR) # --reglas lo sustituye
+    return str(ruta)
+
+def test_reglas_del_entorno(ruta_reglas):
+    codigo = "import bcs_core; c = bcs_core.CLASIFICADOR; print(c.firma, *c.clasificar('XYZ-99', '', 'IfcMember'))"
+    entorno = dict(os.environ, BCS_REGLAS=ruta_reglas)
+    salida = subprocess.run([sys.executable, "-c", codigo], env=entorno, cwd=CARPETA_REPO, capture_output=True, text=True, check=True)
+    assert salida.stdout.split() == [bcs_core.Clasificador(*bcs_core.cargar_reglas_csv(ruta_reglas)).firma, "ESPECIAL", "False"]
+
+def test_opcion_reglas(ruta_modelo, ruta_reglas, sin_cache, tmp_path):
+    assert bcs.main(["escenarios", ruta_modelo, "--reglas", ruta_reglas, "--salida", str(tmp_path)]) == 0
+    assert os.environ["BCS_REGLAS"] == ruta_reglas # Lo heredan los procesos que se lancen
+    categorias = {fila["perfil_maestro"]: fila["categoria"] for fila in bcs_core.extraer_datos_bcs(ifcopenshell.open(ruta_modelo))}
+    assert categorias["XYZ-99"] == "ESPECIAL" and categorias["UPN 160"] == "GENERICO" and categorias["HEA200"] == "LAMINADO"
+    assert "ROD M16" in categorias # Sus patrones de tornillería sustituyen a los de serie
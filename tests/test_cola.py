@@ -0,0 +1,155 @@
+# tests/test_cola.py
+# Cola de trabajos de la app web: reparto, cancelación, reemplazo, timeout y recuperación; el IFC subido
+# viaja en memoria compartida y se libera con sus trabajos.
+import datetime
+import gc
+import hashlib
+import os
+import sys
+import threading
+import time
+import uuid
+import pytest
+import bcs
+import bcs_cola
+import bcs_pipeline
+
+OPCIONES = {"fecha_inicio": datetime.date(2026, 1, 5), "rendimiento_kg": 1500.0, "region": "ES",
+            "iso_status": "S2", "iso_suitability": "Para Información", "ifczip": False}
+
+@pytest.fixture
+def cola(monkeypatch, tmp_path, sin_cache):
+    """Cola vacía en una carpeta temporal, con bloques de memoria propios de la prueba."""
+    monkeypatch.setattr(bcs_cola, "CARPETA_COLA", str(tmp_path / "cola"))
+    monkeypatch.setattr(bcs_cola, "PREFIJO_BLOQUE", f"bcs_prueba_{uuid.uuid4().hex[:6]}_")
+    monkeypatch.setattr(bcs_pipeline, "PROCESOS_RENDER", 1) # Los PDF en el propio proceso
+    monkeypatch.setattr(sys, "stdout", sys.stdout); monkeypatch.setattr(sys, "stderr", sys.stderr) # _ejecutar los cambia
+    yield bcs_cola
+    for t in bcs_cola._sql("SELECT id FROM trabajos")[0]: bcs_cola.borrar(t["id"]) # Libera sus bloques de memoria
+
+@pytest.fixture
+def contenido(ruta_modelo):
+    with open(ruta_modelo, "rb") as f: return f.read()
+
+def en_memoria(huella):
+    try:
+        with bcs_cola.entrada(huella) as vista: return bytes(vista)
+    except FileNotFoundError: return None
+
+def test_ifc_en_memoria(cola, contenido):
+    tid = cola.encolar(contenido, "nave.ifc", sesion="s1", **OPCIONES)
+    huella = hashlib.sha256(contenido).hexdigest()
+    assert cola.estado(tid)["huella"] == huella and en_memoria(huella) == contenido
+    assert os.listdir(cola.carpeta_trabajo(tid)) == [] # Nada en disco
+    # Otras opciones: el trabajo nuevo usa el IFC que ya está en la cola
+    nuevo = cola.encolar(None, None, sesion="s1", reemplaza=tid, **dict(OPCIONES, rendimiento_kg=3000.0))
+    assert cola.estado(nuevo)["archivo"] == "nave.ifc" and cola.estado(nuevo)["huella"] == huella
+    assert cola.estado(tid)["estado"] == "cancelado"
+    cola.borrar(tid); assert en_memoria(huella) == contenido # Aún lo usa el nuevo
+    cola.borrar(nuevo); assert en_memoria(huella) is None
+    with pytest.raises(ValueError): cola.encolar(None, None, sesion="s1", reemplaza=nuevo, **OPCIONES)
+
+def test_trabajo_desde_memoria(cola, contenido):
+    tid = cola.encolar(contenido, "nave.ifc", sesion="s1", **OPCIONES)
+    memoria = {}; cola._ejecutar(cola._reclamar(0, []), memoria)
+    hecho = cola.estado(tid)
+    assert hecho["estado"] == "hecho", hecho["mensaje"]
+    rutas = bcs.rutas_salida("nave.ifc", hecho["carpeta"]); del rutas["tabla"]
+    assert sorted(os.listdir(hecho["carpeta"])) == sorted([os.path.basename(r) for r in rutas.values()] + ["bcs.log"])
+    # Otras opciones con el IFC de la cola: la extracción y el modelo siguen en la memoria del trabajador
+    nuevo = cola.encolar(None, None, sesion="s1", reemplaza=tid, **dict(OPCIONES, iso_status="A1"))
+    cola._ejecutar(cola._reclamar(0, list(memoria)), memoria)
+    assert cola.estado(nuevo)["estado"] == "hecho" and cola.estado(tid) is None # El reemplazado se borra al terminar
+    cola.borrar(nuevo); assert en_memoria(hecho["huella"]) is None
+
+def test_sin_ifc_en_memoria(cola, contenido):
+    tid = cola.encolar(contenido, "nave.ifc", **OPCIONES)
+    cola._borrar_entrada(cola.estado(tid)["huella"]) # Como tras reiniciar el servidor
+    cola._ejecutar(cola._reclamar(0, []), {})
+    assert cola.estado(tid)["estado"] == "error" and "Vuelve a subirlo" in cola.estado(tid)["mensaje"]
+
+def test_fin_de_sesion(cola, contenido):
+    vigia = cola.VigiaSesion(); otra = cola.VigiaSesion()
+    tid = cola.encolar(contenido, "nave.ifc", sesion=vigia.sesion, **OPCIONES)
+    recargada = cola.encolar(contenido, "nave.ifc", sesion=vigia.sesion, **dict(OPCIONES, ifczip=True))
+    cola.adoptar(recargada, otra.sesion) # La página se recargó con este trabajo en la URL
+    huella = cola.estado(tid)["huella"]
+    del vigia; gc.collect() # Streamlit descarta el estado de la sesión
+    assert cola.estado(tid) is None and not os.path.exists(cola.carpeta_trabajo(tid))
+    assert cola.estado(recargada)["sesion"] == otra.sesion and en_memoria(huella) == contenido
+    otra.cerrar()
+    assert cola.estado(recargada) is None and en_memoria(huella) is None
+
+# --- REPARTO, CANCELACIÓN Y VIGILANCIA ---
+def test_reclamar(cola):
+    a1 = cola.encolar(b"IFC 1", "a1.ifc", sesion="A", **OPCIONES); a2 = cola.encolar(b"IFC 2", "a2.ifc", sesion="A", **OPCIONES)
+    b1 = cola.encolar(b"IFC 3", "b1.ifc", sesion="B", **OPCIONES)
+    assert [cola.estado(t)["posicion"] for t in (a1, a2, b1)] == [1, 2, 3]
+    assert cola._reclamar(0, [])["id"] == a1 # El más antiguo
+    assert cola._reclamar(1, [])["id"] == b1 # La sesión A ya tiene uno en curso: no acapara los trabajadores
+    assert cola._reclamar(2, []) is None
+    assert cola.estado(b1)["estado"] == "en_curso" and cola.estado(b1)["trabajador"] == 1 and cola.estado(a2)["posicion"] == 1
+    cola._actualizar(a1, estado="hecho"); cola._actualizar(b1, estado="hecho")
+    c1 = cola.encolar(b"IFC 1", "a1.ifc", sesion="C", **OPCIONES)
+    assert cola._reclamar(0, [cola.estado(c1)["huella"]])["id"] == c1 # Prefiere el IFC que el trabajador ya tiene en memoria
+    assert cola._reclamar(1, [])["id"] == a2
+
+def test_cancelar(cola, contenido):
+    pendiente = cola.encolar(b"IFC 1", "a.ifc", sesion="A", **OPCIONES)
+    en_curso = cola.encolar(contenido, "nave.ifc", sesion="B", **OPCIONES)
+    cola.cancelar(pendiente)
+    assert cola._reclamar(0, [])["id"] == en_curso and cola._reclamar(1, []) is None # El cancelado no llega a empezar
+    avance = cola._Avance(en_curso); avance("extraccion", 3, 10, 0.0, 0.5)
+    assert cola.estado(en_curso)["progreso"] == pytest.approx(0.15) and cola.estado(en_curso)["etapa"] == "extraccion"
+    cola.cancelar(en_curso)
+    with pytest.raises(cola.TrabajoCancelado): avance("extraccion", 10, 10, 0.0, 0.5) # Se detiene en el siguiente aviso
+    assert cola.estado(en_curso)["estado"] == "cancelado"
+    # Un trabajador con un trabajo cancelado por el camino lo deja así (sin error ni entregables)
+    otro = cola.encolar(contenido, "nave.ifc", sesion="B", **dict(OPCIONES, ifczip=True))
+    trabajo = cola._reclamar(0, []); cola.cancelar(otro); cola._ejecutar(trabajo, {})
+    assert cola.estado(otro)["estado"] == "cancelado" and os.listdir(cola.carpeta_trabajo(otro)) == ["bcs.log"]
+
+def test_reutilizar_y_reemplazar(cola, contenido):
+    tid = cola.encolar(contenido, "nave.ifc", sesion="s1", **OPCIONES)
+    assert cola.encolar(contenido, "nave.ifc", sesion="s1", **OPCIONES) == tid # Mismo IFC y opciones: el mismo trabajo
+    otra_sesion = cola.encolar(contenido, "nave.ifc", sesion="s2", **OPCIONES)
+    assert otra_sesion != tid
+    nuevo = cola.encolar(None, None, sesion="s1", reemplaza=tid, **dict(OPCIONES, ifczip=True))
+    assert cola.estado(nuevo)["reemplaza"] == tid and cola.estado(tid)["estado"] == "cancelado"
+    # Volver a unas opciones que ya tiene un trabajo en cola: se reutiliza y el reemplazado se borra ya
+    assert cola.encolar(contenido, "nave.ifc", sesion="s2", reemplaza=nuevo, **OPCIONES) == otra_sesion
+    assert cola.estado(nuevo) is None and not os.path.exists(cola.carpeta_trabajo(nuevo))
+
+class ColaDePrueba(bcs_cola.Cola):
+    """Trabajadores que solo esperan: se prueba el vigilante sin lanzar trabajadores reales."""
+    def _lanzar(self, n):
+        p = self.ctx.Process(target=time.sleep, args=(60,)); p.start()
+        self.procesos[n] = p; self.lanzados.append(n)
+
+def test_timeout_y_caidas(cola):
+    vigilante = ColaDePrueba(trabajadores=2, timeout_s=30); vigilante.lanzados = []
+    try:
+        for n in range(2): vigilante._lanzar(n)
+        lento = cola.encolar(b"IFC 1", "a.ifc", sesion="A", **OPCIONES); caido = cola.encolar(b"IFC 2", "b.ifc", sesion="B", **OPCIONES)
+        cola._reclamar(0, []); cola._reclamar(1, [])
+        cola._sql("UPDATE trabajos SET inicio=? WHERE id=?", time.time() - 60, lento)
+        vigilante.procesos[1].terminate(); vigilante.procesos[1].join() # El trabajador 1 muere con su trabajo
+        hilo = threading.Thread(target=vigilante._vigilar); hilo.start()
+        time.sleep(2.5); vigilante._parar.set(); hilo.join()
+        assert cola.estado(lento)["estado"] == "error" and cola.estado(lento)["mensaje"] == "Tiempo agotado (30 s)."
+        assert cola.estado(caido)["estado"] == "error" and "terminó inesperadamente" in cola.estado(caido)["mensaje"]
+        assert sorted(vigilante.lanzados) == [0, 0, 1, 1] and all(p.is_alive() for p in vigilante.procesos.values())
+    finally: vigilante.parar()
+
+def test_recuperar_y_purgar(cola, contenido):
+    en_curso = cola.encolar(contenido, "nave.ifc", sesion="A", **OPCIONES)
+    viejo = cola.encolar(contenido, "nave.ifc", sesion="B", **OPCIONES)
+    cola._reclamar(0, []); cola._reclamar(1, [])
+    cola._actualizar(en_curso, etapa="5d_pdf", hechas=3, total=12, progreso=0.8)
+    cola._actualizar(viejo, estado="hecho", fin=time.time() - (cola.HORAS_RETENCION + 1) * 3600)
+    cola.recuperar() # El servidor se reinició con un trabajo a medias
+    recuperado = cola.estado(en_curso)
+    assert (recuperado["estado"], recuperado["etapa"], recuperado["progreso"]) == ("pendiente", "en cola", 0.0)
+    assert cola.estado(viejo)["estado"] == "hecho"
+    assert cola.purgar() == 1 and cola.estado(viejo) is None and cola.estado(en_curso) is not None
+    assert en_memoria(recuperado["huella"]) == contenido # Lo sigue usando el recuperado
@@ -0,0 +1,105 @@
+# tests/test_extraccion.py
+# Extracción de partes: índice propio de cada modelo (sin estado de módulo), extracción en flujo, en paralelo y peso por geometría.
+import gc
+import multiprocessing
+import weakref
+import ifcopenshell
+import ifcopenshell.api
+import pytest
+import bcs_core
+import bcs_tabla
+from conftest import _conjunto, _elemento, comprobar_iguales
+
+def test_modelos_alternados(ruta_modelo, ruta_revision, sin_cache):
+    p01 = ifcopenshell.open(ruta_modelo); p02 = ifcopenshell.open(ruta_revision)
+    solo = bcs_core.extraer_datos_bcs(p01)
+    assert bcs_core.indexar_modelo(p01) is bcs_core.indexar_modelo(p01) is not bcs_core.indexar_modelo(p02)
+    # Partes de dos modelos intercaladas: cada una se lee con el índice de su modelo
+    otra = ifcopenshell.open(ruta_modelo)
+    a = bcs_core.iter_partes(otra); b = bcs_core.iter_partes(p02)
+    intercaladas = bcs_tabla.ConstructorTabla(otra)
+    for fila in a:
+        intercaladas.agregar(fila); next(b, None)
+    comprobar_iguales(intercaladas.construir(), solo)
+
+def test_indice_muere_con_el_modelo(ruta_modelo, sin_cache):
+    modelo = ifcopenshell.open(ruta_modelo)
+    datos = bcs_core.extraer_datos_bcs(modelo)
+    vivo = weakref.ref(modelo); indice = weakref.ref(bcs_core.indexar_modelo(modelo))
+    del modelo, datos; gc.collect()
+    assert vivo() is None and indice() is None
+
+def con_tipo(ruta, destino):
+    """Copia del modelo con un Pset de tipo (solo rellena lo que la ocurrencia no tiene)."""
+    f = ifcopenshell.open(ruta)
+    tipo = ifcopenshell.api.run("root.create_entity", f, ifc_class="IfcMemberType", name="T1")
+    pset = ifcopenshell.api.run("pset.add_pset", f, product=tipo, name="Pset_Tipo")
+    ifcopenshell.api.run("pset.edit_pset", f, pset=pset, properties={"NetWeight": 12.5, "Mark": "tipo"})
+    miembros = [e for e in f.by_type("IfcMember") if e.Name in ("hueco1", "ang1")]
+    ifcopenshell.api.run("type.assign_type", f, related_objects=miembros, relating_type=tipo)
+    f.write(destino)
+    return destino
+
+@pytest.mark.parametrize("lote", [None, 5])
+def test_flujo_igual_que_completa(ruta_modelo, tmp_path, sin_cache, monkeypatch, lote):
+    ruta = con_tipo(ruta_modelo, str(tmp_path / "tipos.ifc"))
+    completa = bcs_core.extraer_datos_bcs(ifcopenshell.open(ruta))
+    assert {completa.valor("referencia", i): float(completa.columnas["peso_kg"][i]) for i in range(len(completa))
+            if completa.valor("perfil_maestro", i) in ("SHS100*5", "L50*5")} == {"hueco1": 12.5, "ang1": 18.0}
+    monkeypatch.setattr(bcs_core, "LOTE_INDICE", 7) # El índice perezoso se vacía muchas veces por el camino
+    modelo = ifcopenshell.open(ruta)
+    flujo = bcs_tabla.ConstructorTabla(modelo)
+    for parte in bcs_core.iter_partes(modelo, lote=lote):
+        if not lote: flujo.agregar(parte); continue
+        assert len(parte) <= lote
+        for i in range(len(parte)):
+            fila = {c: parte.valor(c, i) for c in bcs_tabla.COLUMNAS_BASE}
+            flujo.agregar(dict(fila, global_id=fila["global_id"].decode("ascii")))
+    assert getattr(modelo, "_indice_bcs", None) is None # El índice perezoso no se queda en el modelo
+    comprobar_iguales(flujo.construir(), completa)
+
+@pytest.mark.parametrize("metodo", ["fork", "spawn"])
+def test_paralelo_igual_que_secuencial(ruta_revision, tmp_path, sin_cache, monkeypatch, metodo):
+    ruta = con_tipo(ruta_revision, str(tmp_path / "tipos.ifc"))
+    secuencial = bcs_core.extraer_datos_bcs(ifcopenshell.open(ruta))
+    if metodo == "spawn": monkeypatch.setattr(multiprocessing, "get_all_start_methods", lambda: ["spawn"]) # Como en Windows
+    avance = []
+    paralela = bcs_core.extraer_datos_paralelo(ifcopenshell.open(ruta), procesos=3, ruta_ifc=ruta,
+                                               al_avanzar=lambda hechas, total: avance.append((hechas, total)))
+    comprobar_iguales(paralela, secuencial) # Mismo orden de filas que el modo secuencial
+    assert paralela.firma == secuencial.firma
+    assert len(avance) > 3 and avance == sorted(avance) and avance[-1][0] == avance[-1][1]
+
+def modelo_geometria(ruta):
+    """Conjunto de tres vigas sin cantidades en sus Psets: solo su sólido (100x200 mm, 1, 2 y 3 m) da el peso."""
+    f = ifcopenshell.file(schema="IFC4")
+    ifcopenshell.api.run("root.create_entity", f, ifc_class="IfcProject", name="Geometría")
+    ifcopenshell.api.run("unit.assign_unit", f, length={"is_metric": True, "raw": "MILLIMETERS"})
+    modelo = ifcopenshell.api.run("context.add_context", f, context_type="Model")
+    cuerpo = ifcopenshell.api.run("context.add_context", f, context_type="Model", context_identifier="Body",
+                                  target_view="MODEL_VIEW", parent=modelo)
+    perfil = f.create_entity("IfcRectangleProfileDef", ProfileType="AREA", XDim=100.0, YDim=200.0)
+    vigas = []
+    for k in range(3):
+        viga = _elemento(f, "IfcBeam", f"g{k}", "IPE300", 0.0, 1000.0 * k, "g")
+        forma = ifcopenshell.api.run("geometry.add_profile_representation", f, context=cuerpo, profile=perfil, depth=1.0 + k)
+        ifcopenshell.api.run("geometry.assign_representation", f, product=viga, representation=forma)
+        vigas.append(viga)
+    _conjunto(f, "G1", 0.0, vigas)
+    f.write(ruta)
+    return ruta
+
+def test_peso_por_geometria(tmp_path, sin_cache, monkeypatch):
+    ruta = modelo_geometria(str(tmp_path / "geometria.ifc"))
+    monkeypatch.setattr(bcs_core, "USAR_PESO_GEOMETRIA", True)
+    monkeypatch.setattr(bcs_core, "LOTE_GEOMETRIA", 2) # Varios tramos del iterador geométrico
+    esperado = {f"g{k}": 0.1 * 0.2 * (1 + k) * bcs_core.DENSIDAD_ACERO for k in range(3)}
+    def pesos(tabla):
+        nombres = {e.GlobalId.encode(): e.Name for e in ifcopenshell.open(ruta).by_type("IfcBeam")}
+        return {nombres[g]: pytest.approx(float(w)) for g, w in zip(tabla.columnas["global_id"], tabla.columnas["peso_kg"])}
+    modelo = ifcopenshell.open(ruta)
+    completa = bcs_core.extraer_datos_bcs(modelo)
+    assert pesos(completa) == esperado
+    assert bcs_core.indexar_modelo(modelo).geometria["partes"] == 3
+    flujo = bcs_core.iter_partes(ifcopenshell.open(ruta), lote=2)
+    assert [x for t in flujo for x in t.columnas["peso_kg"]] == completa.columnas["peso_kg"].tolist()
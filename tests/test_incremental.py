@@ -0,0 +1,70 @@
+# tests/test_incremental.py
+# Extracción incremental entre revisiones (por GlobalId) frente a re-extraer la revisión completa.
+import ifcopenshell
+import ifcopenshell.api
+import ifcopenshell.util.placement
+import pytest
+import bcs_core
+import bcs_incremental
+import bcs_tabla
+from conftest import comprobar_iguales
+
+def por_global_id(modelo):
+    return {e.Name: e.GlobalId for e in modelo.by_type("IfcElement")}
+
+@pytest.fixture
+def revisiones(ruta_modelo, ruta_revision, sin_cache, tmp_path):
+    """(tabla P01 guardada y releída como en 'procesar --anterior', modelo P02, extracción completa de P02)."""
+    ruta_tabla = str(tmp_path / "P01_BCS_Tabla.npz")
+    bcs_tabla.guardar_tabla(bcs_core.extraer_datos_bcs(ifcopenshell.open(ruta_modelo)), ruta_tabla)
+    completa = bcs_core.extraer_datos_bcs(ifcopenshell.open(ruta_revision))
+    return bcs_tabla.cargar_tabla(ruta_tabla), ifcopenshell.open(ruta_revision), completa
+
+def test_igual_que_extraccion_completa(revisiones):
+    anterior, modelo, completa = revisiones
+    nueva, _ = bcs_incremental.extraer_incremental(anterior, modelo)
+    comprobar_iguales(nueva, completa)
+
+def test_cambios_detectados(revisiones):
+    anterior, modelo, completa = revisiones
+    _, cambios = bcs_incremental.extraer_incremental(anterior, modelo)
+    gid = por_global_id(modelo) # Los GlobalId se conservan entre revisiones
+    assert cambios["añadidos"] == [gid["b99"]]
+    assert sorted(cambios["modificados"]) == sorted([gid["b13"], gid["ang1"]])
+    assert len(cambios["eliminados"]) == 1 and cambios["eliminados"][0] not in gid.values() # El pilar c2
+    assert cambios["sin_cambios"] == len(completa) - 3
+    assert cambios["conjuntos_afectados"] == ["P2", "V13", "V99", "ang1"]
+
+def subir(ruta, destino, dz=20000.0):
+    """La misma revisión con todo el modelo desplazado 'dz' mm en Z: solo cambian los placements."""
+    f = ifcopenshell.open(ruta)
+    for e in f.by_type("IfcElement"):
+        m = ifcopenshell.util.placement.get_local_placement(e.ObjectPlacement); m[2, 3] += dz
+        ifcopenshell.api.run("geometry.edit_object_placement", f, product=e, matrix=m, is_si=False)
+    f.write(destino)
+    return destino
+
+def test_modelo_desplazado(ruta_modelo, sin_cache, tmp_path):
+    ruta_tabla = str(tmp_path / "P01_BCS_Tabla.npz")
+    bcs_tabla.guardar_tabla(bcs_core.extraer_datos_bcs(ifcopenshell.open(ruta_modelo)), ruta_tabla)
+    ruta = subir(ruta_modelo, str(tmp_path / "subido.ifc"))
+    completa = bcs_core.extraer_datos_bcs(ifcopenshell.open(ruta))
+    anterior = bcs_tabla.cargar_tabla(ruta_tabla)
+    nueva, cambios = bcs_incremental.extraer_incremental(anterior, ifcopenshell.open(ruta))
+    comprobar_iguales(nueva, completa)
+    assert cambios["sin_cambios"] == 0 and len(cambios["modificados"]) == len(completa)
+    sueltas = [i for i in range(len(completa)) if completa.columnas["id_padre"][i] < 0] # Z del placement
+    assert sueltas and all(completa.columnas["altura_z"][i] == anterior.columnas["altura_z"][i] + 20000.0 for i in sueltas)
+
+def test_firma_del_extractor(ruta_modelo, ruta_revision, sin_cache, tmp_path):
+    datos = bcs_core.extraer_datos_bcs(ifcopenshell.open(ruta_modelo))
+    ruta_tabla = str(tmp_path / "P01_BCS_Tabla.npz")
+    bcs_tabla.guardar_tabla(datos, ruta_tabla)
+    anterior = bcs_tabla.cargar_tabla(ruta_tabla)
+    assert anterior.firma == datos.firma == bcs_core.firma_extractor()
+    completa = bcs_core.extraer_datos_bcs(ifcopenshell.open(ruta_revision))
+    for firma in ("", "6-" + bcs_core.CLASIFICADOR.firma, "lite-" + anterior.firma): # Sin firma, otra versión, modo lite
+        anterior.firma = firma
+        nueva, cambios = bcs_incremental.extraer_incremental(anterior, ifcopenshell.open(ruta_revision))
+        assert cambios is None # Extracción completa
+        comprobar_iguales(nueva, completa)
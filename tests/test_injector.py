@@ -0,0 +1,22 @@
+# tests/test_injector.py
+# Escritura del IFC enriquecido: .ifc plano y .ifczip (ZIP con un único .ifc dentro).
+import os
+import zipfile
+import ifcopenshell
+import bcs_injector
+
+def sin_cabecera(texto):
+    """STEP sin la línea FILE_NAME (lleva la hora de escritura)."""
+    return [l for l in texto.splitlines() if not l.startswith("FILE_NAME")]
+
+def test_ifczip(ruta_modelo, tmp_path):
+    modelo = ifcopenshell.open(ruta_modelo)
+    plano = str(tmp_path / "nave_BCS_Enriquecido.ifc"); comprimido = str(tmp_path / "nave_BCS_Enriquecido.ifczip")
+    bcs_injector.escribir_ifc(modelo, plano); bcs_injector.escribir_ifc(modelo, comprimido)
+    assert sorted(os.listdir(tmp_path)) == ["nave_BCS_Enriquecido.ifc", "nave_BCS_Enriquecido.ifczip"] # Sin temporales
+    with zipfile.ZipFile(comprimido) as z:
+        assert z.namelist() == ["nave_BCS_Enriquecido.ifc"]
+        assert z.getinfo("nave_BCS_Enriquecido.ifc").compress_type == zipfile.ZIP_DEFLATED
+        contenido = z.read("nave_BCS_Enriquecido.ifc").decode("utf-8")
+    with open(plano, encoding="utf-8") as f: assert sin_cabecera(contenido) == sin_cabecera(f.read())
+    assert len(ifcopenshell.open(comprimido).by_type("IfcElement")) == len(modelo.by_type("IfcElement"))
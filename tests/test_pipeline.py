@@ -0,0 +1,107 @@
+# tests/test_pipeline.py
+# Ejecutor de etapas (DAG): dependencias, etapas en el pool de procesos, errores y caché de etapas entre trabajos.
+import datetime
+import os
+import time
+import pytest
+import bcs
+import bcs_core
+import bcs_pipeline
+from bcs_pipeline import Etapa
+
+# Etapas del pool: funciones de módulo (se envían por nombre a los procesos)
+def dormir(*entradas):
+    inicio = time.time(); time.sleep(0.4)
+    return {"pid": os.getpid(), "inicio": inicio, "fin": time.time(), "entradas": entradas}
+
+def fallar(*_):
+    raise RuntimeError("etapa rota")
+
+def test_orden_y_resultados():
+    orden = []
+    def etapa(nombre, resultado):
+        def funcion(*entradas): orden.append(nombre); return (resultado, entradas)
+        return funcion
+    etapas = [Etapa("c", etapa("c", 3), ("a", "b")), Etapa("b", etapa("b", 2), ("datos",)), Etapa("a", etapa("a", 1), ("datos",))]
+    avisos = []
+    valores, tiempos = bcs_pipeline.ejecutar(etapas, {"datos": 0}, procesos=1, al_terminar=lambda *a: avisos.append(a))
+    assert orden.index("c") == 2 and sorted(orden[:2]) == ["a", "b"]
+    assert valores["c"] == (3, ((1, (0,)), (2, (0,))))
+    assert set(tiempos) == {"a", "b", "c"} and [(h, t) for _, h, t in avisos] == [(1, 3), (2, 3), (3, 3)]
+
+def test_pool_en_paralelo():
+    etapas = [Etapa("base", lambda datos: datos + 1, ("datos",)),
+              Etapa("pdf1", dormir, ("base",), en_proceso=True), Etapa("pdf2", dormir, ("base",), en_proceso=True),
+              Etapa("local", lambda base: os.getpid(), ("base",))]
+    valores, _ = bcs_pipeline.ejecutar(etapas, {"datos": 1}, procesos=2)
+    pdf1, pdf2 = valores["pdf1"], valores["pdf2"]
+    assert pdf1["entradas"] == pdf2["entradas"] == (2,)
+    assert valores["local"] == os.getpid() and os.getpid() not in (pdf1["pid"], pdf2["pid"]) # Los PDF, en el pool
+    assert pdf1["inicio"] < pdf2["fin"] and pdf2["inicio"] < pdf1["fin"] # Se solapan entre sí
+    # Con un solo proceso, todo en el principal
+    valores, _ = bcs_pipeline.ejecutar(etapas, {"datos": 1}, procesos=1)
+    assert valores["pdf1"]["pid"] == valores["pdf2"]["pid"] == os.getpid()
+
+def test_bloqueos_y_errores():
+    with pytest.raises(ValueError, match="bloqueadas"): # Ciclo
+        bcs_pipeline.ejecutar([Etapa("a", max, ("b",)), Etapa("b", max, ("a",))], {}, procesos=1)
+    with pytest.raises(ValueError, match="falta"): # Entrada que nadie produce
+        bcs_pipeline.ejecutar([Etapa("a", max, ("datos", "modelo"))], {"datos": 1}, procesos=1)
+    with pytest.raises(RuntimeError, match="etapa rota"): # El error de una etapa del pool llega al que llama
+        bcs_pipeline.ejecutar([Etapa("a", fallar, ("datos",), en_proceso=True)], {"datos": 1}, procesos=2)
+
+# --- CACHÉ DE ETAPAS (cambiar una opción solo repite lo que depende de ella) ---
+def test_cache_por_claves():
+    llamadas = []
+    def etapa(nombre):
+        def funcion(*entradas): llamadas.append(nombre); return nombre
+        return funcion
+    def etapas(parametro):
+        return [Etapa("a", etapa("a"), ("datos",), clave=(parametro,)), Etapa("b", etapa("b"), ("datos",), clave=()),
+                Etapa("c", etapa("c"), ("a", "b"), clave=()), Etapa("sin_clave", etapa("sin_clave"), ("datos",))]
+    cache = {}
+    def ejecutar(parametro, huella):
+        llamadas.clear()
+        valores, tiempos = bcs_pipeline.ejecutar(etapas(parametro), {"datos": 0}, 1, cache=cache, claves={"datos": huella})
+        assert valores["c"] == "c" and set(tiempos) == {"a", "b", "c", "sin_clave"}
+        return sorted(llamadas)
+    assert ejecutar(1, "h1") == ["a", "b", "c", "sin_clave"]
+    assert ejecutar(1, "h1") == ["sin_clave"]     # Nada ha cambiado: solo lo que no se cachea
+    assert ejecutar(2, "h1") == ["a", "c", "sin_clave"] # Cambia 'a' y lo que depende de ella
+    assert ejecutar(2, "h2") == ["a", "b", "c", "sin_clave"] # Otro IFC: todo
+    llamadas.clear(); bcs_pipeline.ejecutar(etapas(2), {"datos": 0}, 1, cache=cache) # Sin huella no se reutiliza
+    assert len(llamadas) == 4
+
+def test_cache_de_archivos(tmp_path):
+    def escribir(ruta):
+        def funcion(datos):
+            with open(ruta, "w") as f: f.write(f"informe {datos}")
+            return ruta
+        return funcion
+    cache = {}; primero = str(tmp_path / "t1" / "informe.pdf"); segundo = str(tmp_path / "t2" / "informe.pdf")
+    os.makedirs(os.path.dirname(primero)); os.makedirs(os.path.dirname(segundo))
+    def ejecutar(ruta):
+        _, tiempos = bcs_pipeline.ejecutar([Etapa("pdf", escribir(ruta), ("datos",), clave=(), salida=ruta)], {"datos": 7}, 1,
+                                           cache=cache, claves={"datos": "h"})
+        return tiempos["pdf"]
+    assert ejecutar(primero) > 0
+    assert ejecutar(segundo) == 0.0 # Otro trabajo: el archivo del anterior se lleva a su carpeta
+    with open(segundo) as f: assert f.read() == "informe 7"
+    os.remove(primero); os.remove(segundo)
+    assert ejecutar(segundo) > 0 and os.path.exists(segundo) # Sin el archivo en disco se repite
+
+def test_entregables_entre_trabajos(ruta_modelo, tmp_path, sin_cache):
+    datos, modelo = bcs_core.extraer_datos_modelo(ruta_modelo)
+    cache = {}
+    def trabajo(n, rendimiento_kg=1500.0, iso_status="S2"):
+        carpeta = tmp_path / f"t{n}"; carpeta.mkdir()
+        rutas = bcs.rutas_salida(ruta_modelo, str(carpeta)); del rutas["tabla"]
+        tiempos = bcs_pipeline.generar_entregables(datos, modelo, rutas, datetime.date(2026, 1, 5), rendimiento_kg, iso_status,
+                                                   procesos=1, cache=cache, huella="nave", ruta_zip=rutas["zip"])
+        assert all(os.path.exists(r) for r in rutas.values())
+        return sorted(e for e, s in tiempos.items() if s > 0)
+    assert trabajo(1) == ["4d_calculo", "4d_pdf", "5d_calculo", "5d_pdf", "6d_calculo", "6d_pdf", "7d", "ifc", "ifc_4d",
+                          "ifc_base", "ifc_iso", "modelo"]
+    assert trabajo(2, rendimiento_kg=3000.0) == ["4d_calculo", "4d_pdf", "ifc", "ifc_4d"]
+    assert trabajo(3, rendimiento_kg=3000.0, iso_status="A1") == ["ifc", "ifc_iso"]
+    assert trabajo(4, rendimiento_kg=3000.0, iso_status="A1") == []